@@ -1,7 +1,10 @@
 import os
+import threading
 
 from dotenv import load_dotenv, find_dotenv
 
+from arg_mine.api import session
+
 
 def load_auth_tokens():
     """
@@ -17,3 +20,259 @@ def load_auth_tokens():
     am_user_id = os.getenv("ARGUMENTEXT_USERID")
     am_user_key = os.getenv("ARGUMENTEXT_KEY")
     return am_user_id, am_user_key
+
+
+def load_credentials():
+    """
+    Read all available ArgumentText credentials from the .env file
+
+    Collects, in order and without duplicates:
+
+    * the primary pair, ``ARGUMENTEXT_USERID`` / ``ARGUMENTEXT_KEY``
+    * numbered pairs ``ARGUMENTEXT_USERID_n`` / ``ARGUMENTEXT_KEY_n``, from 1
+      until the first missing number; a user id without its key is an error
+    * the lines ``user_id,api_key`` of the ``ARGUMENTEXT_CREDENTIALS_FILE``
+      file; blank lines and lines starting with ``#`` are ignored
+
+    Returns
+    -------
+    List[Tuple[str, str]]
+        list of (user_id, api_key)
+
+    Raises
+    ------
+    ValueError
+        naming the variable or file line of an incomplete credential
+    """
+    credentials = []
+    user_id, api_key = load_auth_tokens()
+    if user_id and api_key:
+        credentials.append((user_id, api_key))
+
+    index = 1
+    while os.getenv("ARGUMENTEXT_USERID_{}".format(index)):
+        key_var = "ARGUMENTEXT_KEY_{}".format(index)
+        api_key = os.getenv(key_var)
+        if not api_key:
+            raise ValueError(
+                "{} is missing for ARGUMENTEXT_USERID_{}".format(
+                    key_var, index
+                )
+            )
+        credentials.append(
+            (os.getenv("ARGUMENTEXT_USERID_{}".format(index)), api_key)
+        )
+        index += 1
+
+    credentials_path = os.getenv("ARGUMENTEXT_CREDENTIALS_FILE")
+    if credentials_path:
+        credentials.extend(_read_credentials_file(credentials_path))
+
+    return list(dict.fromkeys(credentials))
+
+
+def _read_credentials_file(credentials_path):
+    """Read the ``user_id,api_key`` lines of a credentials file"""
+    credentials = []
+    with open(credentials_path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = [field.strip() for field in line.split(",", 1)]
+            if len(fields) != 2 or not all(fields):
+                raise ValueError(
+                    "{} line {}: expected user_id,api_key".format(
+                        credentials_path, line_number
+                    )
+                )
+            credentials.append(tuple(fields))
+    return credentials
+
+
+class ApiKeyState:
+    """
+    Concurrency limit and request counters for a single API key
+
+    Parameters
+    ----------
+    user_id : str
+    api_key : str
+    max_in_flight : int
+        fixed concurrency limit, used when there is no limiter
+    limiter : session.AdaptiveConcurrencyLimiter
+        optional, adapts the concurrency limit of this key to the gateway load
+    """
+
+    def __init__(self, user_id, api_key, max_in_flight=3, limiter=None):
+        self.user_id = user_id
+        self.api_key = api_key
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter
+        self.in_flight = 0
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_congested = 0
+
+    @property
+    def credentials(self):
+        return self.user_id, self.api_key
+
+    @property
+    def window(self):
+        """Current number of requests allowed in flight for this key"""
+        return self.limiter.window if self.limiter else self.max_in_flight
+
+    @property
+    def max_window(self):
+        return self.limiter.max_window if self.limiter else self.max_in_flight
+
+    @property
+    def free(self):
+        return self.window - self.in_flight
+
+    def stats(self):
+        """
+        Snapshot of the key metrics, without the api key
+
+        Returns
+        -------
+        dict
+        """
+        return {
+            "user_id": self.user_id,
+            "window": self.window,
+            "in_flight": self.in_flight,
+            "n_requests": self.n_requests,
+            "n_errors": self.n_errors,
+            "n_congested": self.n_congested,
+        }
+
+
+class CredentialPool:
+    """
+    Spread classify requests over API keys, each with its own concurrency limit
+
+    The server limits the number of parallel requests per API key, so the
+    aggregate throughput scales with the number of keys. Each request is
+    assigned to the key with the most free capacity. With `adaptive`, each key
+    gets an AdaptiveConcurrencyLimiter, growing up to `max_in_flight`.
+
+    This class is thread safe.
+
+    Examples
+    --------
+    >>> pool = CredentialPool(load_credentials(), adaptive=True)
+    >>> for doc, sentences in classify.iter_classified(
+    ...     topic, url_list, credential_pool=pool
+    ... ):
+    ...     pass
+    >>> pool.stats()
+
+    Parameters
+    ----------
+    credentials : Sequence[Tuple[str, str]]
+        list of (user_id, api_key), eg from `load_credentials`
+    max_in_flight : int
+        concurrency limit per key; the maximum window when adaptive
+    adaptive : bool
+        if True, adapt the concurrency limit of each key with AIMD
+    limiters : Sequence[session.AdaptiveConcurrencyLimiter]
+        optional, explicit limiter for each key, in place of `adaptive`
+    """
+
+    def __init__(
+        self, credentials, max_in_flight=3, adaptive=False, limiters=None
+    ):
+        credentials = list(credentials)
+        if not credentials:
+            raise ValueError("Need at least one (user_id, api_key) pair")
+        if limiters is None and adaptive:
+            limiters = [
+                session.AdaptiveConcurrencyLimiter(
+                    initial_window=min(2, max_in_flight),
+                    max_window=max_in_flight,
+                )
+                for _ in credentials
+            ]
+        limiters = limiters or [None] * len(credentials)
+        self.keys = [
+            ApiKeyState(
+                user_id, api_key, max_in_flight=max_in_flight, limiter=limiter
+            )
+            for (user_id, api_key), limiter in zip(credentials, limiters)
+        ]
+        self._lock = threading.Lock()
+
+    @property
+    def adaptive(self):
+        """Whether the key limiters handle congestion, not session retries"""
+        return any(key.limiter is not None for key in self.keys)
+
+    @property
+    def max_workers(self):
+        """Maximum number of requests that can be in flight over all keys"""
+        return sum(key.max_window for key in self.keys)
+
+    def acquire(self):
+        """
+        Reserve a request slot on the key with the most free capacity
+
+        Returns
+        -------
+        Optional[ApiKeyState]
+            None if every key is at its limit
+        """
+        with self._lock:
+            key = max(self.keys, key=lambda k: k.free)
+            if key.free <= 0:
+                return None
+            key.in_flight += 1
+            return key
+
+    def cancel(self, key):
+        """Give back an acquired slot that was not used"""
+        with self._lock:
+            key.in_flight -= 1
+
+    def release(self, key, latency, response, exception=None):
+        """
+        Free a completed request's slot, updating the key's counters and
+        limiter
+
+        Parameters
+        ----------
+        key : ApiKeyState
+        latency : float
+            time in seconds the request took
+        response : Optional[requests.Response]
+        exception : requests.RequestException
+            optional, raised by the request when `response` is None
+
+        Returns
+        -------
+        bool
+            whether the response signalled congestion
+        """
+        congested = session.is_congested(response, exception)
+        with self._lock:
+            key.in_flight -= 1
+            if getattr(response, "from_cache", False):
+                return False
+            key.n_requests += 1
+            key.n_errors += response is None or response.status_code != 200
+            key.n_congested += congested
+        if key.limiter is not None:
+            key.limiter.record(latency, congested=congested)
+        return congested
+
+    def stats(self):
+        """
+        Snapshot of the metrics of each key
+
+        Returns
+        -------
+        List[dict]
+        """
+        with self._lock:
+            return [key.stats() for key in self.keys]
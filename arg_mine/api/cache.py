@@ -0,0 +1,500 @@
+"""
+Persistent on-disk caches for classify responses and refused URLs
+"""
+import collections
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import requests
+
+from arg_mine import DATA_DIR
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+DEFAULT_CACHE_PATH = os.path.join(DATA_DIR, "interim", "classify_cache.sqlite")
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3  # 5 GB
+# seconds; the model version on the server changes over time
+DEFAULT_TTL = 30 * 24 * 60 * 60
+
+# payload fields that are not part of the cache key
+CREDENTIAL_FIELDS = ("userID", "apiKey")
+
+
+def make_key(payload):
+    """
+    Content-addressed cache key of a classify payload, minus the credentials
+
+    Parameters
+    ----------
+    payload : dict
+        output of `classify.bundle_payload`
+
+    Returns
+    -------
+    str
+    """
+    key_fields = {
+        k: v for k, v in payload.items() if k not in CREDENTIAL_FIELDS
+    }
+    return utils.unique_hash(json.dumps(key_fields, sort_keys=True))
+
+
+def make_response(content, url=None):
+    """
+    Wrap cached json content as a requests.Response, for `process_responses`
+
+    Parameters
+    ----------
+    content : bytes
+        json body of the response
+    url : str
+
+    Returns
+    -------
+    requests.Response
+        with attribute `from_cache` set to True
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    response.url = url
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json"
+    response.from_cache = True
+    return response
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of successful classify responses, keyed by `make_key`
+
+    Entries older than `ttl` are treated as missing. When the stored responses
+    grow beyond `max_bytes`, the least recently used entries are evicted.
+    With `bypass`, lookups always miss but new responses are still stored,
+    which refreshes the cached entries.
+
+    This class is thread safe; the sqlite file can be shared between processes.
+
+    Examples
+    --------
+    >>> cache = ResponseCache()
+    >>> responses = fetch_concurrent(topic, url_list, cache=cache)
+
+    Parameters
+    ----------
+    path : str
+        path to the sqlite file, the parent directory is created if needed
+    max_bytes : int
+        maximum total size of the cached responses
+    ttl : float
+        time to live for each entry, in seconds. None to never expire
+    bypass : bool
+        if True, ignore cached entries
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        max_bytes=DEFAULT_MAX_BYTES,
+        ttl=DEFAULT_TTL,
+        bypass=False,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, url TEXT, content BLOB, size INTEGER, "
+                "created REAL, accessed REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed "
+                "ON responses (accessed)"
+            )
+            # total size of the responses, kept up to date by triggers, so that
+            # processes sharing the file see each other's entries
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_size ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), total_bytes INTEGER)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO cache_size "
+                "SELECT 0, COALESCE(SUM(size), 0) FROM responses"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_insert "
+                "AFTER INSERT ON responses BEGIN "
+                "UPDATE cache_size SET total_bytes = total_bytes + NEW.size; "
+                "END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_delete "
+                "AFTER DELETE ON responses BEGIN "
+                "UPDATE cache_size SET total_bytes = total_bytes - OLD.size; "
+                "END"
+            )
+
+    def get(self, payload):
+        """
+        Look up the cached response for a classify payload
+
+        Parameters
+        ----------
+        payload : dict
+
+        Returns
+        -------
+        Optional[requests.Response]
+            None on a miss
+        """
+        content = None if self.bypass else self._get_content(make_key(payload))
+        if content is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return make_response(content, url=payload.get("targetUrl"))
+
+    def get_json(self, payload):
+        """Cached json dict of a classify payload, None on a miss"""
+        response = self.get(payload)
+        return response.json() if response is not None else None
+
+    def _get_content(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT content, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            content, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._delete(key)
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return content
+
+    def put(self, payload, content):
+        """
+        Store a successful classify response
+
+        Parameters
+        ----------
+        payload : dict
+            the payload used in the request
+        content : Union[bytes, dict]
+            the raw json body of the response, or the parsed json
+        """
+        if isinstance(content, dict):
+            content = json.dumps(content).encode("utf-8")
+        key = make_key(payload)
+        url = payload.get("targetUrl")
+        now = time.time()
+        with self._lock, self._conn:
+            self._delete(key)
+            self._conn.execute(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, content, len(content), now, now),
+            )
+            self._evict()
+
+    def put_response(self, payload, response):
+        """Store a successful requests.Response, unless it is a cache hit"""
+        if (
+            response is not None
+            and response.status_code == 200
+            and not getattr(response, "from_cache", False)
+        ):
+            self.put(payload, response.content)
+
+    def _delete(self, key):
+        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _total_bytes(self):
+        return self._conn.execute(
+            "SELECT total_bytes FROM cache_size"
+        ).fetchone()[0]
+
+    def _evict(self):
+        """Drop least recently used entries until under max_bytes"""
+        excess_bytes = self._total_bytes() - self.max_bytes
+        if excess_bytes <= 0:
+            return
+        # walk the accessed index only as far as needed
+        evicted_keys = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed ASC"
+        ):
+            evicted_keys.append((key,))
+            excess_bytes -= size
+            if excess_bytes <= 0:
+                break
+        self._conn.executemany(
+            "DELETE FROM responses WHERE key = ?", evicted_keys
+        )
+        _logger.debug("evicted {} cached responses".format(len(evicted_keys)))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+DEFAULT_REFUSAL_PATH = os.path.join(DATA_DIR, "interim", "refused_urls.sqlite")
+
+
+class RefusalCache:
+    """
+    Negative cache of URLs the server refused to crawl (`errors.Refused`),
+    with refusal rates per hostname
+
+    `filter_urls` drops URLs refused within `ttl`, and URLs on hostnames whose
+    refusal rate is at least `skip_rate`. URLs on hostnames with a refusal rate
+    of at least `deprioritize_rate` are moved to the end of the list. Hostname
+    rates are only used after `min_requests` requests, and are reset once their
+    last update is older than `ttl`, so that domains can recover.
+
+    This class is thread safe; the sqlite file can be shared between processes.
+
+    Examples
+    --------
+    >>> refusals = RefusalCache()
+    >>> url_list, skipped = refusals.filter_urls(url_list)
+    >>> responses = fetch_concurrent(topic, url_list)
+    >>> docs_df, sentences_df, missing_urls = process_responses(responses)
+    >>> refusals.update(url_list, missing_urls)
+
+    Parameters
+    ----------
+    path : str
+        path to the sqlite file, the parent directory is created if needed
+    ttl : float
+        time to live for refusals, in seconds. None to never expire
+    skip_rate : float
+        refusal rate above which all URLs of a hostname are skipped
+    deprioritize_rate : float
+        refusal rate above which URLs of a hostname are sent last
+    min_requests : int
+        minimum number of requests to a hostname before its rate is used
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_REFUSAL_PATH,
+        ttl=DEFAULT_TTL,
+        skip_rate=0.95,
+        deprioritize_rate=0.5,
+        min_requests=20,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.skip_rate = skip_rate
+        self.deprioritize_rate = deprioritize_rate
+        self.min_requests = min_requests
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS refused_urls "
+                "(url TEXT PRIMARY KEY, refused REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS hostnames ("
+                "hostname TEXT PRIMARY KEY, n_requests INTEGER, "
+                "n_refused INTEGER, updated REAL)"
+            )
+
+    def _expired(self, timestamp, now):
+        return self.ttl is not None and now - timestamp > self.ttl
+
+    def update(self, requested_urls, refused_urls):
+        """
+        Record the outcome of a set of classify requests
+
+        Parameters
+        ----------
+        requested_urls : Iterable[str]
+            all URLs that got a response from the server, refused or not
+        refused_urls : Iterable[str]
+            the URLs that were refused, eg the `missing_url_list` from
+            `process_responses`
+        """
+        requested_urls = list(requested_urls)
+        refused_urls = set(refused_urls)
+        if not requested_urls:
+            return
+        hostnames = utils.get_url_hostnames(pd.Series(requested_urls))
+        host_counts = collections.defaultdict(lambda: [0, 0])
+        for url, hostname in zip(requested_urls, hostnames):
+            host_counts[hostname][0] += 1
+            host_counts[hostname][1] += url in refused_urls
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO refused_urls VALUES (?, ?)",
+                [(url, now) for url in refused_urls],
+            )
+            self._conn.executemany(
+                "DELETE FROM refused_urls WHERE url = ?",
+                [(url,) for url in requested_urls if url not in refused_urls],
+            )
+            for hostname, (n_requests, n_refused) in host_counts.items():
+                row = self._conn.execute(
+                    "SELECT n_requests, n_refused, updated FROM hostnames "
+                    "WHERE hostname = ?",
+                    (hostname,),
+                ).fetchone()
+                if row is not None and not self._expired(row[2], now):
+                    n_requests += row[0]
+                    n_refused += row[1]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO hostnames VALUES (?, ?, ?, ?)",
+                    (hostname, n_requests, n_refused, now),
+                )
+
+    def record(self, url, refused):
+        """Record the outcome of a single classify request"""
+        self.update([url], [url] if refused else [])
+
+    def is_refused(self, url):
+        """Whether the URL was refused within the ttl"""
+        return url in self._refused_subset([url])
+
+    def hostname_refusal_rates(self, hostnames=None, chunk_size=500):
+        """
+        Refusal rate of the hostnames with `min_requests` unexpired requests
+
+        Parameters
+        ----------
+        hostnames : Sequence[str]
+            optional, only look up these hostnames, querying in chunks;
+            default all the hostnames
+        chunk_size : int
+
+        Returns
+        -------
+        pd.Series
+            indexed by hostname
+        """
+        query = (
+            "SELECT hostname, n_requests, n_refused, updated FROM hostnames "
+            "WHERE n_requests >= ?"
+        )
+        if hostnames is None:
+            queries = [(query, [self.min_requests])]
+        else:
+            hostnames = list(hostnames)
+            queries = []
+            for i in range(0, len(hostnames), chunk_size):
+                chunk = hostnames[i : i + chunk_size]  # noqa: E203
+                chunk_query = query + " AND hostname IN ({})".format(
+                    ", ".join("?" * len(chunk))
+                )
+                queries.append((chunk_query, [self.min_requests] + chunk))
+        now = time.time()
+        rows = []
+        with self._lock:
+            for chunk_query, values in queries:
+                rows.extend(self._conn.execute(chunk_query, values))
+        rates = {
+            hostname: n_refused / n_requests
+            for hostname, n_requests, n_refused, updated in rows
+            if not self._expired(updated, now)
+        }
+        return pd.Series(rates, dtype=float)
+
+    def _refused_subset(self, urls, chunk_size=500):
+        """URLs that were refused within the ttl, querying in chunks"""
+        now = time.time()
+        refused = set()
+        with self._lock:
+            for i in range(0, len(urls), chunk_size):
+                chunk = urls[i : i + chunk_size]  # noqa: E203
+                query = (
+                    "SELECT url, refused FROM refused_urls "
+                    "WHERE url IN ({})".format(", ".join("?" * len(chunk)))
+                )
+                refused.update(
+                    url
+                    for url, refused_time in self._conn.execute(query, chunk)
+                    if not self._expired(refused_time, now)
+                )
+        return refused
+
+    def filter_urls(self, urls):
+        """
+        Drop known-dead URLs and hostnames, and send likely-dead hostnames last
+
+        Parameters
+        ----------
+        urls : Iterable[str]
+
+        Returns
+        -------
+        Tuple[List[str], List[str]]
+            URLs to request, and skipped URLs
+        """
+        urls = list(urls)
+        if not urls:
+            return [], []
+        refused = self._refused_subset(urls)
+        hostnames = utils.get_url_hostnames(pd.Series(urls))
+        rates = self.hostname_refusal_rates(list(dict.fromkeys(hostnames)))
+
+        keep, deprioritized, skipped = [], [], []
+        for url, hostname in zip(urls, hostnames):
+            rate = rates.get(hostname, 0.0)
+            if url in refused or rate >= self.skip_rate:
+                skipped.append(url)
+            elif rate >= self.deprioritize_rate:
+                deprioritized.append(url)
+            else:
+                keep.append(url)
+        if skipped:
+            _logger.info(
+                "skipping {} previously refused urls".format(len(skipped))
+            )
+        return keep + deprioritized, skipped
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,20 +1,31 @@
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from typing import List, AnyStr, Iterable  # noqa: F401
+import asyncio
+import collections
+import functools
 import logging
+import queue
+import threading
 import time
 
 import requests
-import grequests  # really should have used requests-futures :/=
 import pandas as pd
 import json
 
-from arg_mine.api.auth import load_auth_tokens
+from arg_mine.api.auth import load_auth_tokens, CredentialPool
 from arg_mine.api import session, errors
+from arg_mine.api.cache import ResponseCache  # noqa: F401
 from arg_mine import utils
 
 
 _logger = utils.get_logger(__name__, logging.DEBUG)
 
+# how many times a URL is sent when the gateway keeps signalling congestion,
+# when using an AdaptiveConcurrencyLimiter
+MAX_CONGESTION_ATTEMPTS = 3
+_END_OF_URLS = object()  # sentinel, a None url must not end the url iterator
+
 
 class TopicRelevance:
     """enum for the topic relevance matching options, via "topicRelevance" in API"""
@@ -39,6 +50,25 @@ class StanceLabel:
     NA = ""
 
 
+# DocumentMetadata fields read directly from the classify json metadata
+_METADATA_JSON_KEYS = {
+    "topic": "topic",
+    "model_version": "modelVersion",
+    "language": "language",
+    "time_argument_prediction": "timeArgumentPrediction",
+    "time_attention_computation": "timeAttentionComputation",
+    "time_preprocessing": "timePreprocessing",
+    "time_stance_prediction": "timeStancePrediction",
+    "time_logging": "timeLogging",
+    "time_total": "timeTotal",
+    "total_arguments": "totalArguments",
+    "total_contra_arguments": "totalContraArguments",
+    "total_pro_arguments": "totalProArguments",
+    "total_non_arguments": "totalNonArguments",
+    "total_classified_sentences": "totalClassifiedSentences",
+}
+
+
 @dataclass
 class DocumentMetadata:
     """
@@ -73,20 +103,10 @@ class DocumentMetadata:
             # make the document ID based on the url
             doc_id=cls.make_doc_id(url),
             url=url,
-            topic=metadata_dict["topic"],
-            model_version=metadata_dict["modelVersion"],
-            language=metadata_dict["language"],
-            time_argument_prediction=metadata_dict["timeArgumentPrediction"],
-            time_attention_computation=metadata_dict["timeAttentionComputation"],
-            time_preprocessing=metadata_dict["timePreprocessing"],
-            time_stance_prediction=metadata_dict["timeStancePrediction"],
-            time_logging=metadata_dict["timeLogging"],
-            time_total=metadata_dict["timeTotal"],
-            total_arguments=metadata_dict["totalArguments"],
-            total_contra_arguments=metadata_dict["totalContraArguments"],
-            total_pro_arguments=metadata_dict["totalProArguments"],
-            total_non_arguments=metadata_dict["totalNonArguments"],
-            total_classified_sentences=metadata_dict["totalClassifiedSentences"],
+            **{
+                field: metadata_dict[key]
+                for field, key in _METADATA_JSON_KEYS.items()
+            },
         )
 
     @staticmethod
@@ -151,12 +171,13 @@ def bundle_payload(
     url,
     only_arguments: bool = False,
     topic_relevance: str = TopicRelevance.WORD2VEC,
+    credentials=None,
 ):
     """
     Bundle the target json payload with API parameters
 
-    Note that this call collects the authentication tokens for each time
-    this method is called.
+    Note that, unless `credentials` are given, this call collects the
+    authentication tokens for each time this method is called.
 
     Parameters
     ----------
@@ -169,13 +190,15 @@ def bundle_payload(
         can be enabled to save storage space
     topic_relevance : TopicRelevance
         enum/str for which topic relevance model to use. See TopicRelevance.
+    credentials : Tuple[str, str]
+        optional (user_id, api_key) to use, eg from a CredentialPool
 
     Returns
     -------
     dict
         json-able dict to be used in the http request
     """
-    user_id, api_key = load_auth_tokens()
+    user_id, api_key = credentials or load_auth_tokens()
     payload = {
         "topic": topic,
         "userID": user_id,
@@ -199,6 +222,7 @@ def classify_url_sentences(
     topic_relevance: str = TopicRelevance.WORD2VEC,
     timeout: float = session.DEFAULT_TIMEOUT,
     request_session=None,
+    cache: ResponseCache = None,
 ):
     """
     For a given URL and topic phrase, identify which sentences contain arguments
@@ -220,6 +244,8 @@ def classify_url_sentences(
     timeout : float
     request_session : requests.Session
         session to pass in, for large iterations
+    cache : ResponseCache
+        optional, a cached response skips the network call
 
     Returns
     -------
@@ -228,6 +254,9 @@ def classify_url_sentences(
     payload = bundle_payload(
         topic, url, only_arguments=only_arguments, topic_relevance=topic_relevance
     )
+    json_response = cache.get_json(payload) if cache is not None else None
+    if json_response is not None:
+        return json_response
     request_session = request_session or session.get_session()
     json_response = session.fetch(
         session.ApiUrl.CLASSIFY_BASE_URL,
@@ -235,6 +264,8 @@ def classify_url_sentences(
         timeout,
         request_session=request_session,
     )
+    if cache is not None:
+        cache.put(payload, json_response)
     return json_response
 
 
@@ -408,6 +439,316 @@ def _exception_handler(request, exception):
     return url_404
 
 
+def _post_classify(
+    topic,
+    url,
+    request_session,
+    only_arguments: bool = False,
+    topic_relevance: str = TopicRelevance.WORD2VEC,
+    base_url: str = session.ApiUrl.CLASSIFY_BASE_URL,
+    cache: ResponseCache = None,
+    credentials=None,
+):
+    """
+    POST a single classify request, without raising on the HTTP status
+
+    Error statuses are left on the response, to be mapped by
+    `_response_error_check` in `process_responses`. A request that fails before
+    a response is returned raises, see `_timed_call`.
+
+    Parameters
+    ----------
+    topic : str
+    url : str
+    request_session : requests.Session
+    only_arguments : bool
+    topic_relevance : str
+    base_url : str
+        target URL for the API POST call
+    cache : ResponseCache
+        optional, a cached response is returned without a network call,
+        and successful responses are stored
+    credentials : Tuple[str, str]
+        optional (user_id, api_key) to use
+
+    Returns
+    -------
+    requests.Response
+
+    Raises
+    ------
+    requests.RequestException
+    """
+    payload = bundle_payload(
+        topic,
+        url,
+        only_arguments=only_arguments,
+        topic_relevance=topic_relevance,
+        credentials=credentials,
+    )
+    response = cache.get(payload) if cache is not None else None
+    if response is not None:
+        return response
+    response = request_session.post(
+        base_url, json=payload, allow_redirects=False
+    )
+    if cache is not None:
+        cache.put_response(payload, response)
+    return response
+
+
+def _timed_call(fn, *args):
+    """
+    Call fn(*args), returning its result, the requests exception it raised if
+    any, and the elapsed time in seconds
+
+    Mirrors the grequests behavior in `fetch_concurrent`: a request that fails
+    before a response is returned is logged and its result given as None.
+    """
+    start = time.monotonic()
+    try:
+        result, exception = fn(*args), None
+    except requests.RequestException as e:
+        _exception_handler(None, e)
+        result, exception = None, e
+    return result, exception, time.monotonic() - start
+
+
+async def iter_url_responses_async(
+    topic,
+    urls,
+    only_arguments: bool = False,
+    topic_relevance: str = TopicRelevance.WORD2VEC,
+    concurrency: int = session.DEFAULT_POOL_SIZE,
+    timeout: float = session.DEFAULT_TIMEOUT,
+    base_url: str = session.ApiUrl.CLASSIFY_BASE_URL,
+    limiter: session.AdaptiveConcurrencyLimiter = None,
+    cache: ResponseCache = None,
+    credential_pool: CredentialPool = None,
+):
+    """
+    Scheduler behind `iter_responses_async`, yielding (url, response) pairs
+    so that callers can still identify requests that got no response.
+    The arguments are the same as `iter_responses_async`.
+
+    Each request is assigned an API key from the `credential_pool`; without
+    one, a pool with the .env credentials and a limit of `concurrency` (or the
+    `limiter`) is used. With adaptive limits, the session does not retry
+    congestion statuses itself; congested URLs are instead put back in the
+    queue, up to MAX_CONGESTION_ATTEMPTS times.
+    """
+    if credential_pool is None:
+        credential_pool = CredentialPool(
+            [load_auth_tokens()],
+            max_in_flight=concurrency,
+            limiters=[limiter] if limiter else None,
+        )
+    loop = asyncio.get_running_loop()
+    url_iter = iter(urls)
+    retry_urls = collections.deque()
+    attempts = collections.Counter()  # congestion attempts, per url
+    pending = {}  # in-flight future -> (target url, api key)
+    max_workers = credential_pool.max_workers
+    retry_status_codes = (
+        () if credential_pool.adaptive else session.RETRY_STATUS_CODES
+    )
+    with session.get_session(
+        timeout=timeout,
+        pool_size=max_workers,
+        retry_status_codes=retry_status_codes,
+    ) as request_session, ThreadPoolExecutor(max_workers) as executor:
+        post_fn = functools.partial(
+            _post_classify,
+            topic,
+            request_session=request_session,
+            only_arguments=only_arguments,
+            topic_relevance=topic_relevance,
+            base_url=base_url,
+            cache=cache,
+        )
+        while True:
+            # top up the in-flight requests: retries first, then new URLs
+            key = credential_pool.acquire()
+            while key is not None:
+                if retry_urls:
+                    url = retry_urls.popleft()
+                else:
+                    url = next(url_iter, _END_OF_URLS)
+                if url is _END_OF_URLS:
+                    credential_pool.cancel(key)
+                    break
+                key_post_fn = functools.partial(
+                    post_fn, credentials=key.credentials
+                )
+                future = loop.run_in_executor(
+                    executor, _timed_call, key_post_fn, url
+                )
+                pending[future] = url, key
+                key = credential_pool.acquire()
+            if not pending:
+                break
+            done, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                url, key = pending.pop(future)
+                response, exception, latency = future.result()
+                congested = credential_pool.release(
+                    key, latency, response, exception=exception
+                )
+                if credential_pool.adaptive:
+                    attempts[url] += congested
+                    if congested and attempts[url] < MAX_CONGESTION_ATTEMPTS:
+                        retry_urls.append(url)
+                        continue
+                    attempts.pop(url, None)
+                yield url, response
+
+
+async def iter_responses_async(
+    topic,
+    urls,
+    only_arguments: bool = False,
+    topic_relevance: str = TopicRelevance.WORD2VEC,
+    concurrency: int = session.DEFAULT_POOL_SIZE,
+    timeout: float = session.DEFAULT_TIMEOUT,
+    base_url: str = session.ApiUrl.CLASSIFY_BASE_URL,
+    limiter: session.AdaptiveConcurrencyLimiter = None,
+    cache: ResponseCache = None,
+    credential_pool: CredentialPool = None,
+):
+    """
+    Asynchronously yield classify responses for the given URLs as they complete
+
+    At most `concurrency` requests are in flight at any time, and URLs are only
+    pulled from `urls` when a slot frees up, so memory stays flat regardless of
+    the number of URLs; `urls` may be a lazy iterator.
+    The blocking `requests` calls run on a thread pool sized to `concurrency`,
+    sharing a single pooled session.
+
+    Parameters
+    ----------
+    topic : str
+        keywords to use for topic identification in ArgText
+    urls : Iterable[AnyStr]
+        URLs containing documents to argument mine
+    only_arguments : bool
+        only return the sentences of the estimated arguments
+    topic_relevance : str
+        use options from TopicRelevance enum
+    concurrency : int
+        maximum number of requests in flight
+    timeout : float
+        timeout in seconds for server response
+    base_url : str
+        target URL for the API POST call, eg a local stub server for testing
+    limiter : session.AdaptiveConcurrencyLimiter
+        optional, adapts the number of requests in flight to the gateway load,
+        in place of the fixed `concurrency`
+    cache : ResponseCache
+        optional, cached responses are yielded without a network call
+    credential_pool : CredentialPool
+        optional, spreads the requests over several API keys, each with its own
+        concurrency limit, in place of `concurrency` and `limiter`
+
+    Yields
+    ------
+    Optional[requests.Response]
+        in order of completion, not in the order of `urls`
+    """
+    async for _, response in iter_url_responses_async(
+        topic,
+        urls,
+        only_arguments=only_arguments,
+        topic_relevance=topic_relevance,
+        concurrency=concurrency,
+        timeout=timeout,
+        base_url=base_url,
+        limiter=limiter,
+        cache=cache,
+        credential_pool=credential_pool,
+    ):
+        yield response
+
+
+async def fetch_concurrent_async(
+    topic,
+    urls,
+    only_arguments: bool = False,
+    topic_relevance: str = TopicRelevance.WORD2VEC,
+    concurrency: int = session.DEFAULT_POOL_SIZE,
+    timeout: float = session.DEFAULT_TIMEOUT,
+    base_url: str = session.ApiUrl.CLASSIFY_BASE_URL,
+    limiter: session.AdaptiveConcurrencyLimiter = None,
+    cache: ResponseCache = None,
+    credential_pool: CredentialPool = None,
+):
+    """
+    asyncio replacement for `fetch_concurrent`, without the grequests
+    dependency
+
+    The returned list can be passed directly to `process_responses`.
+    Use `iter_responses_async` to consume the responses as they complete
+    instead.
+
+    Examples
+    --------
+    >>> responses = asyncio.run(
+    ...     fetch_concurrent_async(topic, url_list, concurrency=3)
+    ... )
+    >>> docs_df, sentences_df, missing_urls = process_responses(responses)
+
+    Parameters
+    ----------
+    topic : str
+        keywords to use for topic identification in ArgText
+    urls : Iterable[AnyStr]
+        URLs containing documents to argument mine
+    only_arguments : bool
+        only return the sentences of the estimated arguments
+    topic_relevance : str
+        use options from TopicRelevance enum
+    concurrency : int
+        maximum number of requests in flight
+    timeout : float
+        timeout in seconds for server response
+    base_url : str
+        target URL for the API POST call
+    limiter : session.AdaptiveConcurrencyLimiter
+        optional, adapts the number of requests in flight to the gateway load
+    cache : ResponseCache
+        optional, cached responses are returned without a network call
+    credential_pool : CredentialPool
+        optional, spreads the requests over several API keys
+
+    Returns
+    -------
+    List[Optional[requests.Response]]
+        in order of completion
+    """
+    start_time = time.time()
+    response_list = []
+    async for response in iter_responses_async(
+        topic,
+        urls,
+        only_arguments=only_arguments,
+        topic_relevance=topic_relevance,
+        concurrency=concurrency,
+        timeout=timeout,
+        base_url=base_url,
+        limiter=limiter,
+        cache=cache,
+        credential_pool=credential_pool,
+    ):
+        response_list.append(response)
+    _logger.debug(
+        "{} URLs took {:0.3f} s".format(
+            len(response_list), time.time() - start_time
+        )
+    )
+    return response_list
+
+
 def fetch_concurrent(
     topic,
     url_list,
@@ -415,6 +756,8 @@ def fetch_concurrent(
     topic_relevance: str = TopicRelevance.WORD2VEC,
     pool_size: int = 5,
     chunk_size: int = 1000,
+    cache: ResponseCache = None,
+    base_url: str = session.ApiUrl.CLASSIFY_BASE_URL,
 ):
     """
     Given a list of article URLs, iterate through them in chunks and return a list of responses
@@ -436,11 +779,20 @@ def fetch_concurrent(
     chunk_size : int
         How many requests to read before downloading them and avoiding out of memory errors
         (which is a known issue with grequests)
+    cache : ResponseCache
+        optional, cached responses are returned without a network call,
+        and successful responses are stored
+    base_url : str
+        target URL for the API POST call
 
     Returns
     -------
     List[requests.Response]
     """
+    # imported here, since grequests monkeypatches the socket libraries on
+    # import
+    import grequests
+
     start_time = time.time()
     s = session.get_session(pool_size=pool_size)
     response_list = []
@@ -450,24 +802,38 @@ def fetch_concurrent(
     for i in range(0, len(url_list), chunk_size):
         iter_time = time.time()
         chunk_urls = url_list[i : i + chunk_size]  # noqa: E203
+        payloads = [
+            bundle_payload(
+                topic,
+                u,
+                only_arguments=only_arguments,
+                topic_relevance=topic_relevance,
+            )
+            for u in chunk_urls
+        ]
+        if cache is not None:
+            # cache hits skip the network entirely
+            cached = [cache.get(payload) for payload in payloads]
+            response_list.extend(r for r in cached if r is not None)
+            payloads = [p for p, r in zip(payloads, cached) if r is None]
         unsent_requests = (
             grequests.post(
-                session.ApiUrl.CLASSIFY_BASE_URL,
-                json=bundle_payload(
-                    topic,
-                    u,
-                    only_arguments=only_arguments,
-                    topic_relevance=topic_relevance,
-                ),
+                base_url,
+                json=payload,
                 session=s,
                 allow_redirects=False,
             )
-            for u in chunk_urls
+            for payload in payloads
         )
         # output is a list of response objects
         output = grequests.map(
             unsent_requests, size=100, exception_handler=_exception_handler
         )
+        if cache is not None:
+            for payload, response in zip(payloads, output):
+                # failed requests are None, or the refused url string
+                if not isinstance(response, str):
+                    cache.put_response(payload, response)
         response_list.extend(output)
         _logger.debug(
             "iteration {} took {:0.3f} s ({} docs)".format(
@@ -482,7 +848,325 @@ def fetch_concurrent(
     return response_list
 
 
-def process_responses(response_list):
+def _parse_classify_json(json_response):
+    """
+    Convert a classify json response to its document and sentence objects
+
+    Parameters
+    ----------
+    json_response : dict
+
+    Returns
+    -------
+    Optional[Tuple[DocumentMetadata, List[ClassifiedSentence]]]
+        None if the response is empty
+    """
+    if not json_response:
+        return None
+    doc = DocumentMetadata.from_dict(json_response["metadata"])
+    sentences = [
+        ClassifiedSentence.from_dict(doc.url, doc.topic, sentence)
+        for sentence in json_response["sentences"]
+    ]
+    return doc, sentences
+
+
+def parse_classify_response(response):
+    """
+    Check a classify response for errors, and parse its document and sentences
+
+    Parameters
+    ----------
+    response : Optional[requests.Response]
+        None if the server did not respond
+
+    Returns
+    -------
+    Optional[Tuple[DocumentMetadata, List[ClassifiedSentence]]]
+        None if the response is empty
+
+    Raises
+    ------
+    errors.Error
+        mapped from the failed request, eg errors.Refused;
+        see `_response_error_check`
+    """
+    if response is None:
+        raise errors.NotResponding("Server not responding")
+    _response_error_check(response)
+    return _parse_classify_json(response.json())
+
+
+def _log_classify_error(url, exception):
+    """
+    Default error handler for `iter_classified`; refused URLs are expected,
+    so are not logged
+    """
+    if not isinstance(exception, errors.Refused):
+        _logger.error("{}, url={}".format(exception, url))
+
+
+class _BackgroundAsyncIterator:
+    """
+    Run an async generator on its own event loop in a background thread,
+    iterating its items synchronously through a bounded buffer
+
+    When the buffer is full the event loop blocks, applying back pressure to
+    the async generator. Call `close` (or exit the context) to stop the
+    background thread.
+
+    Parameters
+    ----------
+    async_iter_fn : Callable[[], AsyncIterator]
+        called in the background thread to create the async generator
+    maxsize : int
+        maximum number of items waiting in the buffer
+    """
+
+    _DONE = object()  # sentinel, marks the end of the items
+
+    def __init__(self, async_iter_fn, maxsize):
+        self._async_iter_fn = async_iter_fn
+        self._buffer = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # block until the buffer has room, unless the consumer has gone away
+        while not self._stop.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    async def _produce(self):
+        async for item in self._async_iter_fn():
+            if self._stop.is_set():
+                break
+            self._put(item)
+
+    def _run(self):
+        try:
+            asyncio.run(self._produce())
+        except Exception as e:
+            self._put(e)
+        self._put(self._DONE)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self._buffer.get()
+        if item is self._DONE:
+            raise StopIteration
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_classified(
+    topic,
+    urls,
+    only_arguments: bool = False,
+    topic_relevance: str = TopicRelevance.WORD2VEC,
+    max_in_flight: int = session.DEFAULT_POOL_SIZE,
+    max_buffered: int = None,
+    timeout: float = session.DEFAULT_TIMEOUT,
+    base_url: str = session.ApiUrl.CLASSIFY_BASE_URL,
+    on_error=None,
+    limiter: session.AdaptiveConcurrencyLimiter = None,
+    cache: ResponseCache = None,
+    credential_pool: CredentialPool = None,
+):
+    """
+    Classify the URLs, yielding the parsed results as each request completes
+
+    The requests run on the asyncio engine (see `iter_responses_async`) in a
+    background thread, handing raw responses over through a bounded buffer.
+    When the buffer is full the engine stops dispatching new URLs, so peak
+    memory is proportional to `max_in_flight + max_buffered` rather than to the
+    number of URLs. Each raw response is released as soon as it is parsed.
+
+    Examples
+    --------
+    >>> for doc, sentences in iter_classified(topic, url_list):
+    ...     n_args = sum(s.is_argument for s in sentences)
+
+    Parameters
+    ----------
+    topic : str
+        keywords to use for topic identification in ArgText
+    urls : Iterable[AnyStr]
+        URLs containing documents to argument mine; may be a lazy iterator
+    only_arguments : bool
+        only return the sentences of the estimated arguments
+    topic_relevance : str
+        use options from TopicRelevance enum
+    max_in_flight : int
+        maximum number of requests in flight
+    max_buffered : int
+        maximum number of completed responses waiting to be parsed.
+        Defaults to `max_in_flight`
+    timeout : float
+        timeout in seconds for server response
+    base_url : str
+        target URL for the API POST call
+    on_error : Callable[[str, Exception], None]
+        called with the target URL and mapped exception for each failed
+        request, eg errors.Refused for URLs that could not be crawled. By
+        default, errors other than errors.Refused are logged
+    limiter : session.AdaptiveConcurrencyLimiter
+        optional, adapts the number of requests in flight to the gateway load,
+        in place of the fixed `max_in_flight`
+    cache : ResponseCache
+        optional, cached responses are parsed without a network call
+    credential_pool : CredentialPool
+        optional, spreads the requests over several API keys, each with its own
+        concurrency limit, in place of `max_in_flight` and `limiter`
+
+    Yields
+    ------
+    Tuple[DocumentMetadata, List[ClassifiedSentence]]
+        in order of completion
+    """
+    on_error = on_error or _log_classify_error
+    url_responses = _BackgroundAsyncIterator(
+        functools.partial(
+            iter_url_responses_async,
+            topic,
+            urls,
+            only_arguments=only_arguments,
+            topic_relevance=topic_relevance,
+            concurrency=max_in_flight,
+            timeout=timeout,
+            base_url=base_url,
+            limiter=limiter,
+            cache=cache,
+            credential_pool=credential_pool,
+        ),
+        maxsize=max_buffered or max_in_flight,
+    )
+    with url_responses:
+        for url, response in url_responses:
+            try:
+                result = parse_classify_response(response)
+            except Exception as e:
+                on_error(url, e)
+                continue
+            if result:
+                yield result
+
+
+class ClassifyResultBuilder:
+    """
+    Accumulate classify json responses straight into per-column lists,
+    to build the docs and sentences DataFrames once
+
+    This skips the intermediate DocumentMetadata and ClassifiedSentence
+    objects, and their conversion to dicts. The objects are still available as
+    a view, with `documents` and `sentences`.
+
+    Examples
+    --------
+    >>> builder = ClassifyResultBuilder()
+    >>> for response in responses:
+    ...     builder.add(response.json())
+    >>> docs_df, sentences_df = builder.to_frames()
+
+    """
+
+    def __init__(self):
+        self._doc_columns = {f.name: [] for f in fields(DocumentMetadata)}
+        self._sentence_columns = {
+            f.name: [] for f in fields(ClassifiedSentence)
+        }
+
+    def add(self, json_response):
+        """
+        Append the document and sentences of a classify json response
+
+        Parameters
+        ----------
+        json_response : dict
+
+        Returns
+        -------
+        bool
+            False if the response is empty, and nothing was added
+        """
+        if not json_response:
+            return False
+        metadata = json_response["metadata"]
+        url = metadata["userMetadata"]
+        doc_id = DocumentMetadata.make_doc_id(url)
+        doc_columns = self._doc_columns
+        doc_columns["doc_id"].append(doc_id)
+        doc_columns["url"].append(url)
+        for field, key in _METADATA_JSON_KEYS.items():
+            doc_columns[field].append(metadata[key])
+
+        sentences = json_response["sentences"]
+        n_sentences = len(sentences)
+        columns = self._sentence_columns
+        columns["doc_id"].extend([doc_id] * n_sentences)
+        columns["url"].extend([url] * n_sentences)
+        columns["topic"].extend([metadata["topic"]] * n_sentences)
+        for s in sentences:
+            columns["sentence_id"].append(
+                ClassifiedSentence.make_sentence_id(s["sentencePreprocessed"])
+            )
+            columns["argument_confidence"].append(s["argumentConfidence"])
+            columns["argument_label"].append(s["argumentLabel"])
+            columns["sentence_original"].append(s["sentenceOriginal"])
+            columns["sentence_preprocessed"].append(s["sentencePreprocessed"])
+            columns["sort_confidence"].append(s.get("sortConfidence", None))
+            columns["stance_confidence"].append(s.get("stanceConfidence", 0.0))
+            columns["stance_label"].append(
+                s.get("stanceLabel", StanceLabel.NA)
+            )
+        return True
+
+    def __len__(self):
+        """Number of documents added"""
+        return len(self._doc_columns["doc_id"])
+
+    def to_frames(self):
+        """
+        Build the docs and sentences DataFrames, one column per dataclass field
+
+        Returns
+        -------
+        Tuple[pd.DataFrame, pd.DataFrame]
+            docs_df, sentences_df
+        """
+        docs_df = pd.DataFrame(self._doc_columns)
+        sentences_df = pd.DataFrame(self._sentence_columns)
+        return docs_df, sentences_df
+
+    def documents(self):
+        """Iterate over the added documents, as DocumentMetadata"""
+        for values in zip(*self._doc_columns.values()):
+            yield DocumentMetadata(*values)
+
+    def sentences(self):
+        """Iterate over the added sentences, as ClassifiedSentence"""
+        for values in zip(*self._sentence_columns.values()):
+            yield ClassifiedSentence(*values)
+
+
+def process_responses(response_list, compact: bool = False):
     """
     Take a list of classify responses, convert them to docs and sentences,
     and create associate dataframes
@@ -490,14 +1174,15 @@ def process_responses(response_list):
     Parameters
     ----------
     response_list : Iterable[requests.Response]
+    compact : bool
+        if True, return lower memory frames, see `utils.compact_frame`
 
     Returns
     -------
     Tuple[pd.DataFrame, pd.DataFrame, List]
         docs_df, sentences_df, missing_url_list
     """
-    doc_list = []
-    sentence_list = []
+    builder = ClassifyResultBuilder()
     missing_url_list = []
     for response in response_list:
         if response is None:
@@ -518,14 +1203,10 @@ def process_responses(response_list):
             continue
 
         # parse the response output
-        json_response = response.json()
-        if json_response:
-            doc_list.append(DocumentMetadata.from_dict(json_response["metadata"]))
-            topic = json_response["metadata"]["topic"]
-            url = json_response["metadata"]["userMetadata"]
-            for sentence in json_response["sentences"]:
-                sentence_list.append(ClassifiedSentence.from_dict(url, topic, sentence))
-
-    docs_df = pd.DataFrame(utils.dataclasses_to_dicts(doc_list))
-    sentence_df = pd.DataFrame(utils.dataclasses_to_dicts(sentence_list))
+        builder.add(response.json())
+
+    docs_df, sentence_df = builder.to_frames()
+    if compact:
+        docs_df = utils.compact_frame(docs_df)
+        sentence_df = utils.compact_frame(sentence_df)
     return docs_df, sentence_df, missing_url_list
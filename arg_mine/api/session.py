@@ -1,5 +1,8 @@
 import http.cookiejar
 import logging
+import threading
+import time
+
 import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
@@ -12,6 +15,10 @@ DEFAULT_TIMEOUT = 200  # seconds; the argumenText API sets the timeout to 200 se
 
 DEFAULT_POOL_SIZE = 4
 
+# HTTP statuses that signal an overloaded gateway; retried by the session,
+# and used as congestion signals by AdaptiveConcurrencyLimiter
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
 
 class ApiUrl:
     """
@@ -55,7 +62,11 @@ class TimeoutHTTPAdapter(HTTPAdapter):
         return super().send(request, **kwargs)
 
 
-def get_session(timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+def get_session(
+    timeout=DEFAULT_TIMEOUT,
+    pool_size=DEFAULT_POOL_SIZE,
+    retry_status_codes=RETRY_STATUS_CODES,
+):
     """
     Get a requests Session object, with our target default parameters
 
@@ -65,6 +76,10 @@ def get_session(timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
         timeout in seconds for server response
     pool_size : int
         how many pool connections we allow within the session
+    retry_status_codes : Sequence[int]
+        HTTP statuses that are retried with exponential backoff. Pass an empty
+        tuple to return them immediately, eg when an AdaptiveConcurrencyLimiter
+        is handling congestion instead
 
     Returns
     -------
@@ -77,7 +92,7 @@ def get_session(timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
     # create retry strategy
     retry_strategy = Retry(
         total=3,
-        status_forcelist=[429, 500, 502, 503, 504],
+        status_forcelist=list(retry_status_codes),
         method_whitelist=["HEAD", "GET", "OPTIONS", "POST"],
         backoff_factor=1,  # {backoff factor} * (2 ** ({number of total retries} - 1))
     )
@@ -95,6 +110,192 @@ def get_session(timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
     return query_session
 
 
+# request errors that signal an overloaded gateway; RetryError is raised once
+# the RETRY_STATUS_CODES retries of a session are exhausted
+CONGESTION_ERRORS = (
+    requests.Timeout,
+    requests.ConnectionError,
+    requests.exceptions.RetryError,
+)
+
+
+def is_congested(response, exception=None):
+    """
+    Whether a classify response signals that the gateway is overloaded
+
+    Only timeouts, connection errors and `RETRY_STATUS_CODES` responses count.
+    Other request errors, eg an invalid URL, say nothing about the gateway
+    load.
+
+    Parameters
+    ----------
+    response : Optional[requests.Response]
+        None if the request failed before getting a response
+    exception : requests.RequestException
+        optional, raised by the request when `response` is None
+
+    Returns
+    -------
+    bool
+    """
+    if response is None:
+        return isinstance(exception, CONGESTION_ERRORS)
+    return response.status_code in RETRY_STATUS_CODES
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Additive-increase / multiplicative-decrease (AIMD) concurrency limit
+
+    The window grows by `increase` for every full window of healthy responses,
+    and is cut by `decrease_factor` on a congestion signal (429, 5xx, timeout).
+    Only one cut is made per round trip: congestion reported by requests that
+    were sent before the last cut already saw the smaller window, so are not
+    counted again. The window does not grow while the latency or the recent
+    congestion rate are above their thresholds.
+
+    This class is thread safe. The current window is exposed via `window`,
+    and the counters via `stats()`.
+
+    Examples
+    --------
+    >>> limiter = AdaptiveConcurrencyLimiter(initial_window=2, max_window=8)
+    >>> limiter.record(latency=1.2, congested=False)
+    >>> limiter.window
+    2
+
+    Parameters
+    ----------
+    initial_window : int
+    min_window : int
+    max_window : int
+    increase : float
+        how much the window grows per window of healthy responses
+    decrease_factor : float
+        multiplier for the window on congestion, between 0 and 1
+    latency_threshold : float
+        in seconds; responses slower than this do not grow the window. None to
+        ignore latency
+    max_error_rate : float
+        no window growth while the smoothed congestion rate is above this
+    error_rate_decay : float
+        weight of the history in the exponentially smoothed congestion rate
+    """
+
+    def __init__(
+        self,
+        initial_window: int = 2,
+        min_window: int = 1,
+        max_window: int = 32,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_threshold: float = None,
+        max_error_rate: float = 0.1,
+        error_rate_decay: float = 0.9,
+    ):
+        if not 1 <= min_window <= initial_window <= max_window:
+            raise ValueError(
+                "Expected 1 <= min_window <= initial_window <= max_window, "
+                "given: {}, {}, {}".format(
+                    min_window, initial_window, max_window
+                )
+            )
+        if not 0 < decrease_factor < 1:
+            raise ValueError(
+                "decrease_factor must be between 0 and 1, given: {}".format(
+                    decrease_factor
+                )
+            )
+        self.min_window = min_window
+        self.max_window = max_window
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+        self.max_error_rate = max_error_rate
+        self.error_rate_decay = error_rate_decay
+
+        self._window = float(initial_window)
+        self._last_decrease = float("-inf")  # time.monotonic() of the last cut
+        self._lock = threading.Lock()
+        self.error_rate = 0.0
+        self.n_requests = 0
+        self.n_congested = 0
+        self.n_decreases = 0
+        self.total_latency = 0.0
+
+    @property
+    def window(self):
+        """Current number of requests allowed in flight"""
+        return int(self._window)
+
+    def record(self, latency, congested=False):
+        """
+        Update the window with the outcome of a completed request
+
+        Parameters
+        ----------
+        latency : float
+            time in seconds the request took
+        congested : bool
+            whether the request got a congestion signal, see `is_congested`
+        """
+        with self._lock:
+            old_window = self.window
+            self.n_requests += 1
+            self.total_latency += latency
+            self.error_rate = self.error_rate_decay * self.error_rate + (
+                1 - self.error_rate_decay
+            ) * float(congested)
+
+            now = time.monotonic()
+            if congested:
+                self.n_congested += 1
+                if now - latency > self._last_decrease:
+                    self._window = max(
+                        self.min_window, self._window * self.decrease_factor
+                    )
+                    self._last_decrease = now
+                    self.n_decreases += 1
+            elif self._is_healthy(latency):
+                self._window = min(
+                    self.max_window,
+                    self._window + self.increase / self._window,
+                )
+
+            if self.window != old_window:
+                _logger.debug(
+                    "concurrency window {} -> {}".format(
+                        old_window, self.window
+                    )
+                )
+
+    def _is_healthy(self, latency):
+        if (
+            self.latency_threshold is not None
+            and latency > self.latency_threshold
+        ):
+            return False
+        return self.error_rate <= self.max_error_rate
+
+    def stats(self):
+        """
+        Snapshot of the limiter metrics
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            return {
+                "window": self.window,
+                "n_requests": self.n_requests,
+                "n_congested": self.n_congested,
+                "n_decreases": self.n_decreases,
+                "error_rate": self.error_rate,
+                "mean_latency": self.total_latency / max(self.n_requests, 1),
+            }
+
+
 def fetch(
     base_url: str, payload: dict, timeout: float = DEFAULT_TIMEOUT, request_session=None
 ):
@@ -0,0 +1,156 @@
+"""
+Canonical URL deduplication, so each unique article is classified only once
+"""
+import logging
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from arg_mine import DATA_DIR
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+DEFAULT_REGISTRY_PATH = os.path.join(
+    DATA_DIR, "interim", "url_registry.sqlite"
+)
+
+
+class UrlRegistry:
+    """
+    Persistent map from canonical URL keys (see `utils.canonicalize_url`) to
+    the representative URL that is sent to the API for that article
+
+    The first URL seen for a key becomes its representative, across all runs
+    and GDELT years that share the registry file. Sending the same URL for
+    every repeat of an article lets the extraction journal and response cache
+    recognize it.
+
+    This class is thread safe; the sqlite file can be shared between processes.
+
+    Parameters
+    ----------
+    path : str
+        path to the sqlite file, the parent directory is created if needed
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS url_keys "
+                "(url_key TEXT PRIMARY KEY, url TEXT)"
+            )
+
+    def resolve(self, url_keys, urls, chunk_size=500):
+        """
+        Representative URL of each key; unseen keys are registered with `urls`
+
+        Parameters
+        ----------
+        url_keys : Sequence[str]
+        urls : Sequence[str]
+            candidate representative of each key; the first wins for new keys
+        chunk_size : int
+            number of keys per sqlite query
+
+        Returns
+        -------
+        List[str]
+            representative URL, one per key
+        """
+        representatives = {}
+        with self._lock, self._conn:
+            unique_keys = list(dict.fromkeys(url_keys))
+            for i in range(0, len(unique_keys), chunk_size):
+                chunk = unique_keys[i : i + chunk_size]  # noqa: E203
+                query = (
+                    "SELECT url_key, url FROM url_keys "
+                    "WHERE url_key IN ({})".format(", ".join("?" * len(chunk)))
+                )
+                representatives.update(self._conn.execute(query, chunk))
+
+            new_keys = []
+            for url_key, url in zip(url_keys, urls):
+                if url_key not in representatives:
+                    representatives[url_key] = url
+                    new_keys.append((url_key, url))
+            self._conn.executemany(
+                "INSERT INTO url_keys VALUES (?, ?)", new_keys
+            )
+        return [representatives[url_key] for url_key in url_keys]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM url_keys"
+            ).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def dedup_urls(urls, registry=None):
+    """
+    Map each URL to its canonical key and the representative URL to classify
+
+    Without a registry, the first URL of each key in `urls` is its
+    representative. Use the returned table to fan results back out to every
+    input row, by joining the classified documents on `url`.
+
+    Examples
+    --------
+    >>> url_map_df = dedup_urls(url_df.content_url)
+    >>> dispatch_urls = url_map_df.url.unique()
+    >>> row_docs_df = url_map_df.merge(docs_df, on="url", how="left")
+
+    Parameters
+    ----------
+    urls : Sequence[str]
+        eg the `content_url` column of the GDELT dataframe
+    registry : UrlRegistry
+        optional, shares representatives across runs and years
+
+    Returns
+    -------
+    pd.DataFrame
+        same index as `urls` if it is a pd.Series, with columns
+        `content_url`, `url_key`, `url` (the representative) and `doc_id`
+    """
+    urls = pd.Series(urls)
+    url_keys = urls.map(utils.canonicalize_url)
+    # rows without a url keep a missing representative and doc_id
+    has_url = url_keys.notna()
+    if registry is not None:
+        representatives = pd.Series(None, index=urls.index, dtype=object)
+        representatives[has_url] = registry.resolve(
+            url_keys[has_url].tolist(), urls[has_url].tolist()
+        )
+    else:
+        representatives = urls.groupby(url_keys, sort=False).transform("first")
+
+    url_map_df = pd.DataFrame(
+        {"content_url": urls, "url_key": url_keys, "url": representatives},
+        index=urls.index,
+    )
+    url_map_df["doc_id"] = url_map_df.url.map(
+        utils.unique_hash, na_action="ignore"
+    )
+    n_unique = url_map_df.url.nunique()
+    _logger.debug(
+        "{} urls map to {} unique articles".format(
+            url_map_df.shape[0], n_unique
+        )
+    )
+    return url_map_df
@@ -6,17 +6,60 @@ import os
 import logging
 
 import click
+import pandas as pd
 
 from arg_mine import DATA_DIR
-from arg_mine.data.loaders import get_gdelt_df
-from arg_mine.api import classify
+from arg_mine.data.dedup import UrlRegistry, dedup_urls
+from arg_mine.data import gdelt_store
+from arg_mine.data.journal import ExtractionJournal, UrlState, JOURNAL_PATH_FMT
+from arg_mine.data.loaders import count_gdelt_rows, read_gdelt_rows
+from arg_mine.data.pipeline import ExtractionBatch, ExtractionPipeline
+from arg_mine.data.sinks import SINKS
+from arg_mine.data.work_queue import LeaseLost, LeaseQueue, run_worker
+from arg_mine.api import session
+from arg_mine.api.auth import CredentialPool, load_credentials
+from arg_mine.api.cache import ResponseCache, RefusalCache
 from arg_mine import utils
 
 
 _logger = utils.get_logger(__name__, logging.DEBUG)
 
 # formatted string template for the output filenames
-_WRITE_FILENAME_FMT = "gdelt_{year}_{data}_docs{start:0{ndigit}d}-{end:0{ndigit}d}.csv"
+_WRITE_FILENAME_FMT = (
+    "gdelt_{year}_{data}_docs{start:0{ndigit}d}-{end:0{ndigit}d}.{ext}"
+)
+
+
+def _open_gdelt_urls(year, csv_filepath):
+    """
+    Open the GDELT URLs of a year, from the columnar store if it has been
+    converted with `python -m arg_mine.data.gdelt_store`, otherwise by seeking
+    in the csv
+
+    Either way, only the selected rows are loaded.
+
+    Returns
+    -------
+    Tuple[int, Callable[[int, int], pd.Series]]
+        total number of rows, and a function returning the `content_url` of a
+        row range
+    """
+    if gdelt_store.has_gdelt_store(year):
+
+        def read_row_urls(start_row, end_row):
+            return gdelt_store.read_gdelt_store(
+                year,
+                columns=["content_url"],
+                start_row=start_row,
+                end_row=end_row,
+            ).content_url
+
+        return gdelt_store.gdelt_store_num_rows(year), read_row_urls
+
+    def read_csv_row_urls(start_row, end_row):
+        return read_gdelt_rows(csv_filepath, start_row, end_row).content_url
+
+    return count_gdelt_rows(csv_filepath), read_csv_row_urls
 
 
 @click.command()
@@ -39,27 +82,149 @@ _WRITE_FILENAME_FMT = "gdelt_{year}_{data}_docs{start:0{ndigit}d}-{end:0{ndigit}
     help="Ending row from document URL list for given year, exclusive.",
 )
 @click.option(
-    "--chunk-size",
-    default=100,
+    "--max-in-flight",
+    default=3,
     type=int,
-    help="how many articles to process in each iteration; used to clear grequests memory leak",
+    help=(
+        "Maximum number of concurrent requests per API key; the server "
+        "limits each key to about 3. Extra keys are read from "
+        "ARGUMENTEXT_USERID_1/ARGUMENTEXT_KEY_1, ... "
+        "or ARGUMENTEXT_CREDENTIALS_FILE"
+    ),
+)
+@click.option(
+    "--adaptive/--fixed-concurrency",
+    default=False,
+    help=(
+        "Adapt the concurrency of each API key to the server load, "
+        "up to --max-in-flight"
+    ),
 )
 @click.option(
     "--batch-size",
     default=None,
     type=int,
     help=(
-        "How many articles to iterate through before writing to output file. "
+        "How many articles to write to each output file. "
         "If set to None, the extraction will write all outputs to single files, rather than batched"
     ),
 )
 @click.option(
     "--year", default=2020, type=int, help="Which GDELT year to run the extraction on"
 )
-def main(ndocs, start_row, end_row, chunk_size, batch_size, year):
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    help="Use the on-disk classify response cache in data/interim",
+)
+@click.option(
+    "--refresh-cache",
+    is_flag=True,
+    default=False,
+    help="Ignore cached responses, re-classify and overwrite them",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help=(
+        "Skip URLs that were classified or refused in a previous run, per "
+        "the journal in data/interim, and append to the existing output files"
+    ),
+)
+@click.option(
+    "--skip-refused/--no-skip-refused",
+    default=True,
+    help=(
+        "Skip URLs the server recently refused to crawl, and hostnames that "
+        "are nearly always refused, per the refusal cache in data/interim"
+    ),
+)
+@click.option(
+    "--dedup/--no-dedup",
+    default=True,
+    help=(
+        "Classify each canonical article once, mapping duplicate and variant "
+        "URLs to it in the urlmap output files"
+    ),
+)
+@click.option(
+    "--output-format",
+    default="csv",
+    type=click.Choice(list(SINKS)),
+    help="File format of the docs, sentences and urlmap outputs",
+)
+@click.option(
+    "--parse-workers",
+    default=2,
+    type=int,
+    help="Number of threads parsing responses, while the next are fetched",
+)
+@click.option(
+    "--queue-size",
+    default=64,
+    type=int,
+    help=(
+        "Maximum number of responses waiting between the fetch, parse and "
+        "write stages; a full queue pauses the stage before it"
+    ),
+)
+@click.option(
+    "--work-queue",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help=(
+        "Run as a worker, extracting the row ranges leased from this shared "
+        "queue until none are left, in place of the row options and --year. "
+        "Create the queue with `python -m arg_mine.data.work_queue init`"
+    ),
+)
+@click.option(
+    "--worker-id",
+    default=None,
+    help=(
+        "Name of this worker in the --work-queue, "
+        "default the hostname and process id"
+    ),
+)
+def main(
+    ndocs,
+    start_row,
+    end_row,
+    max_in_flight,
+    adaptive,
+    batch_size,
+    year,
+    cache,
+    refresh_cache,
+    resume,
+    skip_refused,
+    dedup,
+    output_format,
+    parse_workers,
+    queue_size,
+    work_queue,
+    worker_id,
+):
     """
     Download and extract GDELT data to "data/raw/2020-climate-change-narrative"
     """
+    extract_kwargs = dict(
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        adaptive=adaptive,
+        cache=cache,
+        refresh_cache=refresh_cache,
+        skip_refused=skip_refused,
+        dedup=dedup,
+        output_format=output_format,
+        parse_workers=parse_workers,
+        queue_size=queue_size,
+    )
+    if work_queue:
+        _run_lease_worker(work_queue, worker_id, resume, extract_kwargs)
+        return
+
     assert ndocs or end_row, (
         "Need to either have valid `ndocs` or `end_row`, given:\n"
         "ndocs: {}, start_row={}, end_row={}".format(ndocs, start_row, end_row)
@@ -69,27 +234,34 @@ def main(ndocs, start_row, end_row, chunk_size, batch_size, year):
         range(2015, 2021)
     ), "Given year does not match available years (2015-2020), given: {}".format(year)
 
-    # load input data
-    topic = "climate change"
-    in_csv_datapath = os.path.join(DATA_DIR, "raw", "2020-climate-change-narrative")
-    csv_filepath = os.path.join(
+    # total number of documents in the target year
+    total_n_docs, _ = _open_gdelt_urls(year, _gdelt_csv_filepath(year))
+    start_row, end_row = _select_rows(ndocs, start_row, end_row, total_n_docs)
+    extract_rows(year, start_row, end_row, resume=resume, **extract_kwargs)
+
+
+def _gdelt_csv_filepath(year):
+    in_csv_datapath = os.path.join(
+        DATA_DIR, "raw", "2020-climate-change-narrative"
+    )
+    return os.path.join(
         in_csv_datapath, "WebNewsEnglishSnippets.{}.csv".format(year)
     )
 
-    url_df = get_gdelt_df(csv_filepath)
-    total_n_docs = url_df.shape[0]  # total number of documents in the target year
 
-    # set up output directory
-    target_dir = "gdelt-climate-change-docs-test"
-    out_data_path = os.path.join(DATA_DIR, "processed", target_dir)
-    os.makedirs(out_data_path, exist_ok=True)
+def _select_rows(ndocs, start_row, end_row, total_n_docs):
+    """
+    Resolve the row range to extract from the CLI options
 
+    Returns
+    -------
+    Tuple[int, int]
+        start_row, and the exclusive end_row
+    """
     # check if ndocs is bigger than the size of the source data, and limit
     if not ndocs or ndocs > total_n_docs:
         ndocs = total_n_docs
 
-    batch_size = batch_size or total_n_docs
-
     # Select the target URLS, up to ndocs
     # Note that this is always starting from zero. A future iteration can add
     # start/stop commands to the application for more targeted batches
@@ -120,99 +292,314 @@ def main(ndocs, start_row, end_row, chunk_size, batch_size, year):
         raise ValueError(msg)
 
     print("ndocs: {}, start_row={}, end_row={}".format(ndocs, start_row, end_row))
+    return start_row, end_row
 
-    # crop the URL list
-    url_list = url_df.content_url.values[start_row:end_row]
 
-    ndigit = len(str(total_n_docs))  # zero padding for doc counts
+def _run_lease_worker(work_queue, worker_id, resume, extract_kwargs):
+    """Extract the row ranges claimed from a shared lease queue, until done"""
 
-    # TODO: better is to wrap the output pattern rather than repeat it
-    if ndocs >= batch_size and total_n_docs > batch_size:
-        _logger.info(
-            "Running {} BATCHED documents from file: {}, batch size={}".format(
-                ndocs, csv_filepath, batch_size
-            )
+    def extract_lease(lease):
+        # a reclaimed lease resumes from where its previous worker stopped
+        extract_rows(
+            lease.year,
+            lease.start_row,
+            lease.end_row,
+            resume=resume or lease.attempts > 1,
+            lease=lease,
+            **extract_kwargs,
         )
 
-        # we write and append in batches
-        # iterate through the url_list, but use start_row to keep track of where we started
-        # TODO: simplify the indexing between the CSV file rows and the url_list batches
-        for batch_ix, doc_ix in enumerate(range(0, len(url_list), batch_size)):
-            start_ix = doc_ix
-            end_ix = doc_ix + batch_size - 1  # this is inclusive!!!
-            _logger.debug("Running batch {} [{}-{}]".format(batch_ix, start_ix, end_ix))
-            responses = classify.fetch_concurrent(
-                topic, url_list=url_list[start_ix : end_ix + 1], chunk_size=chunk_size,
-            )
-            docs_df, sentences_df, missing_docs = classify.process_responses(responses)
-
-            # save outputs to CSV
-            docs_df.to_csv(
-                os.path.join(
-                    out_data_path,
-                    _WRITE_FILENAME_FMT.format(
-                        data="docs",
-                        start=start_row + start_ix,
-                        end=start_row + end_ix,
-                        ndigit=ndigit,
-                        year=year,
-                    ),
-                ),
-                header=True,
-                index=False,
-            )
-            sentences_df.to_csv(
-                os.path.join(
-                    out_data_path,
-                    _WRITE_FILENAME_FMT.format(
-                        data="sentences",
-                        start=start_row + start_ix,
-                        end=start_row + end_ix,
-                        ndigit=ndigit,
-                        year=year,
-                    ),
-                ),
-                header=True,
-                index=False,
-            )
+    with LeaseQueue(work_queue) as lease_queue:
+        run_worker(lease_queue, extract_lease, worker_id=worker_id)
+        _logger.info("lease states: {}".format(lease_queue.counts()))
+
+
+def extract_rows(
+    year,
+    start_row,
+    end_row,
+    batch_size=None,
+    max_in_flight=3,
+    adaptive=False,
+    cache=True,
+    refresh_cache=False,
+    resume=False,
+    skip_refused=True,
+    dedup=True,
+    output_format="csv",
+    parse_workers=2,
+    queue_size=64,
+    lease=None,
+):
+    """
+    Classify the URLs of a row range of a GDELT year, writing the outputs in
+    batches to "data/processed"
+
+    The options are the same as the CLI options.
 
+    Parameters
+    ----------
+    year : int
+    start_row : int
+    end_row : int
+        exclusive
+    batch_size : int
+        number of rows written to each output file, default all in one file
+    lease : work_queue.Lease
+        optional, the lease the rows were claimed with. Raises `LeaseLost`
+        before the next batch once the lease is lost
+    """
+    # load input data
+    topic = "climate change"
+    csv_filepath = _gdelt_csv_filepath(year)
+
+    # total number of documents in the target year
+    total_n_docs, read_row_urls = _open_gdelt_urls(year, csv_filepath)
+
+    # set up output directory
+    target_dir = "gdelt-climate-change-docs-test"
+    out_data_path = os.path.join(DATA_DIR, "processed", target_dir)
+    os.makedirs(out_data_path, exist_ok=True)
+
+    batch_size = batch_size or max(end_row - start_row, 1)
+
+    # crop the URL list, and map each row to its article's representative URL
+    row_urls = read_row_urls(start_row, end_row)
+    if dedup:
+        url_map_df = dedup_urls(row_urls, registry=UrlRegistry())
     else:
-        _logger.info(
-            "Running {} documents from {} docs in file: {}".format(
-                ndocs, total_n_docs, csv_filepath
-            )
+        url_map_df = pd.DataFrame({"content_url": row_urls, "url": row_urls})
+        url_map_df["doc_id"] = url_map_df.url.map(
+            utils.unique_hash, na_action="ignore"
         )
-        responses = classify.fetch_concurrent(
-            topic, url_list=url_list, chunk_size=chunk_size
+    url_map_df.index.name = "row"
+
+    response_cache = ResponseCache(bypass=refresh_cache) if cache else None
+    journal = ExtractionJournal(JOURNAL_PATH_FMT.format(year=year))
+    refusal_cache = RefusalCache()
+    credential_pool = CredentialPool(
+        load_credentials(), max_in_flight=max_in_flight, adaptive=adaptive
+    )
+    _logger.info("Using {} API keys".format(len(credential_pool.keys)))
+
+    _logger.info(
+        "Running rows [{}, {}) from {} docs in file: {}, batch size={}".format(
+            start_row, end_row, total_n_docs, csv_filepath, batch_size
         )
-        docs_df, sentences_df, missing_docs = classify.process_responses(responses)
-        print(docs_df.shape)
-        print(len(missing_docs))
-        # save outputs to CSV
-        docs_df.to_csv(
-            os.path.join(
-                out_data_path,
-                _WRITE_FILENAME_FMT.format(
-                    data="docs", start=start_row, end=ndocs, ndigit=ndigit, year=year,
-                ),
-            ),
-            header=True,
-            index=False,
+    )
+
+    # the fetch stage runs over all the batches, so requests keep flowing
+    # from one batch to the next
+    pipeline = ExtractionPipeline(
+        topic,
+        journal,
+        refusal_cache=refusal_cache,
+        append=resume,
+        parse_workers=parse_workers,
+        queue_size=queue_size,
+        cache=response_cache,
+        credential_pool=credential_pool,
+    )
+    batches = _iter_batches(
+        url_map_df,
+        batch_size,
+        journal,
+        refusal_cache,
+        out_data_path=out_data_path,
+        year=year,
+        start_row=start_row,
+        ndigit=len(str(total_n_docs)),  # zero padding for doc counts
+        output_format=output_format,
+        resume=resume,
+        skip_refused=skip_refused,
+        lease=lease,
+    )
+    try:
+        _logger.info("pipeline stats: {}".format(pipeline.run(batches)))
+        _logger.debug("API key stats: {}".format(credential_pool.stats()))
+        _logger.info("journal url states: {}".format(journal.counts()))
+    finally:
+        # a worker runs many row ranges in one process
+        for store in (journal, refusal_cache, response_cache):
+            if store is not None:
+                store.close()
+
+
+def _iter_batches(
+    url_map_df,
+    batch_size,
+    journal,
+    refusal_cache,
+    out_data_path,
+    year,
+    start_row=0,
+    ndigit=1,
+    output_format="csv",
+    resume=False,
+    skip_refused=True,
+    lease=None,
+):
+    """
+    Split the URLs into batches, each written to its own output files
+
+    Batches are created lazily, as the pipeline runs out of URLs, so the
+    refusal cache filter uses the refusals of the batches before. Writes the
+    urlmap file of each batch. Rows without a URL are only written to the
+    urlmap, unclassified.
+
+    Parameters
+    ----------
+    url_map_df : pd.DataFrame
+        representative `url` of each GDELT row, see `dedup.dedup_urls`
+    batch_size : int
+        number of GDELT rows per batch
+    journal : ExtractionJournal
+    refusal_cache : RefusalCache
+    out_data_path : str
+        directory of the output files
+    year : int
+    start_row : int
+        GDELT row of the first URL, to number the output files
+    ndigit : int
+        zero padding of the row numbers in the output filenames
+    output_format : str
+        key of `sinks.SINKS`
+    resume : bool
+        skip the URLs finished in a previous run, per the journal
+    skip_refused : bool
+        skip the URLs likely refused, per the refusal cache
+    lease : work_queue.Lease
+        optional, checked before each batch: raises `LeaseLost` once it is
+        lost, which stops the pipeline
+
+    Yields
+    ------
+    ExtractionBatch
+    """
+    url_list = url_map_df.url.values
+    # representative urls already sent in earlier batches
+    dispatched_urls = set()
+
+    # iterate through the url_list; start_row keeps track of where we started
+    for batch_ix, doc_ix in enumerate(range(0, len(url_list), batch_size)):
+        if lease is not None and lease.lost:
+            raise LeaseLost("lease {} was lost".format(lease.lease_id))
+        start_ix = doc_ix
+        # this is inclusive!!!
+        end_ix = min(doc_ix + batch_size, len(url_list)) - 1
+        batch_urls = [
+            url
+            for url in pd.unique(url_list[start_ix : end_ix + 1])  # noqa: E203
+            if pd.notna(url) and url not in dispatched_urls
+        ]
+        dispatched_urls.update(batch_urls)
+        if resume:
+            batch_urls = journal.filter_unfinished(batch_urls)
+        if skip_refused:
+            batch_urls, skipped_urls = refusal_cache.filter_urls(batch_urls)
+            for url in skipped_urls:
+                journal.record(
+                    url, UrlState.REFUSED, detail="skipped, refusal cache"
+                )
+        _logger.debug(
+            "Running batch {} [{}-{}], {} urls".format(
+                batch_ix, start_ix, end_ix, len(batch_urls)
+            )
         )
-        sentences_df.to_csv(
+        docs_filepath, sentences_filepath, url_map_filepath = [
             os.path.join(
                 out_data_path,
                 _WRITE_FILENAME_FMT.format(
-                    data="sentences",
-                    start=start_row,
-                    end=ndocs,
+                    data=data,
+                    start=start_row + start_ix,
+                    end=start_row + end_ix,
                     ndigit=ndigit,
                     year=year,
+                    ext=output_format,
                 ),
-            ),
-            header=True,
-            index=False,
+            )
+            for data in ("docs", "sentences", "urlmap")
+        ]
+        # fan out: lets each GDELT row of the batch find its classified
+        # document
+        _write_url_map(
+            url_map_df.iloc[start_ix : end_ix + 1],  # noqa: E203
+            url_map_filepath,
         )
+        yield ExtractionBatch(
+            batch_ix, batch_urls, docs_filepath, sentences_filepath
+        )
+
+
+def _write_url_map(url_map_df, filepath):
+    """Write the urlmap of a batch, in the format of the file extension"""
+    if filepath.endswith(".parquet"):
+        url_map_df.to_parquet(filepath, index=True)
+    else:
+        url_map_df.to_csv(filepath, header=True, index=True)
+
+
+def extract_batch(
+    topic,
+    urls,
+    docs_filepath,
+    sentences_filepath,
+    journal,
+    max_in_flight=session.DEFAULT_POOL_SIZE,
+    cache=None,
+    refusal_cache=None,
+    append=False,
+    **classify_kwargs,
+):
+    """
+    Classify a batch of URLs, appending the docs and sentences to output sinks
+    as each URL completes
+
+    The output format is chosen by the file extension, see `sinks.open_sink`.
+    A URL is recorded in the journal only once its rows are durable: right away
+    for CSV, where each document is synced to disk, and when the file is closed
+    for Parquet. A crash loses at most the rows that were not durable yet,
+    which are classified again when resuming. A crash between a CSV sync and
+    the journal record can duplicate a document's rows when resuming; these are
+    identified by `doc_id`.
+
+    Parameters
+    ----------
+    topic : str
+    urls : Iterable[str]
+    docs_filepath : str
+        ending in ".csv" or ".parquet"
+    sentences_filepath : str
+        ending in ".csv" or ".parquet"
+    journal : ExtractionJournal
+        records the terminal state of each URL
+    max_in_flight : int
+        maximum number of concurrent requests
+    cache : ResponseCache
+        optional classify response cache
+    refusal_cache : RefusalCache
+        optional, records which URLs were refused by the server
+    append : bool
+        if True, append to existing output files, eg when resuming
+    classify_kwargs
+        passed on to `ExtractionPipeline`, eg a limiter or `parse_workers`
+
+    Returns
+    -------
+    None
+    """
+    pipeline = ExtractionPipeline(
+        topic,
+        journal,
+        refusal_cache=refusal_cache,
+        append=append,
+        max_in_flight=max_in_flight,
+        cache=cache,
+        **classify_kwargs,
+    )
+    pipeline.run(
+        [ExtractionBatch(0, list(urls), docs_filepath, sentences_filepath)]
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+"""
+Columnar store of the GDELT URL datasets, for fast partial reads
+
+Converts each yearly `WebNewsEnglishSnippets.{year}.csv` once into uncompressed
+Arrow IPC files, partitioned as ``year={year}/month={month:02d}/part-0.arrow``.
+Reads memory map the files, so only the requested columns and row ranges are
+touched on disk.
+
+Requires the optional dependency `pyarrow`.
+"""
+import glob
+import logging
+import os
+import shutil
+
+import click
+import pandas as pd
+
+from arg_mine import DATA_DIR
+from arg_mine.data.loaders import get_gdelt_df
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+GDELT_CSV_PATH_FMT = os.path.join(
+    DATA_DIR,
+    "raw",
+    "2020-climate-change-narrative",
+    "WebNewsEnglishSnippets.{year}.csv",
+)
+DEFAULT_STORE_DIR = os.path.join(
+    DATA_DIR, "interim", "gdelt-climate-change-store"
+)
+
+# position of each row in the source csv, used to select row ranges
+ROW_COLUMN = "row"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute  # noqa: F401
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "The GDELT columnar store requires pyarrow, install it with "
+            "`pip install pyarrow`"
+        ) from e
+    return pyarrow
+
+
+def _year_dir(year, store_dir):
+    return os.path.join(store_dir, "year={}".format(year))
+
+
+def has_gdelt_store(year, store_dir=DEFAULT_STORE_DIR):
+    """Return True if the given year was converted to the columnar store"""
+    return os.path.isdir(_year_dir(year, store_dir))
+
+
+def convert_gdelt_csv(csv_filepath, year, store_dir=DEFAULT_STORE_DIR):
+    """
+    Convert a yearly GDELT CSV into the columnar store, replacing any old one
+
+    The partitions are keyed by the dataset `year` and the month of each row's
+    timestamp. Each row keeps its position in the CSV in the `row` column.
+
+    Parameters
+    ----------
+    csv_filepath : str
+        path to `WebNewsEnglishSnippets.{year}.csv`
+    year : int
+        year of the dataset
+    store_dir : str
+        root directory of the store
+
+    Returns
+    -------
+    str
+        directory of the converted year
+    """
+    pa = _import_pyarrow()
+    df = get_gdelt_df(csv_filepath)
+    df.insert(0, ROW_COLUMN, pd.RangeIndex(df.shape[0], dtype="int64"))
+
+    year_dir = _year_dir(year, store_dir)
+    tmp_dir = year_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    for month, month_df in df.groupby(df.timestamp.dt.month, sort=True):
+        table = pa.Table.from_pandas(month_df, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {
+                "row_min": str(month_df[ROW_COLUMN].min()),
+                "row_max": str(month_df[ROW_COLUMN].max()),
+                "num_rows": str(month_df.shape[0]),
+            }
+        )
+        month_dir = os.path.join(tmp_dir, "month={:02d}".format(month))
+        os.makedirs(month_dir)
+        with pa.OSFile(os.path.join(month_dir, "part-0.arrow"), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    # swap in the complete conversion, so readers never see a partial year
+    shutil.rmtree(year_dir, ignore_errors=True)
+    os.replace(tmp_dir, year_dir)
+    _logger.info("converted {} rows to {}".format(df.shape[0], year_dir))
+    return year_dir
+
+
+def _partition_paths(year, store_dir):
+    paths = sorted(
+        glob.glob(
+            os.path.join(_year_dir(year, store_dir), "month=*", "*.arrow")
+        )
+    )
+    if not paths:
+        raise IOError(
+            "No GDELT store partitions found for year {} in {}".format(
+                year, store_dir
+            )
+        )
+    return paths
+
+
+def gdelt_store_num_rows(year, store_dir=DEFAULT_STORE_DIR):
+    """
+    Number of rows of the converted year, from the partition metadata only
+
+    Parameters
+    ----------
+    year : int
+    store_dir : str
+
+    Returns
+    -------
+    int
+    """
+    pa = _import_pyarrow()
+    num_rows = 0
+    for path in _partition_paths(year, store_dir):
+        with pa.memory_map(path, "r") as source:
+            num_rows += int(
+                pa.ipc.open_file(source).schema.metadata[b"num_rows"]
+            )
+    return num_rows
+
+
+def read_gdelt_store(
+    year, columns=None, start_row=0, end_row=None, store_dir=DEFAULT_STORE_DIR
+):
+    """
+    Read selected columns and rows of a converted GDELT year, memory mapped
+
+    Partitions outside the row range are skipped using their metadata.
+
+    Examples
+    --------
+    >>> url_df = read_gdelt_store(
+    ...     2020, columns=["content_url"], start_row=1000, end_row=2000
+    ... )
+    >>> url_df.content_url.iloc[0]  # row 1000 of the 2020 csv
+
+    Parameters
+    ----------
+    year : int
+    columns : List[str]
+        columns to read, default all; the `row` column is always the index
+    start_row : int
+        first row of the source csv to read
+    end_row : int
+        stop before this row of the source csv, default to the end
+    store_dir : str
+
+    Returns
+    -------
+    pd.DataFrame
+        indexed by `row`, the position in the source csv, in ascending order
+    """
+    pa = _import_pyarrow()
+    pc = pa.compute
+    start_row = start_row or 0
+    end_row = float("inf") if end_row is None else end_row
+
+    df_list = []
+    for path in _partition_paths(year, store_dir):
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata
+            if (
+                int(metadata[b"row_max"]) < start_row
+                or int(metadata[b"row_min"]) >= end_row
+            ):
+                continue
+            table = reader.read_all()
+            if columns is not None:
+                table = table.select([ROW_COLUMN] + list(columns))
+            rows = table[ROW_COLUMN]
+            mask = pc.greater_equal(rows, start_row)
+            if end_row != float("inf"):
+                mask = pc.and_(mask, pc.less(rows, end_row))
+            df_list.append(table.filter(mask).to_pandas())
+
+    if not df_list:
+        return pd.DataFrame(columns=columns).rename_axis(ROW_COLUMN)
+    return (
+        pd.concat(df_list, ignore_index=True)
+        .set_index(ROW_COLUMN)
+        .sort_index()
+    )
+
+
+@click.command()
+@click.option(
+    "--year",
+    "years",
+    type=int,
+    multiple=True,
+    help="year to convert, can be repeated; default all",
+)
+def main(years):
+    """
+    Convert the downloaded GDELT CSVs to the columnar store in "data/interim"
+    """
+    for year in years or range(2015, 2021):
+        convert_gdelt_csv(GDELT_CSV_PATH_FMT.format(year=year), year)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Crash-safe journal of per-URL extraction states, for resuming interrupted runs
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from arg_mine import DATA_DIR
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+JOURNAL_PATH_FMT = os.path.join(
+    DATA_DIR, "interim", "extract_journal_{year}.sqlite"
+)
+
+
+class UrlState:
+    """enum for the terminal state of a URL extraction"""
+
+    CLASSIFIED = "classified"
+    REFUSED = "refused"
+    FAILED = "failed"
+
+
+# states that are skipped when resuming; failed URLs are tried again
+FINISHED_STATES = (UrlState.CLASSIFIED, UrlState.REFUSED)
+
+
+class ExtractionJournal:
+    """
+    SQLite-backed record of the terminal state of each extracted URL
+
+    Each call to `record` is committed immediately, so after a crash the
+    journal holds every URL that completed before it. Record a URL only once
+    its outputs are written, so a resumed run never skips unsaved results.
+
+    This class is thread safe.
+
+    Examples
+    --------
+    >>> journal = ExtractionJournal(JOURNAL_PATH_FMT.format(year=2020))
+    >>> todo_urls = journal.filter_unfinished(url_list)
+    >>> journal.record(url, UrlState.CLASSIFIED)
+
+    Parameters
+    ----------
+    path : str
+        path to the sqlite file, the parent directory is created if needed
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS url_states ("
+                "url TEXT PRIMARY KEY, state TEXT, detail TEXT, updated REAL)"
+            )
+
+    def record(self, url, state, detail=None):
+        """
+        Record the terminal state of a URL, replacing any previous state
+
+        Parameters
+        ----------
+        url : str
+        state : str
+            one of UrlState
+        detail : str
+            optional, eg the error message for a failed URL
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO url_states VALUES (?, ?, ?, ?)",
+                (url, state, detail, time.time()),
+            )
+
+    def get_state(self, url):
+        """Recorded UrlState of a URL, or None if it has not completed"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM url_states WHERE url = ?", (url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def filter_unfinished(self, urls, states=FINISHED_STATES, chunk_size=500):
+        """
+        Drop the URLs that already finished in a previous run
+
+        Only the given URLs are looked up, so filtering each batch of a resumed
+        run does not load the whole journal.
+
+        Parameters
+        ----------
+        urls : Iterable[str]
+        states : Sequence[str]
+            which recorded states count as finished
+        chunk_size : int
+            number of URLs per sqlite query
+
+        Returns
+        -------
+        List[str]
+            in the same order as `urls`
+        """
+        urls = list(urls)
+        unique_urls = list(dict.fromkeys(urls))
+        finished = set()
+        with self._lock:
+            for i in range(0, len(unique_urls), chunk_size):
+                chunk = unique_urls[i : i + chunk_size]  # noqa: E203
+                query = (
+                    "SELECT url FROM url_states WHERE url IN ({}) "
+                    "AND state IN ({})".format(
+                        ", ".join("?" * len(chunk)),
+                        ", ".join("?" * len(states)),
+                    )
+                )
+                finished.update(
+                    row[0]
+                    for row in self._conn.execute(
+                        query, tuple(chunk) + tuple(states)
+                    )
+                )
+        return [url for url in urls if url not in finished]
+
+    def counts(self):
+        """
+        Number of recorded URLs in each state
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM url_states GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
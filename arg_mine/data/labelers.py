@@ -1,7 +1,15 @@
 """
 Tools for adding ground truth labels to datasets
 """
+from concurrent.futures import ProcessPoolExecutor
+import bisect
+import itertools
 import logging
+import multiprocessing
+import os
+import re
+
+import numpy as np
 import pandas as pd  # noqa: F401, datatype
 from nltk import tokenize
 
@@ -21,11 +29,16 @@ GDELT_KEYWORDS = [
 
 CONTEXT_LABEL = "has_context"
 
+# sentence rows of a document without sentences
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
 
 def match_doc_id(url, docs_df):
     """
     Return the first matching row with the target URL
 
+    This scans `docs_df`; use a `SentenceIndex` for repeated lookups.
+
     Parameters
     ----------
     url : str
@@ -42,6 +55,8 @@ def get_doc_sentences(doc_id, sentences_df):
     """
     Given a unique document ID, return all sentences from that document
 
+    This scans `sentences_df`; use a `SentenceIndex` for repeated lookups.
+
     Parameters
     ----------
     doc_id : str
@@ -54,8 +69,141 @@ def get_doc_sentences(doc_id, sentences_df):
     return sentences_df[sentences_df.doc_id == doc_id]
 
 
+class SentenceIndex:
+    """
+    Lookup of the documents and sentences of a set of extracted frames
+
+    Equivalent to `match_doc_id` and `get_doc_sentences`, without scanning the
+    frames for each lookup. Build it once and share it between the calls that
+    look up documents, such as labeling each GDELT row.
+
+    The sentence rows are sorted by document, keeping their order within each
+    document, and an offset array gives where each document's rows start. A
+    document's sentences are a contiguous slice of the sorted rows.
+
+    The index holds positions, so `sentences_df` must not be reordered or have
+    rows added or removed after the index is built; adding columns is fine.
+
+    Parameters
+    ----------
+    docs_df : pd.DataFrame
+        with `url` and `doc_id`
+    sentences_df : pd.DataFrame
+        with `doc_id`
+    """
+
+    def __init__(self, docs_df, sentences_df):
+        self.sentences_df = sentences_df
+
+        # the first doc_id of each url, as in `match_doc_id`
+        unique_docs_df = docs_df.drop_duplicates("url")
+        self._url_doc_ids = dict(
+            zip(unique_docs_df.url, unique_docs_df.doc_id)
+        )
+
+        # sentences without a doc_id have code -1, and sort before the others
+        doc_codes, doc_ids = pd.factorize(sentences_df["doc_id"])
+        n_docs = len(doc_ids)
+        rows = np.argsort(doc_codes, kind="stable").astype(np.intp)
+        self._rows = rows[np.count_nonzero(doc_codes < 0) :]  # noqa: E203
+        self._offsets = np.zeros(n_docs + 1, dtype=np.intp)
+        np.cumsum(
+            np.bincount(doc_codes[doc_codes >= 0], minlength=n_docs),
+            out=self._offsets[1:],
+        )
+        self._doc_codes = dict(zip(doc_ids, range(len(doc_ids))))
+
+    def __len__(self):
+        return len(self._doc_codes)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._doc_codes
+
+    def doc_id(self, url):
+        """
+        Return the doc_id of the first document with the target URL
+
+        Parameters
+        ----------
+        url : str
+
+        Returns
+        -------
+        str
+
+        Raises
+        ------
+        KeyError
+            if no document has the URL
+        """
+        return self._url_doc_ids[url]
+
+    def sentence_rows(self, doc_id):
+        """
+        Positions in `sentences_df` of the sentences of a document, in order
+
+        Parameters
+        ----------
+        doc_id : str
+
+        Returns
+        -------
+        np.ndarray
+            empty for a document without sentences
+        """
+        code = self._doc_codes.get(doc_id)
+        if code is None:
+            return _NO_ROWS
+        start, end = self._offsets[code], self._offsets[code + 1]
+        return self._rows[start:end]
+
+    def doc_sentences(self, doc_id):
+        """
+        Given a unique document ID, return all sentences from that document
+
+        Parameters
+        ----------
+        doc_id : str
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        return self.sentences_df.iloc[self.sentence_rows(doc_id)]
+
+
+def context_tokens(snippit):
+    """
+    Split a GDELT context snippet into the sentence tokens to match in its doc
+
+    Parameters
+    ----------
+    snippit : str
+        the `topic_context` of a GDELT row
+
+    Returns
+    -------
+    List[str]
+        regex patterns, as matched by `pd.Series.str.contains`
+    """
+    # sanitize, removing odd punctuation
+    # TODO: sanitizing is getting more and more complicated!
+    snippit = snippit.replace("[", "").replace("]", "")
+    snippit = snippit.replace("(", "").replace(")", "")
+    snippit = snippit.replace("/", "").replace("\\", "")
+    snippit = snippit.replace("+", "")
+    snippit = snippit.replace("*", "").strip()
+    return [
+        token for token in tokenize.sent_tokenize(snippit) if len(token) >= 2
+    ]
+
+
 def label_doc_sentences_with_context(
-    url_row, docs_df, sentences_df, label_col_name=CONTEXT_LABEL
+    url_row,
+    docs_df,
+    sentences_df,
+    label_col_name=CONTEXT_LABEL,
+    sentence_index=None,
 ):
     """
     Ugly way to label which sentences are used in context of the GDELT keywords
@@ -75,6 +223,8 @@ def label_doc_sentences_with_context(
     sentences_df : pd.DataFrame
     label_col_name : str
         name to use for the label column
+    sentence_index : SentenceIndex
+        index of docs_df and sentences_df, to look up the doc without a scan
 
     NOTE:
 
@@ -82,25 +232,20 @@ def label_doc_sentences_with_context(
     -------
 
     """
+    if label_col_name not in sentences_df.columns:
+        sentences_df[label_col_name] = False
     content_url = url_row["content_url"]
-    snippit = url_row["topic_context"]
-    doc_id = match_doc_id(content_url, docs_df)
-    doc_sentences = get_doc_sentences(doc_id, sentences_df)
-
-    # sanitize, removing odd punctuation
-    # TODO: sanitizing is getting more and more complicated!
-    snippit = snippit.replace("[", "").replace("]", "")
-    snippit = snippit.replace("(", "").replace(")", "")
-    snippit = snippit.replace("/", "").replace("\\", "")
-    snippit = snippit.replace("+", "")
-    snippit = snippit.replace("*", "").strip()
+    if sentence_index is None:
+        doc_id = match_doc_id(content_url, docs_df)
+        doc_sentences = get_doc_sentences(doc_id, sentences_df)
+    else:
+        doc_id = sentence_index.doc_id(content_url)
+        doc_sentences = sentence_index.doc_sentences(doc_id)
 
     # tokenize the GT context into sentences
-    arg_tokens = tokenize.sent_tokenize(snippit)
+    arg_tokens = context_tokens(url_row["topic_context"])
 
     for token in arg_tokens:
-        if len(token) < 2:
-            continue
         try:
             matches = doc_sentences[
                 doc_sentences.sentence_original.str.contains(token)
@@ -119,36 +264,224 @@ def label_doc_sentences_with_context(
             sentences_df["sentence_id"] == matches.values[0], label_col_name
         ] = True
     # fill all rows that aren't true with False
-    sentences_df.fillna(value=False, inplace=True)
+    sentences_df[label_col_name] = sentences_df[label_col_name].fillna(
+        value=False
+    )
     return sentences_df
 
 
-def label_gdelt_context(url_df, docs_df, sentences_df, label_col_name=CONTEXT_LABEL):
+def _first_matching_sentences(tokens, sentences):
+    """
+    Position of the first sentence matching each token, as `str.contains`
+
+    Rather than testing each sentence, each token is searched once in the text
+    of the whole document, one sentence per line. As `.` does not match a
+    newline, a match never spans two sentences, so the first match is in the
+    first matching sentence. Tokens or sentences with a newline are tested
+    sentence by sentence.
+
+    Parameters
+    ----------
+    tokens : List[str]
+        regex patterns, see `context_tokens`
+    sentences : Sequence[Optional[str]]
+        the sentences of a document, in order; missing sentences never match
+
+    Returns
+    -------
+    List[int]
+        positions in `sentences`, for the tokens that matched
+    """
+    # compiled even without sentences, so invalid tokens always raise re.error
+    patterns = [re.compile(token, re.MULTILINE) for token in tokens]
+    lines = [s if isinstance(s, str) else "" for s in sentences]
+    missing = [not isinstance(s, str) for s in sentences]
+    if not lines:
+        return []
+
+    text = "\n".join(lines)
+    line_starts = [0]
+    for line in lines[:-1]:
+        line_starts.append(line_starts[-1] + len(line) + 1)
+    any_newline_lines = any("\n" in line for line in lines)
+
+    positions = []
+    for token, pattern in zip(tokens, patterns):
+        if any_newline_lines or "\n" in token:
+            # the match could span lines, test each sentence
+            pattern = re.compile(token)
+            matches = (
+                i
+                for i, line in enumerate(lines)
+                if not missing[i] and pattern.search(line)
+            )
+            positions.extend(itertools.islice(matches, 1))
+            continue
+        # ^ and $ match at each sentence start and end, as in a lone sentence
+        match = pattern.search(text)
+        while match is not None:
+            line_ix = bisect.bisect_right(line_starts, match.start()) - 1
+            if not missing[line_ix]:
+                positions.append(line_ix)
+                break
+            if line_ix + 1 == len(lines):
+                break
+            match = pattern.search(text, line_starts[line_ix + 1])
+    return positions
+
+
+def _match_context_rows(work, sentence_texts):
+    """
+    Rows of the first sentences matching each context token
+
+    Parameters
+    ----------
+    work : List[Tuple[str, str, np.ndarray]]
+        content_url, topic_context, and the rows of its document's sentences
+    sentence_texts : np.ndarray
+        the `sentence_original` of all the sentences
+
+    Returns
+    -------
+    np.ndarray
+        rows of `sentence_texts`
+    """
+    matched_rows = [_NO_ROWS]
+    for content_url, snippit, rows in work:
+        arg_tokens = context_tokens(snippit)
+        try:
+            positions = _first_matching_sentences(
+                arg_tokens, sentence_texts[rows]
+            )
+        except re.error as e:
+            _logger.info("**** errant tokens: {}".format(arg_tokens))
+            _logger.info(
+                "{} : {}".format(utils.unique_hash(content_url), content_url)
+            )
+            raise e
+        matched_rows.append(rows[positions])
+    return np.concatenate(matched_rows)
+
+
+# sentences of the labeling worker processes, set by `_init_label_worker`
+_worker_sentence_texts = None
+
+
+def _init_label_worker(sentence_texts):
+    global _worker_sentence_texts
+    _worker_sentence_texts = sentence_texts
+
+
+def _match_context_rows_in_worker(work):
+    return _match_context_rows(work, _worker_sentence_texts)
+
+
+def _match_context_rows_parallel(work, sentence_texts, n_workers):
+    """
+    `_match_context_rows` over a process pool, partitioning the work by doc
+
+    Where processes are forked, the workers inherit `sentence_texts` rather
+    than receiving a pickled copy; only the row positions are sent back.
+    """
+    # each partition covers a contiguous block of documents
+    work = sorted(work, key=lambda item: item[2][0] if len(item[2]) else -1)
+    # a few partitions per worker, to balance documents of different lengths
+    chunk_size = -(-len(work) // (n_workers * 4))
+    partitions = [
+        work[i : i + chunk_size]  # noqa: E203
+        for i in range(0, len(work), chunk_size)
+    ]
+    mp_context = (
+        multiprocessing.get_context("fork")
+        if "fork" in multiprocessing.get_all_start_methods()
+        else None
+    )
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=mp_context,
+        initializer=_init_label_worker,
+        initargs=(sentence_texts,),
+    ) as executor:
+        return np.concatenate(
+            [
+                _NO_ROWS,
+                *executor.map(_match_context_rows_in_worker, partitions),
+            ]
+        )
+
+
+def label_gdelt_context(
+    url_df, docs_df, sentences_df, label_col_name=CONTEXT_LABEL, n_workers=1
+):
     """
     Add column `label_col_name` to sentences_df, with whether or not the sentence
     was part of the context label from GDELT
 
+    For each GDELT row with a `topic_context`, the first sentence of its
+    document matching each token of the context (see `context_tokens`) is
+    labeled, along with every other sentence with the same `sentence_id`. The
+    labels are the same as applying `label_doc_sentences_with_context` to each
+    row, but the documents and their sentences are indexed once in a
+    `SentenceIndex`, rather than scanned for each row.
+
+    With several `n_workers`, the documents are partitioned over a process
+    pool, and the sentences matched in each partition are merged.
+
     Parameters
     ----------
-    url_df
-    docs_df
-    sentences_df
-    label_col_name
+    url_df : pd.DataFrame
+        GDELT rows, with `content_url` and `topic_context`
+    docs_df : pd.DataFrame
+    sentences_df : pd.DataFrame
+        modified in place
+    label_col_name : str
+        name to use for the label column
+    n_workers : int
+        number of processes; None for one per cpu, 1 labels in this process
 
     Returns
     -------
-
+    pd.DataFrame
+        sentences_df
     """
     # preload label column if doesnt exist
     if label_col_name not in sentences_df.columns:
         sentences_df[label_col_name] = False
 
-    # filter the url_df to just the entries in the docs
-    url_df_crop = url_df[url_df["content_url"].isin(docs_df.url.values)]
-
-    for row_ix, url_row in url_df_crop.iterrows():
-        if url_row.notna()["topic_context"]:
-            # does modification of sentences_df in place
-            label_doc_sentences_with_context(url_row, docs_df, sentences_df)
-
+    # filter the url_df to just the entries in the docs, with a context
+    url_df_crop = url_df[
+        url_df["content_url"].isin(docs_df.url.values)
+        & url_df["topic_context"].notna()
+    ]
+    if url_df_crop.empty:
+        return sentences_df
+
+    sentence_index = SentenceIndex(docs_df, sentences_df)
+    work = [
+        (
+            content_url,
+            snippit,
+            sentence_index.sentence_rows(sentence_index.doc_id(content_url)),
+        )
+        for content_url, snippit in zip(
+            url_df_crop.content_url, url_df_crop.topic_context
+        )
+    ]
+    sentence_texts = sentences_df["sentence_original"].to_numpy(dtype=object)
+
+    n_workers = min(n_workers or os.cpu_count() or 1, len(work))
+    if n_workers > 1:
+        matched_rows = _match_context_rows_parallel(
+            work, sentence_texts, n_workers
+        )
+    else:
+        matched_rows = _match_context_rows(work, sentence_texts)
+
+    sentence_ids = sentences_df["sentence_id"].to_numpy(dtype=object)
+    labeled = sentences_df["sentence_id"].isin(set(sentence_ids[matched_rows]))
+    sentences_df.loc[labeled, label_col_name] = True
+    # fill all rows that aren't true with False
+    sentences_df[label_col_name] = sentences_df[label_col_name].fillna(
+        value=False
+    )
     return sentences_df
@@ -1,6 +1,12 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
 import glob
+import io
 import logging
+import operator
 import os
+
+import numpy as np
 import pandas as pd
 
 from arg_mine import utils
@@ -8,6 +14,24 @@ from arg_mine import DATA_DIR
 
 _logger = utils.get_logger(__name__, logging.DEBUG)
 
+# pandas dtypes for the annotated types of the output dataclass fields
+_FIELD_DTYPES = {str: str, float: "float64", int: "Int64", bool: "boolean"}
+
+# comparison operators for the `filters` of `concat_csvs`
+_FILTER_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda column, values: column.isin(values),
+    "not in": lambda column, values: ~column.isin(values),
+}
+
+# the byte offset index of a GDELT csv is saved next to it, with this suffix
+ROW_INDEX_SUFFIX = ".rowidx.npy"
+
 GDELT_COL_NAMES = (
     "datetime",
     "title",
@@ -54,6 +78,54 @@ def convert_datetime_int(datetime_int):
     return ts
 
 
+def convert_datetime_ints(datetime_ints):
+    """
+    Vectorized `convert_datetime_int`, for a column of YYYYMMDDHHMMSS integers
+
+    Parameters
+    ----------
+    datetime_ints : pd.Series
+        long integers with date and time, 14 char long
+
+    Returns
+    -------
+    pd.Series
+        datetime64 values, with the same index
+
+    Raises
+    ------
+    ValueError : when any value is not 14 char long, naming the offending rows
+    """
+    datetime_ints = pd.Series(datetime_ints)
+    if pd.api.types.is_integer_dtype(datetime_ints.dtype):
+        values = datetime_ints.astype("int64")
+        bad_length = (values < 10 ** 13) | (values >= 10 ** 14)
+    else:
+        values = datetime_ints.astype(str)
+        bad_length = values.str.len() != 14
+    if bad_length.any():
+        bad_rows = datetime_ints[bad_length]
+        raise ValueError(
+            "Incorrect length for datetime integer, expected 14, "
+            "found {} bad rows: {}".format(
+                bad_rows.shape[0], bad_rows.head(10).to_dict()
+            )
+        )
+    if values.dtype == "int64":
+        components = pd.DataFrame(
+            {
+                "year": values // 10 ** 10,
+                "month": values // 10 ** 8 % 100,
+                "day": values // 10 ** 6 % 100,
+                "hour": values // 10 ** 4 % 100,
+                "minute": values // 10 ** 2 % 100,
+                "second": values % 100,
+            }
+        )
+        return pd.to_datetime(components)
+    return pd.to_datetime(values, format="%Y%m%d%H%M%S")
+
+
 def get_gdelt_df(csv_filepath, col_names=GDELT_COL_NAMES):
     """
     From CSV path, load a pandas dataframe with the GDELT URL dataset
@@ -70,12 +142,123 @@ def get_gdelt_df(csv_filepath, col_names=GDELT_COL_NAMES):
     # convert csv to dataframe. should probably do this in a separate step, and just return the path here.
     _logger.info("reading data from: {}".format(csv_filepath))
     df = pd.read_csv(csv_filepath, header=0, names=col_names, index_col=False)
-    df["timestamp"] = df.datetime.apply(convert_datetime_int)
+    df["timestamp"] = convert_datetime_ints(df.datetime)
+    return df
+
+
+def build_gdelt_row_index(csv_filepath):
+    """
+    Scan a GDELT CSV once, and save the byte offset of each data row next to it
+
+    Newlines inside quoted fields do not start a new row. The saved array has
+    one more entry than there are rows, the offset of the end of the data.
+
+    Parameters
+    ----------
+    csv_filepath : str, path
+
+    Returns
+    -------
+    np.ndarray
+        int64 byte offsets, length n_rows + 1
+    """
+    _logger.info("building row index for: {}".format(csv_filepath))
+    offsets = []
+    in_quotes = False
+    with open(csv_filepath, "rb") as f:
+        position = len(f.readline())  # skip the header
+        for line in f:
+            if not in_quotes and line.strip():
+                offsets.append(position)
+            if line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            position += len(line)
+    offsets.append(position)
+    offsets = np.array(offsets, dtype="int64")
+
+    # write then rename, so concurrent workers never load a partial index
+    index_path = csv_filepath + ROW_INDEX_SUFFIX
+    tmp_path = "{}.{}.tmp".format(index_path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        np.save(f, offsets)
+    os.replace(tmp_path, index_path)
+    return offsets
+
+
+def load_gdelt_row_index(csv_filepath):
+    """
+    Load the byte offset index of a GDELT CSV, building it if missing or stale
+
+    Parameters
+    ----------
+    csv_filepath : str, path
+
+    Returns
+    -------
+    np.ndarray
+        int64 byte offsets, length n_rows + 1, memory mapped
+    """
+    index_path = csv_filepath + ROW_INDEX_SUFFIX
+    if os.path.isfile(index_path):
+        offsets = np.load(index_path, mmap_mode="r")
+        # the last offset is the end of the data, which changes if the csv does
+        if offsets[-1] == os.path.getsize(csv_filepath):
+            return offsets
+    return build_gdelt_row_index(csv_filepath)
+
+
+def count_gdelt_rows(csv_filepath):
+    """Number of data rows in a GDELT CSV, from its row index"""
+    return len(load_gdelt_row_index(csv_filepath)) - 1
+
+
+def read_gdelt_rows(
+    csv_filepath, start_row=0, end_row=None, col_names=GDELT_COL_NAMES
+):
+    """
+    Load rows [start_row, end_row) of a GDELT CSV, seeking with the row index
+
+    Gives the same rows as ``get_gdelt_df(path).iloc[start_row:end_row]``,
+    but reads only the bytes of the requested rows.
+
+    Parameters
+    ----------
+    csv_filepath : str, path
+    start_row : int
+    end_row : int
+        stop before this row, default to the end of the file
+    col_names : List[str]
+
+    Returns
+    -------
+    pd.DataFrame
+        indexed by the row number in the file
+    """
+    offsets = load_gdelt_row_index(csv_filepath)
+    n_rows = len(offsets) - 1
+    start_row, end_row, _ = slice(start_row, end_row).indices(n_rows)
+    end_row = max(start_row, end_row)
+
+    if end_row == start_row:
+        # pd.read_csv raises on empty data
+        df = pd.DataFrame(columns=list(col_names))
+    else:
+        with open(csv_filepath, "rb") as f:
+            f.seek(offsets[start_row])
+            data = f.read(offsets[end_row] - offsets[start_row])
+        df = pd.read_csv(
+            io.BytesIO(data), header=None, names=col_names, index_col=False
+        )
+    df.index = pd.RangeIndex(start_row, end_row)
+    df["timestamp"] = convert_datetime_ints(df.datetime)
     return df
 
 
 def load_processed_csv(
-    filename, project="gdelt-climate-change-docs", drop_nan_cols=None
+    filename,
+    project="gdelt-climate-change-docs",
+    drop_nan_cols=None,
+    compact=False,
 ):
     csv_filepath = os.path.join(DATA_DIR, "processed", project, filename)
     _logger.info("reading data from: {}".format(csv_filepath))
@@ -85,14 +268,81 @@ def load_processed_csv(
         if isinstance(drop_nan_cols, str):
             drop_nan_cols = [drop_nan_cols]
         df.dropna(subset=drop_nan_cols, inplace=True)
+    if compact:
+        df = utils.compact_frame(df)
+    return df
+
+
+def schema_dtypes(schema):
+    """
+    Map the fields of an output dataclass to pandas dtypes, for `pd.read_csv`
+
+    Parameters
+    ----------
+    schema : type
+        dataclass, eg `ClassifiedSentence` or `DocumentMetadata`
+
+    Returns
+    -------
+    dict
+        column name to dtype
+    """
+    return {
+        f.name: _FIELD_DTYPES[f.type]
+        for f in fields(schema)
+        if f.type in _FIELD_DTYPES
+    }
+
+
+def _read_filtered_csv(filepath, usecols, dtype, filters, compact):
+    """Read a single csv, keeping the usecols and the rows passing filters"""
+    read_cols = None
+    if usecols is not None:
+        read_cols = list(
+            dict.fromkeys(list(usecols) + [col for col, _, _ in filters])
+        )
+    df = pd.read_csv(filepath, usecols=read_cols, dtype=dtype)
+    if filters:
+        mask = np.ones(df.shape[0], dtype=bool)
+        for column, op, value in filters:
+            mask &= np.asarray(_FILTER_OPS[op](df[column], value), dtype=bool)
+        df = df[mask]
+    if usecols is not None:
+        df = df[list(usecols)]
+    if compact:
+        df = utils.compact_frame(df)
     return df
 
 
-def concat_csvs(filename_glob, read_path):
+def concat_csvs(
+    filename_glob,
+    read_path,
+    usecols=None,
+    filters=None,
+    schema=None,
+    n_workers=1,
+    compact=False,
+):
     """
     Given a globbed filename (eg "my_files_doc*.csv"), concatenate the returned
     CSVs into a DataFrame
 
+    With `n_workers` above 1, the files are read in parallel over a process
+    pool. Columns that are fields of `schema` get its dtypes; the other columns
+    are inferred. Each file is projected and filtered as it is read, so only
+    the selected data is combined.
+
+    Examples
+    --------
+    >>> arguments_df = concat_csvs(
+    ...     "gdelt_2020_sentences_docs*.csv",
+    ...     read_path,
+    ...     usecols=["doc_id", "sentence_id", "argument_confidence"],
+    ...     filters=[("argument_label", "==", "argument")],
+    ...     schema=classify.ClassifiedSentence,
+    ...     n_workers=4,
+    ... )
+
     Parameters
     ----------
     filename_glob : str
@@ -100,14 +350,106 @@ def concat_csvs(filename_glob, read_path):
         Eg: ``"gdelt_2020_docs_docs*.csv"`` will find all files matching that pattern
     read_path : str
         base path to start looking for the files
+    usecols : List[str]
+        optional, only return these columns; rows with a missing
+        `sentence_original` are only dropped when that column is returned
+    filters : List[Tuple[str, str, Any]]
+        optional, only keep rows matching all `(column, op, value)` conditions,
+        where op is one of "==", "!=", "<", "<=", ">", ">=", "in", "not in"
+    schema : type
+        optional dataclass whose fields give the column dtypes,
+        eg `classify.ClassifiedSentence`
+    n_workers : int
+        number of processes, None for one per cpu; 1 reads in this process
+    compact : bool
+        if True, each file is made a lower memory frame before it is returned,
+        see `utils.compact_frame`
 
     Returns
     -------
     pd.DataFrame
     """
+    filters = list(filters or [])
+    unknown_ops = {op for _, op, _ in filters} - set(_FILTER_OPS)
+    if unknown_ops:
+        raise ValueError(
+            "Unknown filter operators: {}".format(sorted(unknown_ops))
+        )
+    dtype = schema_dtypes(schema) if schema is not None else None
+
     filepath_list = sorted(glob.glob(os.path.join(read_path, filename_glob)))
-    concat_df = pd.concat([pd.read_csv(filename) for filename in filepath_list], axis=0)
+    n_workers = min(
+        n_workers or os.cpu_count() or 1, max(len(filepath_list), 1)
+    )
+    read_args = (
+        filepath_list,
+        [usecols] * len(filepath_list),
+        [dtype] * len(filepath_list),
+        [filters] * len(filepath_list),
+        [compact] * len(filepath_list),
+    )
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            df_list = list(executor.map(_read_filtered_csv, *read_args))
+    else:
+        df_list = list(map(_read_filtered_csv, *read_args))
+    concat_df = (
+        utils.concat_frames(df_list) if compact else pd.concat(df_list, axis=0)
+    )
+    del df_list
+
     # TODO: make this drop more generic when we have more than one type of processed data
-    concat_df.dropna(subset=["sentence_original"], inplace=True)
+    if "sentence_original" in concat_df.columns:
+        concat_df.dropna(subset=["sentence_original"], inplace=True)
+
+    return concat_df
+
 
+def concat_parquet(
+    filename_glob, read_path, usecols=None, filters=None, compact=False
+):
+    """
+    Given a globbed filename (eg "my_files_doc*.parquet"), concatenate the
+    Parquet outputs of `extract_gdelt_sentences.py --output-format=parquet`
+    into a DataFrame
+
+    Like `concat_csvs`, but the column dtypes are stored in the files, and the
+    columns and filters are applied by pyarrow while reading.
+
+    Parameters
+    ----------
+    filename_glob : str
+        filename matching the target files, eg
+        ``"gdelt_2020_sentences_docs*.parquet"``
+    read_path : str
+        base path to start looking for the files
+    usecols : List[str]
+        optional, only return these columns
+    filters : List[Tuple[str, str, Any]]
+        optional, only keep rows matching all `(column, op, value)` conditions,
+        where op is one of "==", "!=", "<", "<=", ">", ">=", "in", "not in"
+    compact : bool
+        if True, return a lower memory frame, see `utils.compact_frame`
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    import pyarrow.parquet as pq
+
+    filepath_list = sorted(glob.glob(os.path.join(read_path, filename_glob)))
+    if not filepath_list:
+        raise IOError(
+            "No files matching {} in {}".format(filename_glob, read_path)
+        )
+    # read_table uses the dataset implementation, which filters on any column,
+    # where older pyarrow's legacy ParquetDataset only filters partition keys
+    table = pq.read_table(
+        filepath_list, columns=usecols, filters=filters or None
+    )
+    concat_df = table.to_pandas()
+    if "sentence_original" in concat_df.columns:
+        concat_df.dropna(subset=["sentence_original"], inplace=True)
+    if compact:
+        concat_df = utils.compact_frame(concat_df)
     return concat_df
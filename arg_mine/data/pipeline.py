@@ -0,0 +1,363 @@
+"""
+Staged extraction pipeline, fetching, parsing and writing classify results
+concurrently
+
+    fetch --> parse queue --> parse workers --> write queue --> writer
+
+Each stage runs in its own threads, connected by bounded queues, so a slow
+stage applies back pressure upstream instead of growing memory. A single fetch
+stream runs over the URLs of all the batches, so the requests in flight do not
+drain at each batch boundary. Each batch is still written to its own output
+files, which are closed as soon as the last of its URLs is done.
+"""
+from dataclasses import asdict, dataclass, replace
+from typing import List
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from arg_mine.api import classify, session
+from arg_mine.data.journal import UrlState
+from arg_mine.data.sinks import open_sink
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+_DONE = object()  # sentinel, marks the end of a stage's items
+
+
+@dataclass
+class ExtractionBatch:
+    """
+    data class for a batch of URLs, written to its own docs and sentences files
+    """
+
+    batch_ix: int
+    urls: List[str]
+    docs_filepath: str  # ending in ".csv" or ".parquet", see `sinks.open_sink`
+    sentences_filepath: str
+
+
+class _BatchWriter:
+    """
+    Output sinks of a batch, journaling each URL once its rows are durable
+    """
+
+    def __init__(self, batch, journal, refusal_cache=None, append=False):
+        self.batch = batch
+        self.n_remaining = len(batch.urls)
+        self.n_docs = 0
+        self._journal = journal
+        self._refusal_cache = refusal_cache
+        # classified, but their rows are not durable yet
+        self._pending_urls = []
+        self._docs_sink = open_sink(
+            batch.docs_filepath, classify.DocumentMetadata, append=append
+        )
+        self._sentences_sink = open_sink(
+            batch.sentences_filepath,
+            classify.ClassifiedSentence,
+            append=append,
+        )
+
+    def write(self, url, doc_row, sentence_rows):
+        self._sentences_sink.write(sentence_rows)
+        self._docs_sink.write([doc_row])
+        self._pending_urls.append(url)
+        self.n_docs += 1
+        if self._sentences_sink.commit() and self._docs_sink.commit():
+            self._record_classified()
+
+    def _record_classified(self):
+        for url in self._pending_urls:
+            self._journal.record(url, UrlState.CLASSIFIED)
+            if self._refusal_cache is not None:
+                self._refusal_cache.record(url, refused=False)
+        self._pending_urls.clear()
+
+    def close(self):
+        self._docs_sink.close()
+        self._sentences_sink.close()
+        self._record_classified()
+
+
+class ExtractionPipeline:
+    """
+    Classify batches of URLs, writing each batch to its output sinks, with the
+    fetch, parse and write stages running concurrently
+
+    The fetch stage keeps up to `max_in_flight` requests in flight (or the
+    limits of the `credential_pool`) over the URLs of all the batches.
+    `parse_workers` threads check and parse the responses into rows, and a
+    single writer, in the calling thread, appends them to the sinks of their
+    batch and keeps the journal. Parsing is mostly bound by the GIL, so extra
+    parse workers mainly help to absorb bursts of responses; the fetch stage is
+    saturated as long as its `stats()["fetch_blocked_s"]` stays near zero.
+
+    Examples
+    --------
+    >>> pipeline = ExtractionPipeline(
+    ...     topic, journal, parse_workers=2, credential_pool=pool
+    ... )
+    >>> pipeline.run(
+    ...     ExtractionBatch(i, urls, docs_path, sentences_path) for ...
+    ... )
+
+    Parameters
+    ----------
+    topic : str
+    journal : ExtractionJournal
+        records the terminal state of each URL
+    refusal_cache : RefusalCache
+        optional, records which URLs were refused by the server
+    append : bool
+        if True, append to existing output files, eg when resuming
+    max_in_flight : int
+        maximum number of concurrent requests, without a `credential_pool`
+    parse_workers : int
+        number of threads parsing the responses
+    queue_size : int
+        maximum number of items waiting in each queue between the stages
+    classify_kwargs
+        passed on to `classify.iter_url_responses_async`,
+        eg a `credential_pool`
+    """
+
+    def __init__(
+        self,
+        topic,
+        journal,
+        refusal_cache=None,
+        append=False,
+        max_in_flight=session.DEFAULT_POOL_SIZE,
+        parse_workers=2,
+        queue_size=64,
+        **classify_kwargs,
+    ):
+        if parse_workers < 1 or queue_size < 1:
+            raise ValueError(
+                "parse_workers and queue_size must be at least 1, "
+                "given {} and {}".format(parse_workers, queue_size)
+            )
+        self.topic = topic
+        self.journal = journal
+        self.refusal_cache = refusal_cache
+        self.append = append
+        self.max_in_flight = max_in_flight
+        self.parse_workers = parse_workers
+        self._classify_kwargs = classify_kwargs
+        self._parse_queue = queue.Queue(maxsize=queue_size)
+        self._write_queue = queue.Queue(maxsize=queue_size)
+        self._url_batches = {}  # in-flight url -> batch_ix
+        self._stop = threading.Event()
+        self._error = None
+        self._n_fetched = 0
+        self._n_written = 0
+        # time the fetch stage waited on the parse queue
+        self._fetch_blocked_s = 0.0
+
+    def _fail(self, exception):
+        """Stop all the stages, keeping the first error to raise from `run`"""
+        if self._error is None:
+            self._error = exception
+        self._stop.set()
+
+    def _put(self, stage_queue, item):
+        # block until there is room in the queue, unless the pipeline stopped
+        while not self._stop.is_set():
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, stage_queue):
+        while not self._stop.is_set():
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _url_stream(self, batches):
+        """
+        URLs of all the batches, announcing each batch to the writer first
+        """
+        for batch in batches:
+            if self._stop.is_set():
+                return
+            # a url can only be in flight once, so it maps to a single batch;
+            # missing urls are never dispatched
+            urls = [
+                u
+                for u in dict.fromkeys(batch.urls)
+                if pd.notna(u) and u not in self._url_batches
+            ]
+            batch = replace(batch, urls=urls)
+            self._put(self._write_queue, (batch.batch_ix, None, batch))
+            for url in urls:
+                self._url_batches[url] = batch.batch_ix
+                yield url
+
+    async def _produce(self, batches):
+        async for url, response in classify.iter_url_responses_async(
+            self.topic,
+            self._url_stream(batches),
+            concurrency=self.max_in_flight,
+            **self._classify_kwargs,
+        ):
+            if self._stop.is_set():
+                break
+            start = time.monotonic()
+            self._put(self._parse_queue, (url, response))
+            self._fetch_blocked_s += time.monotonic() - start
+            self._n_fetched += 1
+
+    def _fetch(self, batches):
+        try:
+            asyncio.run(self._produce(batches))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.parse_workers):
+                self._put(self._parse_queue, _DONE)
+
+    def _parse(self):
+        try:
+            while True:
+                item = self._get(self._parse_queue)
+                if item is _DONE:
+                    break
+                url, response = item
+                batch_ix = self._url_batches.pop(url)
+                try:
+                    result = classify.parse_classify_response(response)
+                except Exception as e:
+                    result = e
+                else:
+                    if result is not None:
+                        doc, sentences = result
+                        result = asdict(doc), [asdict(s) for s in sentences]
+                self._put(self._write_queue, (batch_ix, url, result))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self._write_queue, _DONE)
+
+    def _record_error(self, url, exception):
+        if isinstance(exception, classify.errors.Refused):
+            self.journal.record(url, UrlState.REFUSED)
+            if self.refusal_cache is not None:
+                self.refusal_cache.record(url, refused=True)
+        else:
+            _logger.error("{}, url={}".format(exception, url))
+            self.journal.record(url, UrlState.FAILED, detail=str(exception))
+
+    def _write_item(self, writers, batch_ix, url, result):
+        """
+        Write the result of a URL to the sinks of its batch, or open a new
+        batch if `url` is None, and close the batch once all its URLs are done
+        """
+        if url is None:
+            writers[batch_ix] = _BatchWriter(
+                result, self.journal, self.refusal_cache, append=self.append
+            )
+        else:
+            if isinstance(result, Exception):
+                self._record_error(url, result)
+            elif result is not None:
+                writers[batch_ix].write(url, *result)
+            writers[batch_ix].n_remaining -= 1
+            self._n_written += 1
+
+        if writers[batch_ix].n_remaining == 0:
+            writer = writers.pop(batch_ix)
+            writer.close()
+            _logger.debug(
+                "batch {} done, {} docs of {} urls; {}".format(
+                    batch_ix,
+                    writer.n_docs,
+                    len(writer.batch.urls),
+                    self.stats(),
+                )
+            )
+
+    def _write(self):
+        # batch_ix -> _BatchWriter, of the batches with urls in progress
+        writers = {}
+        n_parsers_done = 0
+        try:
+            while (
+                n_parsers_done < self.parse_workers and not self._stop.is_set()
+            ):
+                item = self._get(self._write_queue)
+                if item is _DONE:
+                    n_parsers_done += 1
+                else:
+                    self._write_item(writers, *item)
+        finally:
+            # the rows written so far are kept, and durable once closed
+            for writer in writers.values():
+                writer.close()
+
+    def stats(self):
+        """
+        Progress of the stages
+
+        Returns
+        -------
+        dict
+            number of URLs fetched and written, items waiting in each queue,
+            and the seconds the fetch stage was blocked on the parse stage
+        """
+        return {
+            "n_fetched": self._n_fetched,
+            "n_written": self._n_written,
+            "parse_queue": self._parse_queue.qsize(),
+            "write_queue": self._write_queue.qsize(),
+            "fetch_blocked_s": round(self._fetch_blocked_s, 3),
+        }
+
+    def run(self, batches):
+        """
+        Run the batches through the pipeline, returning once all are written
+
+        Parameters
+        ----------
+        batches : Iterable[ExtractionBatch]
+            consumed lazily by the fetch stage, as it runs out of URLs,
+            so each batch can be prepared with the results of the earlier ones
+
+        Returns
+        -------
+        dict
+            the final `stats()`
+
+        Raises
+        ------
+        Exception
+            the first error of any stage, after stopping all of them
+        """
+        threads = [
+            threading.Thread(target=self._fetch, args=(batches,), daemon=True)
+        ] + [
+            threading.Thread(target=self._parse, daemon=True)
+            for _ in range(self.parse_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._write()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.stats()
@@ -0,0 +1,221 @@
+"""
+Output sinks for the extracted docs and sentences, written as URLs complete
+"""
+from dataclasses import fields
+import csv
+import glob
+import logging
+import os
+import re
+
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+# arrow type names for the annotated types of the output dataclass fields
+_ARROW_FIELD_TYPES = {
+    str: "string",
+    float: "float64",
+    int: "int64",
+    bool: "bool",
+}
+
+
+class CsvSink:
+    """
+    Append rows to a CSV file, with each commit synced to disk
+
+    Parameters
+    ----------
+    filepath : str
+    schema : type
+        output dataclass, whose fields are the columns
+    append : bool
+        if True, append to a file, writing the header only if it is new
+    """
+
+    extension = "csv"
+
+    def __init__(self, filepath, schema, append=False):
+        self.filepath = filepath
+        columns = [f.name for f in fields(schema)]
+        has_header = (
+            append and os.path.isfile(filepath) and os.path.getsize(filepath)
+        )
+        self._file = open(filepath, "a" if append else "w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        if not has_header:
+            self._writer.writeheader()
+
+    def write(self, rows):
+        """
+        Parameters
+        ----------
+        rows : Iterable[dict]
+        """
+        self._writer.writerows(rows)
+
+    def commit(self):
+        """
+        Flush to disk, so the rows survive a crash
+
+        Returns
+        -------
+        bool
+            True, all rows written so far are durable
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return True
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParquetSink:
+    """
+    Write rows to Parquet in row groups, keeping memory under `row_group_size`
+
+    The file is written to a temporary path and renamed on close, since a
+    Parquet file is unreadable until its footer is written. Rows are only
+    durable once the sink is closed; a crash loses the whole file. When
+    appending to an existing file, eg when resuming, the rows go to a new part
+    file ``<name>.part<n>.parquet``.
+
+    Requires the optional dependency `pyarrow`.
+
+    Parameters
+    ----------
+    filepath : str
+    schema : type
+        output dataclass, whose fields and annotated types give the columns
+    append : bool
+        if True, keep an existing file, and write to the next free part file
+    row_group_size : int
+        number of buffered rows written as each row group
+    """
+
+    extension = "parquet"
+
+    def __init__(self, filepath, schema, append=False, row_group_size=10000):
+        import pyarrow
+        import pyarrow.parquet
+
+        self._pa = pyarrow
+        if append and os.path.isfile(filepath):
+            filepath = _next_part_path(filepath)
+        self.filepath = filepath
+        self.row_group_size = row_group_size
+        self._schema = pyarrow.schema(
+            [
+                (f.name, _ARROW_FIELD_TYPES.get(f.type, "string"))
+                for f in fields(schema)
+            ]
+        )
+        self._tmp_path = filepath + ".tmp"
+        self._writer = pyarrow.parquet.ParquetWriter(
+            self._tmp_path, self._schema
+        )
+        self._rows = []
+
+    def write(self, rows):
+        """
+        Parameters
+        ----------
+        rows : Iterable[dict]
+        """
+        self._rows.extend(rows)
+        if len(self._rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        if self._rows:
+            columns = {}
+            for name, arrow_type in zip(
+                self._schema.names, self._schema.types
+            ):
+                values = [row.get(name) for row in self._rows]
+                if arrow_type == self._pa.string():
+                    # eg the API returns "modelVersion" as a number
+                    values = [
+                        v if v is None or isinstance(v, str) else str(v)
+                        for v in values
+                    ]
+                columns[name] = values
+            table = self._pa.Table.from_pydict(columns, schema=self._schema)
+            self._writer.write_table(table, row_group_size=self.row_group_size)
+            self._rows = []
+
+    def commit(self):
+        """
+        Returns
+        -------
+        bool
+            False, rows are only durable once the sink is closed
+        """
+        return False
+
+    def close(self):
+        self._write_row_group()
+        self._writer.close()
+        os.replace(self._tmp_path, self.filepath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _next_part_path(filepath):
+    """Path of the part after the highest numbered one, finished or not"""
+    stem, ext = os.path.splitext(filepath)
+    part_re = re.compile(
+        re.escape(stem) + r"\.part(\d+)" + re.escape(ext) + r"(\.tmp)?$"
+    )
+    part_paths = glob.glob(glob.escape(stem) + ".part*" + ext + "*")
+    part_matches = [part_re.match(path) for path in part_paths]
+    last_part = max((int(m.group(1)) for m in part_matches if m), default=0)
+    return "{}.part{}{}".format(stem, last_part + 1, ext)
+
+
+# sink class for each output format
+SINKS = {CsvSink.extension: CsvSink, ParquetSink.extension: ParquetSink}
+
+
+def open_sink(filepath, schema, append=False):
+    """
+    Open the output sink for a file, chosen by its extension
+
+    Examples
+    --------
+    >>> filepath = "gdelt_2020_docs_docs0-999.parquet"
+    >>> with open_sink(filepath, classify.DocumentMetadata) as sink:
+    ...     sink.write([asdict(doc)])
+
+    Parameters
+    ----------
+    filepath : str
+        ending in ".csv" or ".parquet"
+    schema : type
+        output dataclass, eg `classify.ClassifiedSentence`
+    append : bool
+
+    Returns
+    -------
+    Union[CsvSink, ParquetSink]
+    """
+    extension = os.path.splitext(filepath)[1].lstrip(".")
+    if extension not in SINKS:
+        raise ValueError(
+            "Unknown output format '{}', expected one of {}".format(
+                extension, list(SINKS)
+            )
+        )
+    return SINKS[extension](filepath, schema, append=append)
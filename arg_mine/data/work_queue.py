@@ -0,0 +1,507 @@
+"""
+Shared queue of GDELT row range leases, to run the extraction on many workers
+
+A coordinator splits the GDELT years into row ranges, stored as leases in a
+sqlite file that all the workers can reach:
+
+    python -m arg_mine.data.work_queue init --year=2020 --lease-rows=10000
+
+Each worker, on any host, then claims a lease, extracts its rows, and marks it
+done, until none are left:
+
+    python -m arg_mine.data.extract_gdelt_sentences --work-queue=<path>
+
+A worker renews its lease while it runs. If it dies, its lease expires and is
+claimed again by another worker, which resumes it from the extraction journal.
+"""
+from dataclasses import dataclass
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import click
+
+from arg_mine import DATA_DIR
+from arg_mine.data import gdelt_store
+from arg_mine.data.loaders import count_gdelt_rows
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+WORK_QUEUE_PATH = os.path.join(
+    DATA_DIR, "interim", "extract_work_queue.sqlite"
+)
+DEFAULT_LEASE_ROWS = 10000
+DEFAULT_LEASE_TTL = 10 * 60  # seconds without a renewal before a lease expires
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class LeaseState:
+    """enum for the state of a lease"""
+
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"  # failed on `max_attempts` claims, not claimed again
+
+
+@dataclass
+class Lease:
+    """
+    data class for a claimed range of rows of a GDELT year
+    """
+
+    lease_id: int
+    year: int
+    start_row: int
+    end_row: int  # exclusive
+    worker_id: str
+    token: str  # unique to each claim, a reclaimed lease gets a new one
+    attempts: int  # number of times the lease was claimed, including this one
+    expires: float
+    lost: bool = False  # set once a renewal fails; stop processing the rows
+
+
+class LeaseLost(Exception):
+    """Raised to abort the processing of a lease lost to another worker"""
+
+
+def default_worker_id():
+    """Identify the worker by its host and process"""
+    return "{}-{}".format(socket.gethostname(), os.getpid())
+
+
+class LeaseQueue:
+    """
+    SQLite-backed queue of row range leases, shared between workers
+
+    Claims are atomic, so each lease is held by at most one worker at a time.
+    A lease that is not renewed within `lease_ttl` seconds can be claimed by
+    another worker; the previous holder then fails to renew or complete it.
+    Expiry uses the wall clock, so the hosts' clocks should be synchronized.
+
+    This class is thread safe. The sqlite file can be shared between processes
+    and hosts, as long as its filesystem supports file locking, eg a local
+    disk, or NFSv4 with locking enabled.
+
+    Examples
+    --------
+    >>> lease_queue = LeaseQueue(WORK_QUEUE_PATH)
+    >>> lease_queue.add_ranges(2020, total_rows=count_gdelt_rows(csv_filepath))
+    >>> lease = lease_queue.claim(default_worker_id())
+    >>> lease_queue.complete(lease)
+
+    Parameters
+    ----------
+    path : str
+        path to the sqlite file, the parent directory is created if needed
+    lease_ttl : float
+        seconds before an unrenewed lease expires
+    max_attempts : int
+        number of claims of a lease before it is marked as failed
+    """
+
+    def __init__(
+        self,
+        path=WORK_QUEUE_PATH,
+        lease_ttl=DEFAULT_LEASE_TTL,
+        max_attempts=DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.path = path
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "lease_id INTEGER PRIMARY KEY, year INTEGER, "
+                "start_row INTEGER, end_row INTEGER, state TEXT, "
+                "worker_id TEXT, token TEXT, "
+                "attempts INTEGER, expires REAL, detail TEXT, "
+                "UNIQUE (year, start_row, end_row))"
+            )
+
+    def add_ranges(
+        self,
+        year,
+        total_rows,
+        lease_rows=DEFAULT_LEASE_ROWS,
+        start_row=0,
+        end_row=None,
+    ):
+        """
+        Split the rows of a GDELT year into pending leases
+
+        Ranges already in the queue are kept as they are, so this can be run
+        again, eg to add more years, without repeating any finished work.
+
+        Parameters
+        ----------
+        year : int
+        total_rows : int
+            number of rows in the year's dataset
+        lease_rows : int
+            number of rows per lease
+        start_row : int
+        end_row : int
+            exclusive, default `total_rows`
+
+        Returns
+        -------
+        int
+            number of new leases
+        """
+        end_row = total_rows if end_row is None else min(end_row, total_rows)
+        ranges = [
+            (year, row, min(row + lease_rows, end_row), LeaseState.PENDING, 0)
+            for row in range(start_row, end_row, lease_rows)
+        ]
+        with self._lock, self._conn:
+            n_before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO leases "
+                "(year, start_row, end_row, state, attempts) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ranges,
+            )
+            n_added = self._conn.total_changes - n_before
+        _logger.info("added {} leases for year {}".format(n_added, year))
+        return n_added
+
+    def claim(self, worker_id):
+        """
+        Claim the next pending or expired lease, in order of year and row
+
+        Expired leases that were already claimed `max_attempts` times are
+        marked as failed instead.
+
+        Parameters
+        ----------
+        worker_id : str
+
+        Returns
+        -------
+        Optional[Lease]
+            None if there are no leases left to claim
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            # expired leases without attempts left will not be claimed again
+            self._conn.execute(
+                "UPDATE leases SET state = ?, detail = ? "
+                "WHERE state = ? AND expires < ? AND attempts >= ?",
+                (
+                    LeaseState.FAILED,
+                    "lease expired",
+                    LeaseState.LEASED,
+                    now,
+                    self.max_attempts,
+                ),
+            )
+            # a single statement, so two workers can never claim the same lease
+            self._conn.execute(
+                "UPDATE leases SET state = ?, worker_id = ?, token = ?, "
+                "attempts = attempts + 1, expires = ? "
+                "WHERE lease_id = ("
+                "SELECT lease_id FROM leases WHERE attempts < ? AND "
+                "(state = ? OR (state = ? AND expires < ?)) "
+                "ORDER BY year, start_row LIMIT 1)",
+                (
+                    LeaseState.LEASED,
+                    worker_id,
+                    token,
+                    now + self.lease_ttl,
+                    self.max_attempts,
+                    LeaseState.PENDING,
+                    LeaseState.LEASED,
+                    now,
+                ),
+            )
+            row = self._conn.execute(
+                "SELECT lease_id, year, start_row, end_row, worker_id, token, "
+                "attempts, expires FROM leases WHERE token = ?",
+                (token,),
+            ).fetchone()
+        return Lease(*row) if row else None
+
+    def _update_held(self, lease, assignments, values):
+        """
+        Update a lease only if it is still held by this claim
+
+        Returns
+        -------
+        bool
+            True if the lease was updated
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE leases SET {} WHERE lease_id = ? AND token = ? "
+                "AND state = ?".format(assignments),
+                tuple(values)
+                + (lease.lease_id, lease.token, LeaseState.LEASED),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, lease):
+        """
+        Extend a held lease by `lease_ttl`
+
+        Returns
+        -------
+        bool
+            False if the lease was lost, eg it expired and another worker
+            claimed it
+        """
+        expires = time.time() + self.lease_ttl
+        if self._update_held(lease, "expires = ?", (expires,)):
+            lease.expires = expires
+            return True
+        return False
+
+    def complete(self, lease):
+        """
+        Mark a held lease as done
+
+        Returns
+        -------
+        bool
+            False if the lease was lost before it was completed
+        """
+        return self._update_held(lease, "state = ?", (LeaseState.DONE,))
+
+    def fail(self, lease, detail=None):
+        """
+        Give up a held lease after an error, so it can be claimed again,
+        or mark it as failed once it has been tried `max_attempts` times
+
+        Returns
+        -------
+        bool
+            False if the lease was lost before
+        """
+        state = (
+            LeaseState.FAILED
+            if lease.attempts >= self.max_attempts
+            else LeaseState.PENDING
+        )
+        return self._update_held(
+            lease, "state = ?, detail = ?", (state, detail)
+        )
+
+    def release(self, lease):
+        """
+        Give up a held lease without counting the attempt, eg on worker stop
+
+        Returns
+        -------
+        bool
+            False if the lease was lost before
+        """
+        return self._update_held(
+            lease, "state = ?, attempts = attempts - 1", (LeaseState.PENDING,)
+        )
+
+    def counts(self):
+        """
+        Number of leases in each state; expired leases are counted as "expired"
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CASE WHEN state = ? AND expires < ? THEN 'expired' "
+                "ELSE state END AS lease_state, COUNT(*) FROM leases "
+                "GROUP BY lease_state",
+                (LeaseState.LEASED, time.time()),
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _LeaseRenewer:
+    """While in context, renew a lease every `interval` seconds in a thread"""
+
+    def __init__(self, lease_queue, lease, interval):
+        self._lease_queue = lease_queue
+        self._lease = lease
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def lost(self):
+        return self._lease.lost
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            if not self._lease_queue.renew(self._lease):
+                self._lease.lost = True
+                _logger.warning(
+                    "lost lease {} of year {} rows [{}, {})".format(
+                        self._lease.lease_id,
+                        self._lease.year,
+                        self._lease.start_row,
+                        self._lease.end_row,
+                    )
+                )
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(lease_queue, extract_fn, worker_id=None, renew_interval=None):
+    """
+    Claim and process leases until there are none left
+
+    A lease whose `extract_fn` raises is given up, to be claimed again up to
+    `lease_queue.max_attempts` times, and the worker moves on to the next
+    lease. Once a renewal fails, `lease.lost` is set: `extract_fn` should check
+    it between batches and raise `LeaseLost`, so it stops writing rows that
+    another worker now owns. A lost lease is never completed.
+
+    Examples
+    --------
+    >>> def extract_fn(lease):
+    ...     extract_rows(
+    ...         lease.year, lease.start_row, lease.end_row, lease=lease
+    ...     )
+    >>> run_worker(LeaseQueue(WORK_QUEUE_PATH), extract_fn)
+
+    Parameters
+    ----------
+    lease_queue : LeaseQueue
+    extract_fn : Callable[[Lease], None]
+        processes the rows of a lease. When `lease.attempts` is more than 1 a
+        previous worker may have processed some of the rows already
+    worker_id : str
+        default `default_worker_id()`
+    renew_interval : float
+        seconds between lease renewals, default a third of the lease ttl
+
+    Returns
+    -------
+    int
+        number of leases completed by this worker
+    """
+    worker_id = worker_id or default_worker_id()
+    renew_interval = renew_interval or lease_queue.lease_ttl / 3
+    n_completed = 0
+    while True:
+        lease = lease_queue.claim(worker_id)
+        if lease is None:
+            break
+        _logger.info(
+            "worker {} claimed lease {}: year {} rows [{}, {}), "
+            "attempt {}".format(
+                worker_id,
+                lease.lease_id,
+                lease.year,
+                lease.start_row,
+                lease.end_row,
+                lease.attempts,
+            )
+        )
+        try:
+            with _LeaseRenewer(lease_queue, lease, renew_interval) as renewer:
+                extract_fn(lease)
+        except LeaseLost:
+            _logger.warning(
+                "lease {} was lost, stopped before its remaining rows".format(
+                    lease.lease_id
+                )
+            )
+            continue
+        except Exception as e:
+            _logger.exception("lease {} failed".format(lease.lease_id))
+            lease_queue.fail(lease, detail=str(e))
+            continue
+        except BaseException:
+            lease_queue.release(lease)
+            raise
+        if not renewer.lost and lease_queue.complete(lease):
+            n_completed += 1
+        else:
+            _logger.warning(
+                "lease {} was lost before it completed, its rows may be "
+                "extracted twice; duplicates are identified by doc_id".format(
+                    lease.lease_id
+                )
+            )
+    _logger.info(
+        "worker {} completed {} leases".format(worker_id, n_completed)
+    )
+    return n_completed
+
+
+def _gdelt_num_rows(year):
+    if gdelt_store.has_gdelt_store(year):
+        return gdelt_store.gdelt_store_num_rows(year)
+    return count_gdelt_rows(gdelt_store.GDELT_CSV_PATH_FMT.format(year=year))
+
+
+@click.group()
+def main():
+    """
+    Coordinate a sharded extraction over several workers, with a lease queue
+    """
+
+
+@main.command()
+@click.option(
+    "--year",
+    "years",
+    type=int,
+    multiple=True,
+    help="year to split into leases, can be repeated; default all",
+)
+@click.option(
+    "--lease-rows", default=DEFAULT_LEASE_ROWS, help="rows per lease"
+)
+@click.option(
+    "--path", default=WORK_QUEUE_PATH, help="sqlite file shared by the workers"
+)
+def init(years, lease_rows, path):
+    """Split the GDELT years into leases, keeping any existing ones"""
+    with LeaseQueue(path) as lease_queue:
+        for year in years or range(2015, 2021):
+            lease_queue.add_ranges(
+                year, _gdelt_num_rows(year), lease_rows=lease_rows
+            )
+        click.echo(lease_queue.counts())
+
+
+@main.command()
+@click.option(
+    "--path", default=WORK_QUEUE_PATH, help="sqlite file shared by the workers"
+)
+def status(path):
+    """Show the number of leases in each state"""
+    with LeaseQueue(path) as lease_queue:
+        click.echo(lease_queue.counts())
+
+
+if __name__ == "__main__":
+    main()
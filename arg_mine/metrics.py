@@ -1,3 +1,6 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+
 import numpy as np
 import pandas as pd
 from sklearn.metrics import confusion_matrix, roc_curve, auc
@@ -43,3 +46,468 @@ def summary_stats(y_label, y_pred, y_score, name="model stats"):
     stats["roc_auc"] = auc(fpr, tpr)
 
     return pd.DataFrame(stats, index=[name])
+
+
+def _sorted_counts(y_label, y_score):
+    """
+    Sort the scores, with the cumulative count of positive labels
+
+    Parameters
+    ----------
+    y_label : np.array
+        array of true labels per sample (eg 0/1)
+    y_score : np.array
+        array of prediction probability, or confidence, per sample
+
+    Returns
+    -------
+    sorted_score : np.array
+        y_score, ascending
+    cum_pos : np.array
+        number of positive labels among the k lowest scores, for k in 0..n
+    """
+    y_label = np.asarray(y_label).astype(bool)
+    y_score = np.asarray(y_score, dtype=float)
+    if np.isnan(y_score).any():
+        raise ValueError("y_score contains NaN")
+    # only counts at the boundaries between distinct scores are used,
+    # so the order within tied scores does not matter
+    order = np.argsort(y_score)
+    cum_pos = np.zeros(len(y_score) + 1, dtype=np.int64)
+    np.cumsum(y_label[order], out=cum_pos[1:])
+    return y_score[order], cum_pos
+
+
+def _binary_stats(tn, fp, fn, tp):
+    """
+    Binary classification stats from confusion counts, as in `summary_stats`
+
+    The counts can be arrays of any matching shape; undefined ratios are NaN.
+
+    Returns
+    -------
+    dict
+        accuracy, precision, recall and f1_score arrays
+    """
+    tn, fp, fn, tp = (
+        np.asarray(count, dtype=float) for count in (tn, fp, fn, tp)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = tp / (tp + fp)
+        recall = tp / (tp + fn)
+        return {
+            "accuracy": (tp + tn) / (tn + fp + fn + tp),
+            "precision": precision,
+            "recall": recall,
+            "f1_score": 2 * precision * recall / (precision + recall),
+        }
+
+
+def _roc_auc(sorted_score, cum_pos):
+    """
+    Area under the ROC curve, from the output of `_sorted_counts`
+    """
+    n_total = len(sorted_score)
+    n_pos = cum_pos[-1]
+    n_neg = n_total - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return np.nan
+    # one ROC point per distinct score, predicting positive for scores >= it
+    is_first = np.ones(n_total, dtype=bool)
+    is_first[1:] = sorted_score[1:] != sorted_score[:-1]
+    n_below = np.append(np.flatnonzero(is_first), n_total)[::-1]
+    tp = n_pos - cum_pos[n_below]
+    fp = n_total - n_below - tp
+    tpr = tp / n_pos
+    fpr = fp / n_neg
+    return np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)
+
+
+def threshold_sweep(y_label, y_score, thresholds):
+    """
+    Summary stats of a binary classification for many score thresholds at once
+
+    A sample is predicted positive when its score is above the threshold, as in
+    `y_score > threshold`. The scores are sorted once, and the confusion counts
+    of every threshold come from cumulative sums over the sorted labels, rather
+    than from a `summary_stats` call per threshold.
+
+    Parameters
+    ----------
+    y_label : np.array
+        array of true labels per sample (eg 0/1)
+    y_score : np.array
+        array of prediction probability, or confidence, per sample
+    thresholds : Sequence[float]
+        score thresholds to evaluate
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per threshold, indexed by threshold, with the `summary_stats`
+        columns and the confusion counts tn, fp, fn and tp
+    """
+    sorted_score, cum_pos = _sorted_counts(y_label, y_score)
+    thresholds = np.asarray(thresholds, dtype=float)
+    n_total = len(sorted_score)
+
+    # the samples at or below each threshold are predicted negative
+    n_below = np.searchsorted(sorted_score, thresholds, side="right")
+    fn = cum_pos[n_below]
+    tn = n_below - fn
+    tp = cum_pos[-1] - fn
+    fp = n_total - n_below - tp
+
+    stats = _binary_stats(tn, fp, fn, tp)
+    stats["roc_auc"] = _roc_auc(sorted_score, cum_pos)
+    stats.update({"tn": tn, "fp": fp, "fn": fn, "tp": tp})
+    return pd.DataFrame(stats, index=pd.Index(thresholds, name="threshold"))
+
+
+# bootstrap replicates per chunk, and the cap on chunk samples, to bound memory
+_BOOTSTRAP_CHUNK = 1000
+_BOOTSTRAP_CHUNK_SAMPLES = 2 ** 22
+
+
+def _binned_roc_auc(pos, neg):
+    """
+    Area under the ROC curve from the positive and negative counts per bin
+
+    The area is the chance a positive scores above a negative, counting the
+    pairs in the same bin as half.
+
+    Parameters
+    ----------
+    pos : np.array
+        (..., n_bins) number of positive labels in each bin, by ascending score
+    neg : np.array
+        (..., n_bins) number of negative labels in each bin
+
+    Returns
+    -------
+    np.array
+        the area of each row, NaN without both positives and negatives
+    """
+    neg_below = np.cumsum(neg, axis=-1) - neg
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sum(pos * (neg_below + neg / 2), axis=-1) / (
+            pos.sum(axis=-1) * neg.sum(axis=-1)
+        )
+
+
+def _weighted_stats(weights, y_label, y_pred, y_score):
+    """
+    `summary_stats` of each row of sample weights, eg bootstrap resample counts
+
+    Parameters
+    ----------
+    weights : np.array
+        (n_rows, n_samples) count of each sample in each row
+    y_label : np.array
+        boolean true labels, sorted by y_score
+    y_pred : np.array
+        boolean predicted labels, sorted by y_score
+    y_score : np.array
+        ascending scores
+
+    Returns
+    -------
+    dict
+        array of n_rows values for each stat
+    """
+    y_label = y_label.astype(np.int64)
+    y_pred = y_pred.astype(np.int64)
+    tp = weights @ (y_label * y_pred)
+    fn = weights @ (y_label * (1 - y_pred))
+    fp = weights @ ((1 - y_label) * y_pred)
+    tn = weights.sum(axis=1) - tp - fn - fp
+    stats = _binary_stats(tn, fp, fn, tp)
+
+    is_first = np.ones(len(y_score), dtype=bool)
+    is_first[1:] = y_score[1:] != y_score[:-1]
+    starts = np.flatnonzero(is_first)
+    stats["roc_auc"] = _binned_roc_auc(
+        np.add.reduceat(weights * y_label, starts, axis=1),
+        np.add.reduceat(weights * (1 - y_label), starts, axis=1),
+    )
+    return stats
+
+
+def _sort_by_score(y_label, y_pred, y_score):
+    """
+    Boolean labels and predictions, and the scores, sorted by ascending score
+    """
+    y_score = np.asarray(y_score, dtype=float)
+    if np.isnan(y_score).any():
+        raise ValueError("y_score contains NaN")
+    order = np.argsort(y_score)
+    return (
+        np.asarray(y_label).astype(bool)[order],
+        np.asarray(y_pred).astype(bool)[order],
+        y_score[order],
+    )
+
+
+def _bootstrap_chunk(y_label, y_pred, y_score, n_boot, seed_seq):
+    """
+    Stats of `n_boot` bootstrap resamples, see `_weighted_stats`
+    """
+    rng = np.random.default_rng(seed_seq)
+    n_samples = len(y_score)
+    resample_ix = rng.integers(0, n_samples, size=(n_boot, n_samples))
+    resample_ix += np.arange(n_boot)[:, None] * n_samples
+    weights = np.bincount(resample_ix.ravel(), minlength=n_boot * n_samples)
+    return _weighted_stats(
+        weights.reshape(n_boot, n_samples), y_label, y_pred, y_score
+    )
+
+
+def bootstrap_replicates(
+    y_label, y_pred, y_score, n_boot=1000, seed=None, n_workers=1
+):
+    """
+    Summary stats of bootstrap resamples of a binary classification problem
+
+    The resamples are drawn as a matrix of sample counts, and the stats of all
+    the resamples in a chunk are computed together, rather than calling
+    `summary_stats` on each resample. Resamples with a single class have NaN
+    for the stats they leave undefined.
+
+    Parameters
+    ----------
+    y_label : np.array
+        array of true labels per sample (eg 0/1)
+    y_pred : np.array
+        array of predicted labels per sample (eg 0/1)
+    y_score : np.array
+        array of prediction probability, or confidence, per sample
+    n_boot : int
+        number of bootstrap resamples
+    seed : int, optional
+        seed for the resamples; the same seed gives the same replicates for any
+        number of workers
+    n_workers : int
+        number of processes; None for one per cpu, 1 computes in this process
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per resample, with the `summary_stats` columns
+    """
+    arrays = _sort_by_score(y_label, y_pred, y_score)
+
+    n_samples = len(arrays[2])
+    chunk_size = max(
+        1, min(_BOOTSTRAP_CHUNK, _BOOTSTRAP_CHUNK_SAMPLES // n_samples)
+    )
+    chunk_sizes = [
+        min(chunk_size, n_boot - i) for i in range(0, n_boot, chunk_size)
+    ]
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    n_workers = min(n_workers or os.cpu_count() or 1, max(len(chunk_sizes), 1))
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(_bootstrap_chunk, *arrays, n_chunk, seed_seq)
+                for n_chunk, seed_seq in zip(chunk_sizes, seed_seqs)
+            ]
+            chunks = [future.result() for future in futures]
+    else:
+        chunks = [
+            _bootstrap_chunk(*arrays, n_chunk, seed_seq)
+            for n_chunk, seed_seq in zip(chunk_sizes, seed_seqs)
+        ]
+    return pd.concat(
+        [pd.DataFrame(chunk) for chunk in chunks], ignore_index=True
+    )
+
+
+def bootstrap_confidence_intervals(
+    y_label,
+    y_pred,
+    y_score,
+    n_boot=1000,
+    confidence=0.95,
+    seed=None,
+    n_workers=1,
+):
+    """
+    Percentile bootstrap confidence intervals of the `summary_stats`
+
+    Parameters
+    ----------
+    y_label : np.array
+        array of true labels per sample (eg 0/1)
+    y_pred : np.array
+        array of predicted labels per sample (eg 0/1)
+    y_score : np.array
+        array of prediction probability, or confidence, per sample
+    n_boot : int
+        number of bootstrap resamples
+    confidence : float
+        coverage of the intervals
+    seed : int, optional
+        seed for the resamples
+    n_workers : int
+        number of processes, see `bootstrap_replicates`
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per stat, with the estimate on all the samples and the ci_lower
+        and ci_upper bounds of the interval
+    """
+    replicates_df = bootstrap_replicates(
+        y_label, y_pred, y_score, n_boot=n_boot, seed=seed, n_workers=n_workers
+    )
+    arrays = _sort_by_score(y_label, y_pred, y_score)
+    estimate = _weighted_stats(
+        np.ones((1, len(arrays[2])), dtype=np.int64), *arrays
+    )
+    tail = (1 - confidence) / 2
+    return pd.DataFrame(
+        {
+            "estimate": {stat: values[0] for stat, values in estimate.items()},
+            "ci_lower": replicates_df.quantile(tail),
+            "ci_upper": replicates_df.quantile(1 - tail),
+        }
+    )
+
+
+class StreamingSummaryStats:
+    """
+    Summary stats of a binary classification, accumulated over sample chunks
+
+    Rather than loading a whole corpus to call `summary_stats`, feed it in
+    chunks, such as from `pd.read_csv(..., chunksize=...)`. For each group,
+    only a count of positive and negative labels per score bin is kept, so the
+    memory does not grow with the number of samples.
+
+    The bin edges include the thresholds, so the confusion counts at each
+    threshold are exact. The ROC AUC is computed from the bins, counting the
+    pairs within a bin as ties; it is within about a bin width of the exact
+    value.
+
+    Samples with a missing label or score are skipped.
+
+    Parameters
+    ----------
+    label_col : str
+        column of the true labels (eg 0/1)
+    score_col : str
+        column of the prediction probability, or confidence
+    thresholds : Sequence[float]
+        a sample is predicted positive when its score is above the threshold
+    group_cols : List[str], optional
+        columns to group the stats by, such as year or domain
+    n_bins : int
+        number of equal bins over `score_range`, for the ROC AUC
+    score_range : Tuple[float, float]
+        range of the scores; scores outside it are kept in an outer bin
+
+    Examples
+    --------
+    >>> stats = StreamingSummaryStats("has_context", group_cols=["year"])
+    >>> for chunk_df in pd.read_csv(filepath, chunksize=100000):
+    ...     stats.update(chunk_df)
+    >>> stats_df = stats.finalize()
+    """
+
+    def __init__(
+        self,
+        label_col,
+        score_col="argument_confidence",
+        thresholds=(0.5,),
+        group_cols=None,
+        n_bins=1000,
+        score_range=(0.0, 1.0),
+    ):
+        self.label_col = label_col
+        self.score_col = score_col
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.group_cols = list(group_cols or [])
+        # bin i has the scores in (edges[i - 1], edges[i]]
+        self._edges = np.union1d(
+            self.thresholds,
+            np.linspace(score_range[0], score_range[1], n_bins + 1),
+        )
+        self._threshold_bins = np.searchsorted(self._edges, self.thresholds)
+        # group key -> per bin counts of the negative, then positive, labels
+        self._counts = {}
+
+    def update(self, chunk_df):
+        """
+        Add the samples of a chunk
+
+        Parameters
+        ----------
+        chunk_df : pd.DataFrame
+            with the label, score and group columns
+        """
+        chunk_df = chunk_df.dropna(subset=[self.label_col, self.score_col])
+        if chunk_df.empty:
+            return
+        n_bins = len(self._edges) + 1
+        bins = np.searchsorted(
+            self._edges, chunk_df[self.score_col].to_numpy(float)
+        )
+        bins += n_bins * chunk_df[self.label_col].to_numpy().astype(bool)
+        if self.group_cols:
+            groups = chunk_df.groupby(self.group_cols, sort=False).indices
+        else:
+            groups = {(): slice(None)}
+        for key, rows in groups.items():
+            counts = np.bincount(bins[rows], minlength=2 * n_bins)
+            if key in self._counts:
+                self._counts[key] += counts
+            else:
+                self._counts[key] = counts
+
+    def finalize(self):
+        """
+        Summary stats of all the samples so far
+
+        Returns
+        -------
+        pd.DataFrame
+            one row per group and threshold, indexed by the group columns and
+            threshold, with the columns of `threshold_sweep`
+        """
+        keys = list(self._counts)
+        counts = np.zeros(
+            (len(keys), 2 * (len(self._edges) + 1)), dtype=np.int64
+        )
+        for i, key in enumerate(keys):
+            counts[i] = self._counts[key]
+        neg, pos = np.split(counts, 2, axis=1)
+
+        # the samples in the bins up to each threshold are predicted negative
+        fn = np.cumsum(pos, axis=1)[:, self._threshold_bins]
+        tn = np.cumsum(neg, axis=1)[:, self._threshold_bins]
+        tp = pos.sum(axis=1, keepdims=True) - fn
+        fp = neg.sum(axis=1, keepdims=True) - tn
+
+        stats = _binary_stats(tn, fp, fn, tp)
+        stats["roc_auc"] = np.repeat(
+            _binned_roc_auc(pos, neg)[:, None], len(self.thresholds), axis=1
+        )
+        stats.update({"tn": tn, "fp": fp, "fn": fn, "tp": tp})
+
+        if self.group_cols:
+            index = pd.MultiIndex.from_tuples(
+                [
+                    (key if isinstance(key, tuple) else (key,)) + (thresh,)
+                    for key in keys
+                    for thresh in self.thresholds
+                ],
+                names=self.group_cols + ["threshold"],
+            )
+        else:
+            index = pd.Index(
+                np.tile(self.thresholds, len(keys)), name="threshold"
+            )
+        stats_df = pd.DataFrame(
+            {name: values.ravel() for name, values in stats.items()},
+            index=index,
+        )
+        return stats_df.sort_index()
@@ -0,0 +1,319 @@
+"""
+Local fake of the ArgumenText classify API, for offline benchmarks and tests
+
+The responses are synthesized in the same shape as the real service
+(see ``tests/fixtures/response_classify_*.json``), with a configurable latency
+distribution, error rates and per API key concurrency cap.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import collections
+import json
+import logging
+import multiprocessing
+import random
+import threading
+import time
+
+from arg_mine.api import errors
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+_REFUSED_ERROR = errors.Refused.TARGET_MSG + " or returned an empty result."
+
+
+@dataclass
+class FakeServerConfig:
+    """
+    data class for the behavior of the fake classify server
+    """
+
+    latency_median: float = 0.5  # seconds; latency is log-normally distributed
+    latency_sigma: float = 0.5  # sigma of the log latency
+    refused_rate: float = 0.25  # fraction of 400 "could not be crawled"
+    internal_error_rate: float = 0.01  # fraction of 500
+    gateway_error_rate: float = 0.01  # fraction of 502
+    max_in_flight_per_key: int = 3  # per userID, 429 beyond this
+    mean_sentences: int = 40  # mean number of sentences per document
+    seed: int = 0
+    # targetUrls containing this are always refused
+    refused_url_pattern: Optional[str] = None
+    # the first request for each targetUrl containing this gets a 429
+    busy_url_pattern: Optional[str] = None
+
+
+def synthesize_classify_response(
+    payload, rng, mean_sentences=40, time_total=0.0
+):
+    """
+    Create a fake classify json response for the given request payload
+
+    Parameters
+    ----------
+    payload : dict
+        classify request payload, see `classify.bundle_payload`
+    rng : random.Random
+    mean_sentences : int
+        mean number of sentences in the document
+    time_total : float
+        reported as "timeTotal" in the metadata
+
+    Returns
+    -------
+    dict
+    """
+    url = payload["targetUrl"]
+    topic = payload["topic"]
+    n_sentences = max(1, int(rng.expovariate(1.0 / mean_sentences)))
+    sentences = []
+    for i in range(n_sentences):
+        argument_confidence = rng.random()
+        sentence_text = (
+            "Sentence {} of {} on {}, with fake content {:08x}.".format(
+                i, url, topic, rng.getrandbits(32)
+            )
+        )
+        sentence = {
+            "argumentConfidence": argument_confidence,
+            "argumentLabel": (
+                "argument" if argument_confidence > 0.5 else "no argument"
+            ),
+            "sentenceOriginal": sentence_text,
+            "sentencePreprocessed": sentence_text,
+            "sortConfidence": argument_confidence,
+        }
+        if argument_confidence > 0.5 and payload.get("predictStance", True):
+            sentence["stanceConfidence"] = rng.random()
+            sentence["stanceLabel"] = rng.choice(["pro", "contra"])
+        sentences.append(sentence)
+
+    arguments = [s for s in sentences if s["argumentLabel"] == "argument"]
+    n_pro = sum(s.get("stanceLabel") == "pro" for s in arguments)
+    metadata = {
+        "computeAttention": payload.get("computeAttention", False),
+        "language": "en",
+        "modelVersion": 0.1,
+        "predictStance": payload.get("predictStance", True),
+        "removeDuplicates": True,
+        "showOnlyArguments": payload.get("showOnlyArguments", False),
+        "sortBy": payload.get("sortBy", "none"),
+        "timeArgumentPrediction": 0.4 * time_total,
+        "timeAttentionComputation": -1,
+        "timeLogging": 0.1 * time_total,
+        "timePreprocessing": 0.0,
+        "timeStancePrediction": -1,
+        "timeTotal": time_total,
+        "topic": topic,
+        "totalArguments": len(arguments),
+        "totalClassifiedSentences": n_sentences,
+        "totalContraArguments": len(arguments) - n_pro,
+        "totalNonArguments": n_sentences - len(arguments),
+        "totalProArguments": n_pro,
+        "userMetadata": payload.get("userMetadata", url),
+    }
+    if payload.get("showOnlyArguments"):
+        sentences = arguments
+    return {"metadata": metadata, "sentences": sentences}
+
+
+class _FakeClassifyHandler(BaseHTTPRequestHandler):
+    """Answers classify POSTs per the server config; GET returns the stats"""
+
+    def do_POST(self):
+        start_time = time.monotonic()
+        payload = json.loads(
+            self.rfile.read(int(self.headers["Content-Length"]))
+        )
+        user_id = str(payload.get("userID"))
+        server = self.server
+        with server.lock:
+            over_cap = (
+                server.in_flight[user_id]
+                >= server.config.max_in_flight_per_key
+            )
+            over_cap = over_cap or server.first_busy_request(
+                payload["targetUrl"]
+            )
+            if not over_cap:
+                server.in_flight[user_id] += 1
+                server.peak_in_flight[user_id] = max(
+                    server.peak_in_flight[user_id], server.in_flight[user_id]
+                )
+            rng = random.Random(
+                server.config.seed * 1000003 + server.n_requests
+            )
+            server.n_requests += 1
+        if over_cap:
+            status_code = 429
+            self._send_json(status_code, {"error": "Too many requests"})
+        else:
+            try:
+                status_code = self._classify(payload, rng)
+            finally:
+                with server.lock:
+                    server.in_flight[user_id] -= 1
+        with server.lock:
+            server.status_counts[status_code] += 1
+            server.latencies.append(time.monotonic() - start_time)
+
+    def _classify(self, payload, rng):
+        config = self.server.config
+        latency = (
+            rng.lognormvariate(0.0, config.latency_sigma)
+            * config.latency_median
+        )
+        time.sleep(latency)
+        outcome = rng.random()
+        refused_url = config.refused_url_pattern is not None and (
+            config.refused_url_pattern in payload["targetUrl"]
+        )
+        if refused_url or outcome < config.refused_rate:
+            status_code, body = 400, {"error": _REFUSED_ERROR}
+        elif outcome < config.refused_rate + config.internal_error_rate:
+            status_code, body = 500, ""
+        elif outcome < (
+            config.refused_rate
+            + config.internal_error_rate
+            + config.gateway_error_rate
+        ):
+            status_code, body = 502, {"error": "Bad Gateway"}
+        else:
+            status_code = 200
+            body = synthesize_classify_response(
+                payload, rng, config.mean_sentences, time_total=latency
+            )
+        self._send_json(status_code, body)
+        return status_code
+
+    def do_GET(self):
+        """Return the request stats; "/reset" also clears them"""
+        server = self.server
+        with server.lock:
+            stats = {
+                "n_requests": server.n_requests,
+                "status_counts": dict(server.status_counts),
+                "latencies": list(server.latencies),
+                "peak_in_flight": dict(server.peak_in_flight),
+            }
+            if self.path.rstrip("/").endswith("reset"):
+                server.reset_stats()
+        self._send_json(200, stats)
+
+    def _send_json(self, status_code, body):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeArgumenTextServer(ThreadingHTTPServer):
+    """
+    Fake ArgumenText classify server, answering on any path
+
+    Examples
+    --------
+    >>> config = FakeServerConfig(latency_median=0.05)
+    >>> with FakeArgumenTextServer(config) as server:
+    ...     responses = asyncio.run(
+    ...         classify.fetch_concurrent_async(
+    ...             topic, urls, base_url=server.url
+    ...         )
+    ...     )
+
+    Parameters
+    ----------
+    config : FakeServerConfig
+    host : str
+    port : int
+        0 picks a free port
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), _FakeClassifyHandler)
+        self.config = config or FakeServerConfig()
+        self.lock = threading.Lock()
+        self.in_flight = collections.Counter()  # per userID
+        self._thread = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.n_requests = 0
+        self.status_counts = collections.Counter()
+        self.latencies = []
+        self.peak_in_flight = collections.Counter()  # per userID
+        self.busy_urls = set()
+
+    def first_busy_request(self, url):
+        """Whether this is the first request for a `busy_url_pattern` url"""
+        pattern = self.config.busy_url_pattern
+        if pattern is None or pattern not in url or url in self.busy_urls:
+            return False
+        self.busy_urls.add(url)
+        return True
+
+    @property
+    def url(self):
+        return "http://{}:{}/classify".format(*self.server_address)
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _serve(config, url_queue):
+    server = FakeArgumenTextServer(config)
+    url_queue.put(server.url)
+    server.serve_forever()
+
+
+def start_server_process(config=None):
+    """
+    Run a FakeArgumenTextServer in a separate process, so it does not share
+    the memory and GIL of the client being measured
+
+    Parameters
+    ----------
+    config : FakeServerConfig
+
+    Returns
+    -------
+    Tuple[multiprocessing.Process, str]
+        the server process, to terminate when done, and its classify URL
+    """
+    config = config or FakeServerConfig()
+    url_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve, args=(config, url_queue), daemon=True
+    )
+    process.start()
+    try:
+        url = url_queue.get(timeout=30)
+    except BaseException:
+        process.terminate()
+        raise
+    _logger.debug(
+        "fake server running at {}, config {}".format(url, asdict(config))
+    )
+    return process, url
@@ -0,0 +1,250 @@
+"""
+Offline load test of the classify fetch backends, against a local fake server
+
+Reports the throughput, client side latency percentiles and peak memory of
+each backend, eg:
+
+    python -m arg_mine.testing.load_test --n-urls=500 --latency-median=0.1
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import json
+import logging
+import multiprocessing
+import resource
+import time
+
+import click
+import numpy as np
+import pandas as pd
+import requests
+
+from arg_mine.api import classify
+from arg_mine.api.auth import CredentialPool
+from arg_mine.testing.fake_server import FakeServerConfig, start_server_process
+from arg_mine import utils
+
+_logger = utils.get_logger(__name__, logging.DEBUG)
+
+LOAD_TEST_TOPIC = "climate change"
+
+
+class _UrlTimer:
+    """
+    Iterate over the URLs, timing each one from when the backend pulls it
+    to when its response is done
+    """
+
+    def __init__(self, urls):
+        self._urls = urls
+        self._submitted = {}
+        self.latencies = []
+
+    def __iter__(self):
+        for url in self._urls:
+            self._submitted[url] = time.monotonic()
+            yield url
+
+    def done(self, url):
+        self.latencies.append(time.monotonic() - self._submitted.pop(url))
+
+
+def _run_grequests(url_timer, base_url, concurrency, n_keys):
+    url_list = list(url_timer)
+    responses = classify.fetch_concurrent(
+        LOAD_TEST_TOPIC, url_list, pool_size=concurrency, base_url=base_url
+    )
+    # a batch backend only returns once all its URLs are done
+    for url in url_list:
+        url_timer.done(url)
+    docs_df, _, _ = classify.process_responses(responses)
+    return docs_df.shape[0]
+
+
+def _run_async(url_timer, base_url, concurrency, n_keys):
+    async def fetch():
+        responses = []
+        async for url, response in classify.iter_url_responses_async(
+            LOAD_TEST_TOPIC,
+            url_timer,
+            base_url=base_url,
+            credential_pool=_make_credential_pool(concurrency, n_keys),
+        ):
+            url_timer.done(url)
+            responses.append(response)
+        return responses
+
+    docs_df, _, _ = classify.process_responses(asyncio.run(fetch()))
+    return docs_df.shape[0]
+
+
+def _run_streaming(url_timer, base_url, concurrency, n_keys):
+    n_docs = 0
+    for doc, _ in classify.iter_classified(
+        LOAD_TEST_TOPIC,
+        url_timer,
+        base_url=base_url,
+        credential_pool=_make_credential_pool(concurrency, n_keys),
+        on_error=lambda url, e: url_timer.done(url),
+    ):
+        url_timer.done(doc.url)
+        n_docs += 1
+    return n_docs
+
+
+def _make_credential_pool(concurrency, n_keys):
+    credentials = [("load-test-{}".format(i), "") for i in range(n_keys)]
+    return CredentialPool(credentials, max_in_flight=concurrency)
+
+
+BACKENDS = {
+    "async": _run_async,
+    "streaming": _run_streaming,
+    "grequests": _run_grequests,
+}
+
+
+def _stats_url(base_url, reset=False):
+    return base_url.rsplit("/", 1)[0] + ("/reset" if reset else "/stats")
+
+
+def _measure_backend(backend, urls, base_url, concurrency, n_keys):
+    """
+    Run a backend in the current process, returning the number of docs, the
+    elapsed seconds, the client side latency of each URL and the peak RSS
+    """
+    url_timer = _UrlTimer(urls)
+    start_time = time.monotonic()
+    n_docs = BACKENDS[backend](url_timer, base_url, concurrency, n_keys)
+    elapsed = time.monotonic() - start_time
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+    return n_docs, elapsed, url_timer.latencies, max_rss_mb
+
+
+def run_backend(backend, urls, base_url, concurrency=3, n_keys=1):
+    """
+    Run a single fetch backend against the fake server, and measure it
+
+    Each backend runs in a fresh process, so its peak memory is its own, and
+    the grequests monkeypatching does not leak into the other backends.
+
+    Parameters
+    ----------
+    backend : str
+        key of BACKENDS
+    urls : List[str]
+    base_url : str
+        classify URL of a running fake server
+    concurrency : int
+        requests in flight per key
+    n_keys : int
+        number of fake API keys; the grequests backend always uses the .env key
+
+    Returns
+    -------
+    dict
+        throughput, client side latency percentiles, from when the backend
+        pulls a URL to when its response is done, and peak memory of the
+        backend
+    """
+    requests.get(_stats_url(base_url, reset=True))
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        n_docs, elapsed, latencies, max_rss_mb = executor.submit(
+            _measure_backend, backend, urls, base_url, concurrency, n_keys
+        ).result()
+
+    server_stats = requests.get(_stats_url(base_url)).json()
+    p50, p95, p99 = np.percentile(latencies or [np.nan], [50, 95, 99])
+    return {
+        "backend": backend,
+        "n_urls": len(urls),
+        "n_docs": n_docs,
+        "n_requests": server_stats["n_requests"],
+        "elapsed_s": elapsed,
+        "urls_per_s": len(urls) / elapsed,
+        "p50_s": p50,
+        "p95_s": p95,
+        "p99_s": p99,
+        "max_rss_mb": max_rss_mb,
+        "status_counts": json.dumps(
+            server_stats["status_counts"], sort_keys=True
+        ),
+    }
+
+
+@click.command()
+@click.option(
+    "--backend",
+    "backends",
+    type=click.Choice(list(BACKENDS)),
+    multiple=True,
+    help="fetch backend to measure, can be repeated; default is all",
+)
+@click.option("--n-urls", default=200, help="number of fake URLs to classify")
+@click.option(
+    "--concurrency",
+    default=3,
+    help="requests in flight per key, and per server key cap",
+)
+@click.option("--n-keys", default=1, help="number of fake API keys")
+@click.option(
+    "--latency-median", default=0.1, help="median server latency, seconds"
+)
+@click.option(
+    "--latency-sigma", default=0.5, help="sigma of the log server latency"
+)
+@click.option(
+    "--refused-rate", default=0.25, help="fraction of 400 refused URLs"
+)
+@click.option(
+    "--error-rate", default=0.02, help="fraction of 500 and 502 errors"
+)
+@click.option(
+    "--mean-sentences", default=40, help="mean sentences per document"
+)
+@click.option("--seed", default=0, help="seed for the fake server responses")
+def main(
+    backends,
+    n_urls,
+    concurrency,
+    n_keys,
+    latency_median,
+    latency_sigma,
+    refused_rate,
+    error_rate,
+    mean_sentences,
+    seed,
+):
+    config = FakeServerConfig(
+        latency_median=latency_median,
+        latency_sigma=latency_sigma,
+        refused_rate=refused_rate,
+        internal_error_rate=error_rate / 2,
+        gateway_error_rate=error_rate / 2,
+        max_in_flight_per_key=concurrency,
+        mean_sentences=mean_sentences,
+        seed=seed,
+    )
+    urls = ["http://example.com/load-test/{}".format(i) for i in range(n_urls)]
+    backends = (
+        [b for b in BACKENDS if b in backends] if backends else list(BACKENDS)
+    )
+
+    server_process, base_url = start_server_process(config)
+    try:
+        results = [
+            run_backend(
+                b, urls, base_url, concurrency=concurrency, n_keys=n_keys
+            )
+            for b in backends
+        ]
+    finally:
+        server_process.terminate()
+    click.echo(pd.DataFrame(results).set_index("backend").T.to_string())
+
+
+if __name__ == "__main__":
+    main()
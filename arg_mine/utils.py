@@ -1,6 +1,6 @@
 """Utility methods"""
 from typing import List, Type, Optional  # noqa: F401
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlsplit, parse_qsl, urlencode
 import hashlib
 import logging
 
@@ -8,6 +8,49 @@ import pandas as pd  # noqa: F401
 
 LOG_FMT = "%(levelname)s:%(asctime)s:%(name)s: %(message)s"
 
+# query parameters that only track the referrer, and do not change the content;
+# generic names, eg "ref", "src" or "amp", can select the content on some sites
+TRACKING_QUERY_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "yclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "ocid",
+    "cmpid",
+    "smid",
+    "smtyp",
+    "ref_src",
+    "soc_src",
+    "soc_trk",
+    "ito",
+    "sr_share",
+    "mbid",
+    "_ga",
+}
+TRACKING_QUERY_PREFIXES = ("utm_",)
+
+# hostname prefixes of mobile and accelerated versions of the same site
+MOBILE_HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+
+# columns of the output frames that repeat per document or label,
+# stored as categoricals in compact frames
+COMPACT_CATEGORY_COLUMNS = (
+    "doc_id",
+    "url",
+    "topic",
+    "argument_label",
+    "stance_label",
+    "language",
+    "model_version",
+)
+# a column is only made categorical when its number of unique values is at
+# most this fraction of the rows
+COMPACT_MAX_UNIQUE_RATIO = 0.5
+
 _logger: Optional[logging.Logger] = None
 
 # registry of loggers used in get_logger
@@ -86,3 +129,182 @@ def dataclasses_to_dicts(data):
 
 def get_url_hostnames(urls: pd.Series):
     return [u.netloc for u in urls.apply(urlparse)]
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical key for a URL, shared by variants of the same article
+
+    Ignores the scheme (http/https), "www." and mobile host prefixes, default
+    ports, tracking query parameters, the query parameter order, the fragment,
+    a trailing "/amp" and trailing slashes. The key is not a fetchable URL.
+
+    Examples
+    --------
+    >>> canonicalize_url("https://m.Example.com/a/?utm_source=rss&id=2#top")
+    "example.com/a?id=2"
+    >>> canonicalize_url("http://www.example.com/news/story/amp")
+    "example.com/news/story"
+
+    Parameters
+    ----------
+    url : str
+
+    Returns
+    -------
+    str
+        missing urls (None or NaN) are returned as they are
+    """
+    if not isinstance(url, str) and pd.isna(url):
+        return url
+    parts = urlsplit(url.strip())
+    hostname = (parts.hostname or "").rstrip(".")
+    for prefix in MOBILE_HOST_PREFIXES:
+        if hostname.startswith(prefix):
+            hostname = hostname[len(prefix) :]  # noqa: E203
+            break
+    if parts.port not in (None, 80, 443):
+        hostname = "{}:{}".format(hostname, parts.port)
+
+    path = parts.path.rstrip("/")
+    if path.endswith("/amp"):
+        path = path[: -len("/amp")]
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_QUERY_PARAMS
+        and not key.lower().startswith(TRACKING_QUERY_PREFIXES)
+    )
+    key = hostname + path
+    if query:
+        key += "?" + urlencode(query)
+    return key
+
+
+def _compact_string_dtype():
+    """Arrow backed strings with pyarrow installed, else None for python str"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return "string[pyarrow]"
+
+
+def compact_frame(
+    df: pd.DataFrame, category_columns=COMPACT_CATEGORY_COLUMNS
+) -> pd.DataFrame:
+    """
+    Return a lower memory copy of a docs or sentences DataFrame
+
+    * repeated string columns become categoricals, when they repeat enough
+    * float64 columns, eg the confidences, become float32
+    * the other string columns, eg `sentence_id` and the sentence text, become
+      arrow strings if pyarrow is installed, without a python object per value
+
+    Examples
+    --------
+    >>> sentences_df = compact_frame(sentences_df)
+    >>> compare_memory_usage(original_df, sentences_df)
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    category_columns : Sequence[str]
+        columns to make categorical
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    df = df.copy(deep=False)
+    string_dtype = _compact_string_dtype()
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if (
+            pd.api.types.is_float_dtype(series.dtype)
+            and series.dtype.itemsize > 4
+        ):
+            df[column] = series.astype("float32")
+        elif column in category_columns and (
+            series.nunique(dropna=False)
+            <= COMPACT_MAX_UNIQUE_RATIO * len(series)
+        ):
+            df[column] = series.astype("category")
+        elif string_dtype is not None and (
+            pd.api.types.is_string_dtype(series.dtype)
+            and series.dtype != string_dtype
+        ):
+            df[column] = series.astype(string_dtype)
+    return df
+
+
+def concat_frames(df_list) -> pd.DataFrame:
+    """
+    Concatenate DataFrames, keeping categorical columns categorical
+
+    `pd.concat` falls back to object columns when the categories of the frames
+    differ, so a column that is categorical in any frame is made categorical in
+    all of them, with the union of their categories.
+
+    Parameters
+    ----------
+    df_list : List[pd.DataFrame]
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    # shallow copies, so the recast columns do not change the caller's frames
+    df_list = [df.copy(deep=False) for df in df_list]
+    category_columns = {
+        column
+        for df in df_list
+        for column, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype)
+    }
+    for column in category_columns:
+        columns = [
+            df[column].astype("category") for df in df_list if column in df
+        ]
+        categories = pd.api.types.union_categoricals(columns).categories
+        for df in df_list:
+            if column in df:
+                df[column] = (
+                    df[column]
+                    .astype("category")
+                    .cat.set_categories(categories)
+                )
+    return pd.concat(df_list, axis=0)
+
+
+def compare_memory_usage(
+    df: pd.DataFrame, compact_df: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Report the memory saved by a compact frame, per column and in total
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        original frame
+    compact_df : pd.DataFrame
+        eg from `compact_frame(df)`
+
+    Returns
+    -------
+    pd.DataFrame
+        indexed by column name and "total", with columns `original_mb`,
+        `compact_mb`, and `ratio` of original to compact size
+    """
+    usage_df = pd.DataFrame(
+        {
+            "original_mb": df.memory_usage(deep=True, index=False),
+            "compact_mb": compact_df.memory_usage(deep=True, index=False),
+        }
+    ) / 1e6
+    usage_df.loc["total"] = usage_df.sum()
+    usage_df["ratio"] = usage_df.original_mb / usage_df.compact_mb
+    return usage_df
@@ -3,6 +3,11 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.metrics import roc_curve, auc, precision_recall_curve
 
+from arg_mine import metrics
+
+# max distance of a decimated curve from the full curve, in axis units
+DEFAULT_CURVE_TOLERANCE = 1e-3
+
 
 def make_confusion_matrix(
     cf,
@@ -139,37 +144,205 @@ def make_confusion_matrix(
     return ax
 
 
-def make_roc_curve(y_label, y_score, selected_thresh=0.5, ax=None):
+def decimate_curve(x, y, tolerance=DEFAULT_CURVE_TOLERANCE, keep=()):
+    """
+    Select the points of a curve to plot, within a distance of the full curve
+
+    Uses the Ramer-Douglas-Peucker algorithm: between two kept points, the
+    point farthest from the segment joining them is kept if it is farther than
+    `tolerance`, and both halves are decimated in turn. Every dropped point is
+    within `tolerance` of the plotted polyline.
+
+    Parameters
+    ----------
+    x : np.array
+    y : np.array
+    tolerance : float
+        max distance of a dropped point from the decimated curve
+    keep : Sequence[int]
+        indices of points to always keep, such as a highlighted threshold
+
+    Returns
+    -------
+    np.array
+        ascending indices of the points to plot
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_points = len(x)
+    is_kept = np.zeros(n_points, dtype=bool)
+    if n_points == 0:
+        return np.flatnonzero(is_kept)
+    is_kept[[0, n_points - 1]] = True
+    is_kept[list(keep)] = True
+
+    kept_ix = np.flatnonzero(is_kept)
+    segments = list(zip(kept_ix[:-1], kept_ix[1:]))
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2:
+            continue
+        seg_x = x[end] - x[start]
+        seg_y = y[end] - y[start]
+        point_x = x[start + 1 : end] - x[start]  # noqa: E203
+        point_y = y[start + 1 : end] - y[start]  # noqa: E203
+        # distance to the closest point of the segment
+        seg_norm = seg_x ** 2 + seg_y ** 2
+        if seg_norm > 0:
+            t = np.clip((point_x * seg_x + point_y * seg_y) / seg_norm, 0, 1)
+        else:
+            t = 0
+        dist = np.hypot(point_x - t * seg_x, point_y - t * seg_y)
+        far_ix = np.argmax(dist)
+        if dist[far_ix] > tolerance:
+            mid = start + 1 + far_ix
+            is_kept[mid] = True
+            segments.extend([(start, mid), (mid, end)])
+    return np.flatnonzero(is_kept)
+
+
+def _binned_sweep(y_label, y_score, n_bins, selected_thresh):
+    """
+    `metrics.threshold_sweep` over equal score bins on [0, 1] and the selected
+    threshold
+
+    Returns
+    -------
+    pd.DataFrame
+        by descending threshold, from no predicted positives to all positive
+    """
+    thresholds = np.union1d(
+        np.linspace(0, 1, n_bins + 1), [-np.inf, selected_thresh, np.inf]
+    )
+    return metrics.threshold_sweep(y_label, y_score, thresholds[::-1])
+
+
+def binned_roc_curve(y_label, y_score, n_bins=1000, selected_thresh=0.5):
+    """
+    ROC curve at the edges of equal score bins, not at every sample score
+
+    A sample is predicted positive when its score is above the threshold.
+
+    Parameters
+    ----------
+    y_label: np.array
+        ground truth labels
+    y_score: np.array
+        1D array with the confidence scores from the model predictions
+    n_bins: int
+        number of equal bins over [0, 1]
+    selected_thresh: float
+        threshold to include exactly in the curve
+
+    Returns
+    -------
+    fpr, tpr, thresholds : np.array
+        as from `sklearn.metrics.roc_curve`, by descending threshold
+    """
+    sweep_df = _binned_sweep(y_label, y_score, n_bins, selected_thresh)
+    fpr = sweep_df.fp / (sweep_df.fp + sweep_df.tn)
+    return (
+        fpr.to_numpy(),
+        sweep_df.recall.to_numpy(),
+        sweep_df.index.to_numpy(),
+    )
+
+
+def binned_precision_recall_curve(
+    y_label, y_score, n_bins=1000, selected_thresh=0.5
+):
+    """
+    Precision-recall curve at the edges of equal score bins
+
+    A sample is predicted positive when its score is above the threshold.
+    Thresholds without predicted positives, so with undefined precision, are
+    left out.
+
+    Parameters
+    ----------
+    y_label: np.array
+        ground truth labels
+    y_score: np.array
+        1D array with the confidence scores from the model predictions
+    n_bins: int
+        number of equal bins over [0, 1]
+    selected_thresh: float
+        threshold to include exactly in the curve
+
+    Returns
+    -------
+    precision, recall, thresholds : np.array
+        by ascending threshold
+    """
+    sweep_df = _binned_sweep(y_label, y_score, n_bins, selected_thresh)
+    sweep_df = sweep_df[sweep_df.precision.notna()].iloc[::-1]
+    return (
+        sweep_df.precision.to_numpy(),
+        sweep_df.recall.to_numpy(),
+        sweep_df.index.to_numpy(),
+    )
+
+
+def make_roc_curve(
+    y_label,
+    y_score,
+    selected_thresh=0.5,
+    ax=None,
+    curve=None,
+    n_bins=None,
+    tolerance=DEFAULT_CURVE_TOLERANCE,
+):
     """
     Create plot for the Receiver Operating Characteristic (ROC) curve
     Highlights the selected threshold on the curve
     Only works for binary classification
 
+    The curve is decimated to the points within `tolerance` of the full curve
+    (see `decimate_curve`), keeping the highlighted threshold point.
+
     Parameters
     ----------
     y_label: np.array
-        ground truth labels
+        ground truth labels; not used with a precomputed `curve`
     y_score: np.array
         1D array with the confidence scores from the model predictions
     selected_thresh: float
         what threshold you want to highlight
     ax: AxesSubplot
         optional, plots on given axis, or creates new figure otherwise
+    curve: Tuple[np.array, np.array, np.array]
+        optional, precomputed fpr, tpr and thresholds, as from `roc_curve`
+    n_bins: int
+        optional, compute the curve from this many score bins, see
+        `binned_roc_curve`
+    tolerance: float
+        max distance of the plotted curve from the full curve
 
     Returns
     -------
     AxesSubplot
     """
-    fpr, tpr, thresholds = roc_curve(y_label, y_score)
+    if curve is None:
+        if n_bins:
+            curve = binned_roc_curve(y_label, y_score, n_bins, selected_thresh)
+        else:
+            curve = roc_curve(y_label, y_score)
+    fpr, tpr, thresholds = (np.asarray(values) for values in curve)
     roc_auc = auc(fpr, tpr)
     thresh_ix = np.argmin(np.abs(thresholds - selected_thresh))
     thresh_fpr = fpr[thresh_ix]
     thresh_tpr = tpr[thresh_ix]
+    plot_ix = decimate_curve(fpr, tpr, tolerance, keep=[thresh_ix])
     if not ax:
         fig, ax = plt.subplots(figsize=(6, 6))
     lw = 2
     ax.plot([0, 1], [0, 1], color="gray", lw=lw, linestyle="--")
-    ax.plot(fpr, tpr, lw=lw, label="ROC curve (AUC = {:0.2f})".format(roc_auc))
+    ax.plot(
+        fpr[plot_ix],
+        tpr[plot_ix],
+        lw=lw,
+        label="ROC curve (AUC = {:0.2f})".format(roc_auc),
+    )
     ax.plot(
         thresh_fpr,
         thresh_tpr,
@@ -189,14 +362,62 @@ def make_roc_curve(y_label, y_score, selected_thresh=0.5, ax=None):
     return ax
 
 
-def make_precision_recall_curve(y_label, y_score, selected_thresh=0.5, ax=None):
-    precision, recall, thresholds = precision_recall_curve(y_label, y_score)
+def make_precision_recall_curve(
+    y_label,
+    y_score,
+    selected_thresh=0.5,
+    ax=None,
+    curve=None,
+    n_bins=None,
+    tolerance=DEFAULT_CURVE_TOLERANCE,
+):
+    """
+    Create plot for the precision-recall curve
+    Highlights the selected threshold on the curve
+
+    The curve is decimated to the points within `tolerance` of the full curve
+    (see `decimate_curve`), keeping the highlighted threshold point.
+
+    Parameters
+    ----------
+    y_label: np.array
+        ground truth labels; not used with a precomputed `curve`
+    y_score: np.array
+        1D array with the confidence scores from the model predictions
+    selected_thresh: float
+        what threshold you want to highlight
+    ax: AxesSubplot
+        optional, plots on given axis, or creates new figure otherwise
+    curve: Tuple[np.array, np.array, np.array]
+        optional, precomputed precision, recall and thresholds, as from
+        `precision_recall_curve`
+    n_bins: int
+        optional, compute the curve from this many score bins, see
+        `binned_precision_recall_curve`
+    tolerance: float
+        max distance of the plotted curve from the full curve
+
+    Returns
+    -------
+    AxesSubplot
+    """
+    if curve is None:
+        if n_bins:
+            curve = binned_precision_recall_curve(
+                y_label, y_score, n_bins, selected_thresh
+            )
+        else:
+            curve = precision_recall_curve(y_label, y_score)
+    precision, recall, thresholds = (np.asarray(values) for values in curve)
     thresh_ix = np.argmin(np.abs(thresholds - selected_thresh))
     thresh_recall = recall[thresh_ix]
     thresh_precision = precision[thresh_ix]
+    plot_ix = decimate_curve(recall, precision, tolerance, keep=[thresh_ix])
     if not ax:
         fig, ax = plt.subplots(figsize=(6, 6))
-    ax.plot(recall, precision, label="precision-recall curve")
+    ax.plot(
+        recall[plot_ix], precision[plot_ix], label="precision-recall curve"
+    )
     ax.plot(
         thresh_recall,
         thresh_precision,
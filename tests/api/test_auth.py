@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from arg_mine.api import auth, classify
+from arg_mine.testing.fake_server import FakeArgumenTextServer
+from tests.fixtures import fake_server_config
+
+
+class TestLoadCredentials(unittest.TestCase):
+    @mock.patch("arg_mine.api.auth.load_dotenv")
+    def test_load_credentials(self, _):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            credentials_path = os.path.join(tmp_dir, "credentials.csv")
+            with open(credentials_path, "w") as f:
+                f.write("# user_id,api_key\nuser3, key3\n\nuser1,key1\n")
+            env = {
+                "ARGUMENTEXT_USERID": "user0",
+                "ARGUMENTEXT_KEY": "key0",
+                "ARGUMENTEXT_USERID_1": "user1",
+                "ARGUMENTEXT_KEY_1": "key1",
+                "ARGUMENTEXT_USERID_2": "user2",
+                "ARGUMENTEXT_KEY_2": "key2",
+                "ARGUMENTEXT_CREDENTIALS_FILE": credentials_path,
+            }
+            with mock.patch.dict(os.environ, env):
+                credentials = auth.load_credentials()
+        self.assertEqual(
+            credentials,
+            [
+                ("user0", "key0"),
+                ("user1", "key1"),
+                ("user2", "key2"),
+                ("user3", "key3"),
+            ],
+        )
+
+    @mock.patch("arg_mine.api.auth.load_dotenv")
+    def test_missing_numbered_key(self, _):
+        env = {
+            "ARGUMENTEXT_USERID_1": "user1",
+            "ARGUMENTEXT_KEY_1": "key1",
+            "ARGUMENTEXT_USERID_2": "user2",
+        }
+        with mock.patch.dict(os.environ, env):
+            with self.assertRaisesRegex(ValueError, "ARGUMENTEXT_KEY_2"):
+                auth.load_credentials()
+
+    @mock.patch("arg_mine.api.auth.load_dotenv")
+    def test_bad_credentials_line(self, _):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            credentials_path = os.path.join(tmp_dir, "credentials.csv")
+            with open(credentials_path, "w") as f:
+                f.write("# user_id,api_key\nuser1,key1\nuser2\n")
+            env = {"ARGUMENTEXT_CREDENTIALS_FILE": credentials_path}
+            with mock.patch.dict(os.environ, env):
+                with self.assertRaisesRegex(ValueError, "line 3"):
+                    auth.load_credentials()
+
+
+class TestCredentialPool(unittest.TestCase):
+    def test_acquire_spreads_keys(self):
+        pool = auth.CredentialPool([("a", "1"), ("b", "2")], max_in_flight=2)
+        keys = [pool.acquire() for _ in range(4)]
+        self.assertEqual(sorted(key.user_id for key in keys), ["a", "a", "b", "b"])
+        self.assertIsNone(pool.acquire())
+
+        response = requests.Response()
+        response.status_code = 200
+        self.assertFalse(pool.release(keys[0], 0.1, response))
+        self.assertIs(pool.acquire(), keys[0])
+
+        response.status_code = 429
+        self.assertTrue(pool.release(keys[1], 0.1, response))
+        stats = {key_stats["user_id"]: key_stats for key_stats in pool.stats()}
+        self.assertEqual(stats[keys[1].user_id]["n_congested"], 1)
+        self.assertNotIn("api_key", stats["a"])
+
+    def test_adaptive(self):
+        pool = auth.CredentialPool([("a", "1")], max_in_flight=4, adaptive=True)
+        self.assertTrue(pool.adaptive)
+        self.assertEqual(pool.max_workers, 4)
+        self.assertEqual(pool.keys[0].window, 2)
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            auth.CredentialPool([])
+
+    def test_per_key_concurrency(self):
+        pool = auth.CredentialPool(
+            [("a", "1"), ("b", "2"), ("c", "3")], max_in_flight=2
+        )
+        url_list = ["https://www.foo.com/article_{}.html".format(i) for i in range(18)]
+        with FakeArgumenTextServer(fake_server_config(delay=0.05)) as server:
+            base_url = server.url
+            results = list(
+                classify.iter_classified(
+                    "climate change", url_list, base_url=base_url, credential_pool=pool
+                )
+            )
+        self.assertEqual(len(results), len(url_list))
+        self.assertEqual(set(server.peak_in_flight), {"a", "b", "c"})
+        self.assertTrue(all(n <= 2 for n in server.peak_in_flight.values()))
+        self.assertEqual(sum(key.n_requests for key in pool.keys), len(url_list))
+        self.assertTrue(all(key.in_flight == 0 for key in pool.keys))
+
+
+if __name__ == "__main__":
+    unittest.main()
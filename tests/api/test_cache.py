@@ -0,0 +1,168 @@
+import os
+import tempfile
+import time
+import unittest
+
+from arg_mine.api import cache, classify
+from arg_mine.testing.fake_server import FakeArgumenTextServer
+from tests.fixtures import load_json_fixture, fake_server_config
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp_dir.name, "cache.sqlite")
+        blob = load_json_fixture("response_classify_only_args.json")
+        self.payload = dict(blob["payload"], apiKey="secret")
+        self.response = blob["response"]
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_make_key_ignores_credentials(self):
+        other_user = dict(self.payload, userID="someone", apiKey="else")
+        self.assertEqual(cache.make_key(self.payload), cache.make_key(other_user))
+        other_topic = dict(self.payload, topic="global warming")
+        self.assertNotEqual(cache.make_key(self.payload), cache.make_key(other_topic))
+
+    def test_put_get(self):
+        with cache.ResponseCache(self.cache_path) as response_cache:
+            self.assertIsNone(response_cache.get(self.payload))
+            response_cache.put(self.payload, self.response)
+            response = response_cache.get(self.payload)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.from_cache)
+            self.assertEqual(response.json(), self.response)
+            self.assertEqual((response_cache.hits, response_cache.misses), (1, 1))
+
+        # persisted across instances
+        with cache.ResponseCache(self.cache_path) as response_cache:
+            self.assertEqual(response_cache.get_json(self.payload), self.response)
+
+    def test_ttl(self):
+        with cache.ResponseCache(self.cache_path, ttl=0.01) as response_cache:
+            response_cache.put(self.payload, self.response)
+            time.sleep(0.05)
+            self.assertIsNone(response_cache.get(self.payload))
+            self.assertEqual(len(response_cache), 0)
+
+    def test_bypass(self):
+        with cache.ResponseCache(self.cache_path, bypass=True) as response_cache:
+            response_cache.put(self.payload, self.response)
+            self.assertIsNone(response_cache.get(self.payload))
+            self.assertEqual(len(response_cache), 1)
+
+    def test_lru_eviction(self):
+        payloads = [dict(self.payload, targetUrl=str(i)) for i in range(3)]
+        content = b"x" * 100
+        with cache.ResponseCache(self.cache_path, max_bytes=250) as response_cache:
+            response_cache.put(payloads[0], content)
+            response_cache.put(payloads[1], content)
+            # touch the first entry, so the second is least recently used
+            self.assertIsNotNone(response_cache.get(payloads[0]))
+            response_cache.put(payloads[2], content)
+            self.assertEqual(len(response_cache), 2)
+            self.assertEqual(response_cache.total_bytes, 200)
+            self.assertIsNone(response_cache.get(payloads[1]))
+            self.assertIsNotNone(response_cache.get(payloads[0]))
+
+    def test_shared_file_eviction(self):
+        payloads = [dict(self.payload, targetUrl=str(i)) for i in range(3)]
+        content = b"x" * 100
+        with cache.ResponseCache(self.cache_path, max_bytes=250) as first_cache:
+            first_cache.put(payloads[0], content)
+            first_cache.put(payloads[1], content)
+            # another process sharing the file sees the entries of the first
+            with cache.ResponseCache(self.cache_path, max_bytes=250) as other_cache:
+                self.assertEqual(other_cache.total_bytes, 200)
+                other_cache.put(payloads[2], content)
+                self.assertEqual(len(other_cache), 2)
+            self.assertEqual(first_cache.total_bytes, 200)
+            self.assertIsNone(first_cache.get(payloads[0]))
+
+    def test_iter_classified_cache_hits(self):
+        url_list = ["https://www.foo.com/article_{}.html".format(i) for i in range(3)]
+        with cache.ResponseCache(self.cache_path) as response_cache:
+            with FakeArgumenTextServer(fake_server_config()) as server:
+                base_url = server.url
+                first = list(
+                    classify.iter_classified(
+                        "climate change",
+                        url_list,
+                        base_url=base_url,
+                        cache=response_cache,
+                    )
+                )
+            # the server is gone, so these can only come from the cache
+            second = list(
+                classify.iter_classified(
+                    "climate change", url_list, base_url=base_url, cache=response_cache
+                )
+            )
+        self.assertEqual(len(first), 3)
+        self.assertEqual(
+            sorted(doc.url for doc, _ in first), sorted(doc.url for doc, _ in second)
+        )
+
+
+class TestRefusalCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp_dir.name, "refused.sqlite")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_refused_urls(self):
+        urls = ["https://a.com/1", "https://b.com/1", "https://b.com/2"]
+        with cache.RefusalCache(self.cache_path) as refusals:
+            refusals.update(urls, ["https://b.com/1"])
+            self.assertTrue(refusals.is_refused("https://b.com/1"))
+            self.assertFalse(refusals.is_refused("https://a.com/1"))
+            keep, skipped = refusals.filter_urls(urls)
+            self.assertEqual(keep, ["https://a.com/1", "https://b.com/2"])
+            self.assertEqual(skipped, ["https://b.com/1"])
+
+            # a later success clears the refusal
+            refusals.record("https://b.com/1", refused=False)
+            self.assertFalse(refusals.is_refused("https://b.com/1"))
+
+    def test_hostname_rates(self):
+        with cache.RefusalCache(
+            self.cache_path, min_requests=4, skip_rate=0.9, deprioritize_rate=0.5
+        ) as refusals:
+            dead = ["https://dead.com/{}".format(i) for i in range(4)]
+            flaky = ["https://flaky.com/{}".format(i) for i in range(4)]
+            refusals.update(dead + flaky, dead + flaky[:2])
+            rates = refusals.hostname_refusal_rates()
+            self.assertEqual(rates["dead.com"], 1.0)
+            self.assertEqual(rates["flaky.com"], 0.5)
+            rates = refusals.hostname_refusal_rates(
+                ["dead.com", "ok.com", "flaky.com"], chunk_size=2
+            )
+            self.assertEqual(
+                rates.to_dict(), {"dead.com": 1.0, "flaky.com": 0.5}
+            )
+
+            new_urls = [
+                "https://flaky.com/new",
+                "https://dead.com/new",
+                "https://ok.com/1",
+            ]
+            keep, skipped = refusals.filter_urls(new_urls)
+            self.assertEqual(keep, ["https://ok.com/1", "https://flaky.com/new"])
+            self.assertEqual(skipped, ["https://dead.com/new"])
+
+    def test_expiry(self):
+        with cache.RefusalCache(self.cache_path, ttl=0.01, min_requests=1) as refusals:
+            refusals.update(["https://dead.com/1"], ["https://dead.com/1"])
+            time.sleep(0.05)
+            self.assertFalse(refusals.is_refused("https://dead.com/1"))
+            self.assertTrue(refusals.hostname_refusal_rates().empty)
+            # expired hostname counts are reset, so the domain can recover
+            refusals.update(["https://dead.com/2"], [])
+            self.assertEqual(refusals.hostname_refusal_rates()["dead.com"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
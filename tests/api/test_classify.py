@@ -1,6 +1,12 @@
+import asyncio
 import unittest
 
-from arg_mine.api import classify
+import pandas as pd
+
+from arg_mine.api import classify, session
+from arg_mine import utils
+from arg_mine.testing.fake_server import FakeArgumenTextServer
+from tests.fixtures import load_json_fixture, fake_server_config
 
 
 class TestDocumentMetadata(unittest.TestCase):
@@ -91,5 +97,115 @@ class TestClassifiedSentence(unittest.TestCase):
         self.assertEqual(sentence_out.is_argument, False)
 
 
+class TestClassifyResultBuilder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.json_response = load_json_fixture("response_classify_only_args.json")[
+            "response"
+        ]
+
+    def test_matches_dataclasses(self):
+        builder = classify.ClassifyResultBuilder()
+        self.assertTrue(builder.add(self.json_response))
+        self.assertFalse(builder.add({}))
+        self.assertEqual(len(builder), 1)
+
+        doc, sentences = classify._parse_classify_json(self.json_response)
+        self.assertEqual(list(builder.documents()), [doc])
+        self.assertEqual(list(builder.sentences()), sentences)
+
+        docs_df, sentences_df = builder.to_frames()
+        pd.testing.assert_frame_equal(
+            docs_df, pd.DataFrame(utils.dataclasses_to_dicts([doc]))
+        )
+        pd.testing.assert_frame_equal(
+            sentences_df, pd.DataFrame(utils.dataclasses_to_dicts(sentences))
+        )
+
+
+class TestFetchConcurrentAsync(unittest.TestCase):
+    def setUp(self) -> None:
+        self.topic = "climate change"
+        self.url_list = [
+            "https://www.foo.com/article_{}.html".format(i) for i in range(7)
+        ]
+        self.url_list.append("https://www.foo.com/refused.html")
+
+    def test_fetch_concurrent_async(self):
+        with FakeArgumenTextServer(fake_server_config()) as server:
+            base_url = server.url
+            responses = asyncio.run(
+                classify.fetch_concurrent_async(
+                    self.topic, iter(self.url_list), concurrency=3, base_url=base_url
+                )
+            )
+        self.assertEqual(len(responses), len(self.url_list))
+
+        docs_df, sentences_df, missing_urls = classify.process_responses(responses)
+        self.assertEqual(docs_df.shape[0], len(self.url_list) - 1)
+        self.assertEqual(set(docs_df.url), set(self.url_list[:-1]))
+        self.assertEqual(set(sentences_df.doc_id), set(docs_df.doc_id))
+        self.assertEqual(missing_urls, ["https://www.foo.com/refused.html"])
+
+
+class TestIterClassified(unittest.TestCase):
+    def setUp(self) -> None:
+        self.topic = "climate change"
+        self.url_list = [
+            "https://www.foo.com/article_{}.html".format(i) for i in range(7)
+        ]
+        self.url_list.append("https://www.foo.com/refused.html")
+
+    def test_iter_classified(self):
+        errors_seen = []
+        with FakeArgumenTextServer(fake_server_config()) as server:
+            base_url = server.url
+            results = list(
+                classify.iter_classified(
+                    self.topic,
+                    iter(self.url_list),
+                    max_in_flight=2,
+                    max_buffered=1,
+                    base_url=base_url,
+                    on_error=lambda url, e: errors_seen.append((url, e)),
+                )
+            )
+        self.assertEqual(len(results), len(self.url_list) - 1)
+        for doc, sentences in results:
+            self.assertIsInstance(doc, classify.DocumentMetadata)
+            self.assertEqual(len(sentences), doc.total_classified_sentences)
+            self.assertTrue(all(s.doc_id == doc.doc_id for s in sentences))
+        self.assertEqual(len(errors_seen), 1)
+        self.assertEqual(errors_seen[0][0], "https://www.foo.com/refused.html")
+        self.assertIsInstance(errors_seen[0][1], classify.errors.Refused)
+
+    def test_adaptive_limiter(self):
+        limiter = session.AdaptiveConcurrencyLimiter(initial_window=2, max_window=4)
+        url_list = self.url_list + ["https://www.foo.com/busy.html"]
+        with FakeArgumenTextServer(fake_server_config()) as server:
+            base_url = server.url
+            results = list(
+                classify.iter_classified(
+                    self.topic, url_list, base_url=base_url, limiter=limiter
+                )
+            )
+        # the 429 on the busy url was retried by the engine
+        self.assertEqual(len(results), len(url_list) - 1)
+        stats = limiter.stats()
+        self.assertEqual(stats["n_requests"], len(url_list) + 1)
+        self.assertEqual(stats["n_congested"], 1)
+        self.assertEqual(stats["n_decreases"], 1)
+        self.assertGreaterEqual(limiter.window, 1)
+
+    def test_early_close(self):
+        with FakeArgumenTextServer(fake_server_config()) as server:
+            base_url = server.url
+            results = classify.iter_classified(
+                self.topic, self.url_list, max_in_flight=2, base_url=base_url
+            )
+            doc, _ = next(results)
+            results.close()
+        self.assertIn(doc.url, self.url_list)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -174,5 +174,65 @@ class TestFetch(unittest.TestCase):
             )
 
 
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+    def test_additive_increase(self):
+        limiter = session.AdaptiveConcurrencyLimiter(initial_window=2, max_window=3)
+        # about a full window of healthy responses grows the window by one
+        limiter.record(0.1)
+        limiter.record(0.1)
+        self.assertEqual(limiter.window, 2)
+        limiter.record(0.1)
+        self.assertEqual(limiter.window, 3)
+        for _ in range(10):
+            limiter.record(0.1)
+        self.assertEqual(limiter.window, 3)
+
+    def test_multiplicative_decrease(self):
+        limiter = session.AdaptiveConcurrencyLimiter(initial_window=8, max_window=8)
+        limiter.record(0.0, congested=True)
+        self.assertEqual(limiter.window, 4)
+        # a request that started before the cut does not cut again
+        limiter.record(10.0, congested=True)
+        self.assertEqual(limiter.window, 4)
+        limiter.record(0.0, congested=True)
+        limiter.record(0.0, congested=True)
+        limiter.record(0.0, congested=True)
+        self.assertEqual(limiter.window, 1)
+        self.assertEqual(limiter.stats()["n_decreases"], 4)
+
+    def test_no_increase_when_slow(self):
+        limiter = session.AdaptiveConcurrencyLimiter(
+            initial_window=2, latency_threshold=1.0
+        )
+        for _ in range(10):
+            limiter.record(5.0)
+        self.assertEqual(limiter.window, 2)
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            session.AdaptiveConcurrencyLimiter(initial_window=4, max_window=2)
+
+    def test_is_congested(self):
+        self.assertTrue(session.is_congested(None, requests.Timeout()))
+        self.assertTrue(session.is_congested(None, requests.ConnectionError()))
+        self.assertTrue(
+            session.is_congested(None, requests.exceptions.RetryError())
+        )
+        self.assertFalse(
+            session.is_congested(None, requests.exceptions.InvalidURL())
+        )
+        self.assertFalse(session.is_congested(None))
+        self.assertTrue(session.is_congested(self._response(429)))
+        self.assertTrue(session.is_congested(self._response(502)))
+        self.assertFalse(session.is_congested(self._response(400)))
+        self.assertFalse(session.is_congested(self._response(200)))
+
+    @staticmethod
+    def _response(status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        return response
+
+
 if __name__ == "__main__":
     unittest.main()
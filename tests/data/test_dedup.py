@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from arg_mine import utils
+from arg_mine.data import dedup
+
+
+class TestDedupUrls(unittest.TestCase):
+    def setUp(self) -> None:
+        self.urls = pd.Series(
+            [
+                "https://www.foo.com/a",
+                "https://bar.com/b",
+                "http://foo.com/a/?utm_source=rss",
+                "https://www.foo.com/a",
+                "https://m.bar.com/b",
+            ],
+            index=[10, 11, 12, 13, 14],
+        )
+
+    def test_dedup_urls(self):
+        url_map_df = dedup.dedup_urls(self.urls)
+        self.assertEqual(list(url_map_df.index), [10, 11, 12, 13, 14])
+        self.assertEqual(list(url_map_df.content_url), list(self.urls))
+        self.assertEqual(
+            list(url_map_df.url),
+            [
+                "https://www.foo.com/a",
+                "https://bar.com/b",
+                "https://www.foo.com/a",
+                "https://www.foo.com/a",
+                "https://bar.com/b",
+            ],
+        )
+        self.assertEqual(
+            list(url_map_df.doc_id), [utils.unique_hash(u) for u in url_map_df.url]
+        )
+
+    def test_missing_urls(self):
+        urls = pd.Series(["https://www.foo.com/a", None, "http://foo.com/a"])
+        url_map_df = dedup.dedup_urls(urls)
+        self.assertEqual(url_map_df.url[2], "https://www.foo.com/a")
+        self.assertTrue(url_map_df.loc[1, ["url_key", "url", "doc_id"]].isna().all())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            registry_path = os.path.join(tmp_dir, "registry.sqlite")
+            with dedup.UrlRegistry(registry_path) as registry:
+                url_map_df = dedup.dedup_urls(urls, registry=registry)
+                self.assertEqual(len(registry), 1)
+        self.assertEqual(url_map_df.url[2], "https://www.foo.com/a")
+        self.assertTrue(pd.isna(url_map_df.doc_id[1]))
+
+    def test_registry_across_runs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            registry_path = os.path.join(tmp_dir, "registry.sqlite")
+            with dedup.UrlRegistry(registry_path) as registry:
+                dedup.dedup_urls(self.urls, registry=registry)
+                self.assertEqual(len(registry), 2)
+
+            # a later run, eg another GDELT year, reuses the first representatives
+            with dedup.UrlRegistry(registry_path) as registry:
+                url_map_df = dedup.dedup_urls(
+                    ["http://foo.com/a", "https://baz.com/c"], registry=registry
+                )
+                self.assertEqual(
+                    list(url_map_df.url), ["https://www.foo.com/a", "https://baz.com/c"]
+                )
+                self.assertEqual(len(registry), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
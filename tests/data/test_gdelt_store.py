@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from arg_mine.data import gdelt_store, loaders
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, "requires pyarrow")
+class TestGdeltStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_dir = self.tmp_dir.name
+        self.csv_filepath = os.path.join(self.store_dir, "gdelt.csv")
+        # rows out of time order, spread over three months
+        pd.DataFrame(
+            {
+                "datetime": [
+                    20200301000000,
+                    20200107101500,
+                    20200215120000,
+                    20200108000000,
+                    20200302000000,
+                ],
+                "title": ["a", "b", "c", "d", "e"],
+                "headline_image_url": "http://example.com/img.jpg",
+                "content_url": ["http://example.com/{}".format(i) for i in range(5)],
+                "topic_context": "climate",
+            }
+        ).to_csv(self.csv_filepath, index=False)
+        gdelt_store.convert_gdelt_csv(self.csv_filepath, 2020, store_dir=self.store_dir)
+        self.csv_df = loaders.get_gdelt_df(self.csv_filepath)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_partitions(self):
+        self.assertTrue(gdelt_store.has_gdelt_store(2020, store_dir=self.store_dir))
+        self.assertFalse(gdelt_store.has_gdelt_store(2019, store_dir=self.store_dir))
+        months = sorted(os.listdir(os.path.join(self.store_dir, "year=2020")))
+        self.assertEqual(months, ["month=01", "month=02", "month=03"])
+        self.assertEqual(
+            gdelt_store.gdelt_store_num_rows(2020, store_dir=self.store_dir), 5
+        )
+
+    def test_read_all_matches_csv(self):
+        df = gdelt_store.read_gdelt_store(2020, store_dir=self.store_dir)
+        pd.testing.assert_frame_equal(
+            df.reset_index(drop=True), self.csv_df, check_dtype=False
+        )
+
+    def test_read_row_range(self):
+        df = gdelt_store.read_gdelt_store(
+            2020,
+            columns=["content_url"],
+            start_row=1,
+            end_row=4,
+            store_dir=self.store_dir,
+        )
+        self.assertEqual(list(df.columns), ["content_url"])
+        self.assertEqual(list(df.index), [1, 2, 3])
+        self.assertEqual(list(df.content_url), list(self.csv_df.content_url.iloc[1:4]))
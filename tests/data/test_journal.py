@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from arg_mine.data import journal
+from arg_mine.data.extract_gdelt_sentences import extract_batch
+from arg_mine.testing.fake_server import FakeArgumenTextServer
+from tests.fixtures import fake_server_config
+
+
+class TestExtractionJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.tmp_dir.name, "journal.sqlite")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_record(self):
+        with journal.ExtractionJournal(self.journal_path) as url_journal:
+            url_journal.record("a", journal.UrlState.CLASSIFIED)
+            url_journal.record("b", journal.UrlState.REFUSED)
+            url_journal.record("c", journal.UrlState.CLASSIFIED)
+            url_journal.record("c", journal.UrlState.FAILED, detail="timeout")
+
+        # persisted across instances
+        with journal.ExtractionJournal(self.journal_path) as url_journal:
+            self.assertEqual(url_journal.get_state("c"), journal.UrlState.FAILED)
+            self.assertIsNone(url_journal.get_state("d"))
+            self.assertEqual(
+                url_journal.filter_unfinished(["d", "c", "b", "a"]), ["d", "c"]
+            )
+            # queried in chunks, keeping the order and duplicates
+            self.assertEqual(
+                url_journal.filter_unfinished(
+                    ["d", "a", "c", "b", "d", "a"], chunk_size=2
+                ),
+                ["d", "c", "d"],
+            )
+            self.assertEqual(
+                url_journal.counts(), {"classified": 1, "refused": 1, "failed": 1}
+            )
+
+
+class TestExtractBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.docs_path = os.path.join(self.tmp_dir.name, "docs.csv")
+        self.sentences_path = os.path.join(self.tmp_dir.name, "sentences.csv")
+        self.url_list = [
+            "https://www.foo.com/article_{}.html".format(i) for i in range(4)
+        ]
+        self.url_list.append("https://www.foo.com/refused.html")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_extract_and_resume(self):
+        journal_path = os.path.join(self.tmp_dir.name, "journal.sqlite")
+        with journal.ExtractionJournal(journal_path) as url_journal:
+            with FakeArgumenTextServer(fake_server_config()) as server:
+                base_url = server.url
+                extract_batch(
+                    "climate change",
+                    self.url_list[:2],
+                    self.docs_path,
+                    self.sentences_path,
+                    url_journal,
+                    base_url=base_url,
+                )
+                # resume over the full list, skipping the finished urls
+                todo_urls = url_journal.filter_unfinished(self.url_list)
+                self.assertEqual(todo_urls, self.url_list[2:])
+                extract_batch(
+                    "climate change",
+                    todo_urls,
+                    self.docs_path,
+                    self.sentences_path,
+                    url_journal,
+                    append=True,
+                    base_url=base_url,
+                )
+            self.assertEqual(url_journal.counts(), {"classified": 4, "refused": 1})
+
+        docs_df = pd.read_csv(self.docs_path)
+        sentences_df = pd.read_csv(self.sentences_path)
+        self.assertEqual(sorted(docs_df.url), sorted(self.url_list[:-1]))
+        self.assertEqual(set(sentences_df.doc_id), set(docs_df.doc_id))
+        self.assertEqual(
+            sentences_df.shape[0], docs_df.total_classified_sentences.sum()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
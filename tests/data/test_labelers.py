@@ -0,0 +1,141 @@
+import re
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from nltk.tokenize import PunktSentenceTokenizer
+
+from arg_mine.data import labelers
+
+# the default punkt model needs a download; an untrained one splits the same here
+sent_tokenize = PunktSentenceTokenizer().tokenize
+
+
+class TestSentenceIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.docs_df = pd.DataFrame(
+            {"doc_id": ["d1", "d2", "d3", "d4"], "url": ["u1", "u2", "u2", "u4"]}
+        )
+        self.sentences_df = pd.DataFrame(
+            {
+                "doc_id": ["d2", "d1", np.nan, "d2", "d1", "d3"],
+                "sentence_id": ["s1", "s2", "s3", "s4", "s5", "s6"],
+            }
+        )
+        self.index = labelers.SentenceIndex(self.docs_df, self.sentences_df)
+
+    def test_doc_id(self):
+        for url in ["u1", "u2", "u4"]:
+            self.assertEqual(
+                self.index.doc_id(url), labelers.match_doc_id(url, self.docs_df)
+            )
+        with self.assertRaises(KeyError):
+            self.index.doc_id("u5")
+
+    def test_doc_sentences(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn("d4", self.index)
+        self.assertEqual(self.index.sentence_rows("d2").tolist(), [0, 3])
+        for doc_id in ["d1", "d2", "d3", "d4"]:
+            pd.testing.assert_frame_equal(
+                self.index.doc_sentences(doc_id),
+                labelers.get_doc_sentences(doc_id, self.sentences_df),
+            )
+
+
+@mock.patch.object(labelers.tokenize, "sent_tokenize", sent_tokenize)
+class TestLabelGdeltContext(unittest.TestCase):
+    def setUp(self) -> None:
+        self.docs_df = pd.DataFrame(
+            {"doc_id": ["d1", "d2", "d3"], "url": ["u1", "u2", "u2"]}
+        )
+        sentences = [
+            ("d1", "s1", "Climate change is real."),
+            ("d1", "s2", "The carbon tax went up."),
+            ("d1", "s3", "The carbon tax went up again."),
+            ("d2", "s4", "Warming costs more?"),
+            ("d2", "s1", "Climate change is real."),
+            ("d3", "s5", "Not the first doc of its url."),
+        ]
+        self.sentences_df = pd.DataFrame(
+            sentences, columns=["doc_id", "sentence_id", "sentence_original"]
+        ).astype(object)
+        self.sentences_df["sort_confidence"] = [0.1, np.nan, 0.3, 0.4, 0.5, 0.6]
+        self.url_df = pd.DataFrame(
+            {
+                "content_url": ["u1", "u2", "u3", "u1"],
+                "topic_context": [
+                    # tokens are regexes; "." matches any character
+                    "[The] carbon tax went up. Nothing (else) matches!",
+                    "Warming costs more? Not the first doc",
+                    "Climate change is real.",
+                    np.nan,
+                ],
+            }
+        )
+
+    def _label_each_row(self, sentences_df, sentence_index=None):
+        sentences_df[labelers.CONTEXT_LABEL] = False
+        for _, url_row in self.url_df.dropna().iterrows():
+            if url_row.content_url in self.docs_df.url.values:
+                labelers.label_doc_sentences_with_context(
+                    url_row, self.docs_df, sentences_df, sentence_index=sentence_index
+                )
+        return sentences_df
+
+    def test_label_doc_sentences_with_index(self):
+        expected_df = self._label_each_row(self.sentences_df.copy())
+        sentences_df = self.sentences_df.copy()
+        sentence_index = labelers.SentenceIndex(self.docs_df, sentences_df)
+        sentences_df = self._label_each_row(sentences_df, sentence_index)
+        pd.testing.assert_frame_equal(sentences_df, expected_df)
+
+    def test_label_gdelt_context(self):
+        sentences_df = labelers.label_gdelt_context(
+            self.url_df, self.docs_df, self.sentences_df.copy()
+        )
+        self.assertEqual(
+            sentences_df[labelers.CONTEXT_LABEL].tolist(),
+            [False, True, False, True, False, False],
+        )
+        # same labels as labeling one row at a time
+        expected_df = self._label_each_row(self.sentences_df.copy())
+        pd.testing.assert_series_equal(
+            sentences_df[labelers.CONTEXT_LABEL],
+            expected_df[labelers.CONTEXT_LABEL],
+            check_dtype=False,
+        )
+        # other columns are left as they are
+        self.assertTrue(np.isnan(sentences_df.sort_confidence[1]))
+
+    def test_label_gdelt_context_workers(self):
+        expected_df = labelers.label_gdelt_context(
+            self.url_df, self.docs_df, self.sentences_df.copy()
+        )
+        # the patched tokenizer is inherited by forked workers
+        sentences_df = labelers.label_gdelt_context(
+            self.url_df, self.docs_df, self.sentences_df.copy(), n_workers=2
+        )
+        pd.testing.assert_frame_equal(sentences_df, expected_df)
+
+    def test_first_matching_sentences(self):
+        sentences = ["a tax", np.nan, "the tax.", "tax\nline", "end tax"]
+        self.assertEqual(
+            labelers._first_matching_sentences(
+                ["tax.", "^the", "tax$", "missing", "x\nl"], sentences
+            ),
+            [2, 2, 0, 3],
+        )
+        self.assertEqual(
+            labelers._first_matching_sentences(
+                ["tax.", "^the", "tax$", "missing"], [np.nan, "the tax!", "a tax"]
+            ),
+            [1, 1, 2],
+        )
+        with self.assertRaises(re.error):
+            labelers._first_matching_sentences(["?bad"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
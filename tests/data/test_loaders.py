@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from arg_mine.api.classify import ClassifiedSentence
+from arg_mine.data import loaders
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class TestConvertDatetimeInts(unittest.TestCase):
+    def setUp(self) -> None:
+        self.datetime_ints = pd.Series([20200107101500, 20191231235959, 20200229000001])
+
+    def test_matches_scalar_conversion(self):
+        expected = self.datetime_ints.apply(loaders.convert_datetime_int)
+        timestamps = loaders.convert_datetime_ints(self.datetime_ints)
+        self.assertTrue((timestamps == expected).all())
+        self.assertEqual(timestamps[0], pd.Timestamp("2020-01-07T10:15:00"))
+
+    def test_string_column(self):
+        timestamps = loaders.convert_datetime_ints(self.datetime_ints.astype(str))
+        self.assertEqual(timestamps[1], pd.Timestamp("2019-12-31T23:59:59"))
+
+    def test_bad_length_names_rows(self):
+        self.datetime_ints[5] = 202001071015
+        with self.assertRaisesRegex(ValueError, "5: 202001071015"):
+            loaders.convert_datetime_ints(self.datetime_ints)
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            loaders.convert_datetime_ints(pd.Series([20201301000000]))
+
+
+class TestReadGdeltRows(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv_filepath = os.path.join(self.tmp_dir.name, "gdelt.csv")
+        pd.DataFrame(
+            {
+                "datetime": [20200107101500 + i for i in range(6)],
+                "title": ["plain", 'with "quotes"', "multi\nline", "a, b", "e", "f"],
+                "headline_image_url": "http://example.com/img.jpg",
+                "content_url": ["http://example.com/{}".format(i) for i in range(6)],
+                "topic_context": "climate",
+            }
+        ).to_csv(self.csv_filepath, index=False)
+        self.csv_df = loaders.get_gdelt_df(self.csv_filepath)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_matches_full_load(self):
+        self.assertEqual(loaders.count_gdelt_rows(self.csv_filepath), 6)
+        for start_row, end_row in [(0, 6), (2, 4), (3, None), (5, 6)]:
+            df = loaders.read_gdelt_rows(self.csv_filepath, start_row, end_row)
+            pd.testing.assert_frame_equal(df, self.csv_df.iloc[start_row:end_row])
+
+    def test_empty_range(self):
+        for start_row, end_row in [(2, 2), (4, 3), (6, None)]:
+            df = loaders.read_gdelt_rows(self.csv_filepath, start_row, end_row)
+            self.assertEqual(df.shape[0], 0)
+            self.assertEqual(list(df.columns), list(self.csv_df.columns))
+
+    def test_rebuilds_stale_index(self):
+        loaders.build_gdelt_row_index(self.csv_filepath)
+        with open(self.csv_filepath, "a") as f:
+            f.write(
+                "20200107101506,g,http://example.com/img.jpg,http://example.com/6,c\n"
+            )
+        df = loaders.read_gdelt_rows(self.csv_filepath, 6)
+        self.assertEqual(list(df.content_url), ["http://example.com/6"])
+
+
+class TestConcatCsvs(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.read_path = self.tmp_dir.name
+        self.file_dfs = []
+        for file_ix in range(3):
+            file_df = pd.DataFrame(
+                {
+                    "doc_id": "doc{}".format(file_ix),
+                    "url": "http://example.com/{}".format(file_ix),
+                    "topic": "climate change",
+                    # all-digit ids would be parsed as ints without the schema dtypes
+                    "sentence_id": ["{}{}".format(file_ix, i) for i in range(4)],
+                    "argument_confidence": [0.9, 0.2, 0.7, 0.1],
+                    "argument_label": ["argument", "no argument"] * 2,
+                    "sentence_original": ["a", "b", None, "d"],
+                    "sentence_preprocessed": ["a", "b", "c", "d"],
+                    "sort_confidence": [0.9, 0.2, 0.7, 0.1],
+                    "stance_confidence": 0.0,
+                    "stance_label": "na",
+                }
+            )
+            file_df.to_csv(
+                os.path.join(
+                    self.read_path, "gdelt_2020_sentences_docs{}.csv".format(file_ix)
+                ),
+                index=False,
+            )
+            self.file_dfs.append(file_df)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_concat(self):
+        for n_workers in (1, 2):
+            concat_df = loaders.concat_csvs(
+                "gdelt_2020_sentences_docs*.csv",
+                self.read_path,
+                schema=ClassifiedSentence,
+                n_workers=n_workers,
+            )
+            self.assertEqual(concat_df.shape[0], 9)  # nan sentence_original dropped
+            self.assertEqual(concat_df.sentence_id.iloc[0], "00")
+            self.assertEqual(concat_df.argument_confidence.dtype, "float64")
+
+    def test_usecols_and_filters(self):
+        concat_df = loaders.concat_csvs(
+            "gdelt_2020_sentences_docs*.csv",
+            self.read_path,
+            usecols=["sentence_id", "argument_confidence"],
+            filters=[("argument_label", "==", "argument"), ("doc_id", "!=", "doc1")],
+            schema=ClassifiedSentence,
+        )
+        self.assertEqual(
+            list(concat_df.columns), ["sentence_id", "argument_confidence"]
+        )
+        self.assertEqual(list(concat_df.sentence_id), ["00", "02", "20", "22"])
+
+    def test_compact(self):
+        concat_df = loaders.concat_csvs(
+            "gdelt_2020_sentences_docs*.csv", self.read_path, compact=True
+        )
+        self.assertEqual(concat_df.shape[0], 9)
+        self.assertIsInstance(concat_df.doc_id.dtype, pd.CategoricalDtype)
+        self.assertEqual(set(concat_df.doc_id), {"doc0", "doc1", "doc2"})
+        self.assertEqual(concat_df.argument_confidence.dtype, "float32")
+
+    @unittest.skipIf(pyarrow is None, "requires pyarrow")
+    def test_parquet_filters(self):
+        for file_ix, file_df in enumerate(self.file_dfs):
+            file_df.to_parquet(
+                os.path.join(
+                    self.read_path,
+                    "gdelt_2020_sentences_docs{}.parquet".format(file_ix),
+                ),
+                index=False,
+            )
+        # filters on plain columns, not partition keys
+        concat_df = loaders.concat_parquet(
+            "gdelt_2020_sentences_docs*.parquet",
+            self.read_path,
+            usecols=["sentence_id", "argument_confidence"],
+            filters=[("argument_label", "==", "argument"), ("doc_id", "!=", "doc1")],
+        )
+        self.assertEqual(
+            list(concat_df.columns), ["sentence_id", "argument_confidence"]
+        )
+        self.assertEqual(list(concat_df.sentence_id), ["00", "02", "20", "22"])
+
+    def test_unknown_filter_op(self):
+        with self.assertRaises(ValueError):
+            loaders.concat_csvs(
+                "*.csv", self.read_path, filters=[("doc_id", "~=", "doc1")]
+            )
@@ -0,0 +1,162 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from arg_mine.api.cache import RefusalCache
+from arg_mine.data import journal, work_queue
+from arg_mine.data.extract_gdelt_sentences import _iter_batches
+from arg_mine.data.pipeline import ExtractionBatch, ExtractionPipeline
+from arg_mine.testing.fake_server import FakeArgumenTextServer
+from tests.fixtures import fake_server_config
+
+
+class TestExtractionPipeline(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.journal = journal.ExtractionJournal(
+            os.path.join(self.tmp_dir.name, "journal.sqlite")
+        )
+
+    def tearDown(self) -> None:
+        self.journal.close()
+        self.tmp_dir.cleanup()
+
+    def _batch(self, batch_ix, urls):
+        return ExtractionBatch(
+            batch_ix,
+            urls,
+            os.path.join(self.tmp_dir.name, "docs_{}.csv".format(batch_ix)),
+            os.path.join(self.tmp_dir.name, "sentences_{}.csv".format(batch_ix)),
+        )
+
+    def test_run_batches(self):
+        url_batches = [
+            ["https://www.foo.com/article_{}.html".format(i) for i in range(5)],
+            [],
+            ["https://www.foo.com/article_5.html", "https://www.foo.com/refused.html"],
+        ]
+        # a duplicate within a batch is only classified once
+        url_batches[0].append(url_batches[0][0])
+        batches = (self._batch(i, urls) for i, urls in enumerate(url_batches))
+        with FakeArgumenTextServer(fake_server_config(delay=0.01)) as server:
+            base_url = server.url
+            pipeline = ExtractionPipeline(
+                "climate change",
+                self.journal,
+                parse_workers=2,
+                queue_size=2,
+                base_url=base_url,
+            )
+            stats = pipeline.run(batches)
+
+        self.assertEqual(stats["n_written"], 7)
+        self.assertEqual(self.journal.counts(), {"classified": 6, "refused": 1})
+        for batch_ix, n_docs in [(0, 5), (1, 0), (2, 1)]:
+            docs_df = pd.read_csv(self._batch(batch_ix, []).docs_filepath)
+            self.assertEqual(docs_df.shape[0], n_docs)
+        docs_df = pd.read_csv(self._batch(2, []).docs_filepath)
+        self.assertEqual(list(docs_df.url), ["https://www.foo.com/article_5.html"])
+
+    def test_writer_error(self):
+        batch = self._batch(0, ["https://www.foo.com/article_0.html"])
+        batch.docs_filepath = os.path.join(self.tmp_dir.name, "missing", "docs.csv")
+        with FakeArgumenTextServer(fake_server_config()) as server:
+            base_url = server.url
+            pipeline = ExtractionPipeline(
+                "climate change", self.journal, base_url=base_url
+            )
+            with self.assertRaises(FileNotFoundError):
+                pipeline.run([batch])
+        self.assertEqual(self.journal.counts(), {})
+
+    def test_missing_urls(self):
+        urls = ["https://www.foo.com/article_0.html", np.nan, None]
+        with FakeArgumenTextServer(fake_server_config()) as server:
+            pipeline = ExtractionPipeline(
+                "climate change", self.journal, base_url=server.url
+            )
+            stats = pipeline.run([self._batch(0, urls)])
+        # only the url is dispatched and journalled
+        self.assertEqual(server.n_requests, 1)
+        self.assertEqual(stats["n_written"], 1)
+        self.assertEqual(self.journal.counts(), {"classified": 1})
+
+
+class TestIterBatches(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.journal = journal.ExtractionJournal(
+            os.path.join(self.tmp_dir.name, "journal.sqlite")
+        )
+        self.refusal_cache = RefusalCache(
+            os.path.join(self.tmp_dir.name, "refusals.sqlite")
+        )
+
+    def tearDown(self) -> None:
+        self.journal.close()
+        self.refusal_cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_missing_urls(self):
+        url_map_df = pd.DataFrame(
+            {
+                "content_url": [
+                    "https://www.foo.com/article_0.html",
+                    np.nan,
+                    None,
+                    "https://www.foo.com/article_1.html",
+                ]
+            }
+        )
+        url_map_df["url"] = url_map_df.content_url
+        url_map_df.index.name = "row"
+        batches = list(
+            _iter_batches(
+                url_map_df,
+                2,
+                self.journal,
+                self.refusal_cache,
+                out_data_path=self.tmp_dir.name,
+                year=2020,
+                resume=True,
+            )
+        )
+        self.assertEqual(
+            [batch.urls for batch in batches],
+            [
+                ["https://www.foo.com/article_0.html"],
+                ["https://www.foo.com/article_1.html"],
+            ],
+        )
+        self.assertEqual(self.journal.counts(), {})
+        # the rows without a url are kept in the urlmap, unclassified
+        url_map_filepath = batches[1].docs_filepath.replace("_docs_", "_urlmap_")
+        batch_map_df = pd.read_csv(url_map_filepath, index_col="row")
+        self.assertEqual(list(batch_map_df.index), [2, 3])
+        self.assertTrue(pd.isna(batch_map_df.url[2]))
+
+    def test_lost_lease(self):
+        url_map_df = pd.DataFrame(
+            {"url": ["https://www.foo.com/article_{}.html".format(i) for i in range(4)]}
+        )
+        lease = work_queue.Lease(1, 2020, 0, 4, "a", "token", 1, 0.0)
+        batches = _iter_batches(
+            url_map_df,
+            2,
+            self.journal,
+            self.refusal_cache,
+            out_data_path=self.tmp_dir.name,
+            year=2020,
+            lease=lease,
+        )
+        next(batches)
+        lease.lost = True
+        with self.assertRaises(work_queue.LeaseLost):
+            next(batches)
+
+
+if __name__ == "__main__":
+    unittest.main()
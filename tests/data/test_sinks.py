@@ -0,0 +1,110 @@
+from dataclasses import asdict
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from arg_mine.api import classify
+from arg_mine.data import journal, loaders, sinks
+from arg_mine.data.extract_gdelt_sentences import extract_batch
+from arg_mine.testing.fake_server import FakeArgumenTextServer
+from tests.fixtures import load_json_fixture, fake_server_config
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class TestOpenSink(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        json_response = load_json_fixture("response_classify_only_args.json")
+        self.doc, self.sentences = classify._parse_classify_json(
+            json_response["response"]
+        )
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _write(self, filepath, append=False, **kwargs):
+        sink = sinks.open_sink(filepath, classify.ClassifiedSentence, append=append)
+        with sink:
+            for sentence in self.sentences:
+                sink.write([asdict(sentence)])
+                sink.commit()
+        return sink
+
+    def test_csv(self):
+        filepath = os.path.join(self.tmp_dir.name, "sentences.csv")
+        self._write(filepath)
+        self._write(filepath, append=True)
+        df = pd.read_csv(filepath)
+        self.assertEqual(df.shape[0], 2 * len(self.sentences))
+
+    @unittest.skipIf(pyarrow is None, "requires pyarrow")
+    def test_parquet(self):
+        filepath = os.path.join(self.tmp_dir.name, "sentences.parquet")
+        self._write(filepath)
+        part_path = self._write(filepath, append=True).filepath
+        self.assertEqual(
+            part_path, os.path.join(self.tmp_dir.name, "sentences.part1.parquet")
+        )
+
+        df = loaders.concat_parquet("sentences*.parquet", self.tmp_dir.name)
+        self.assertEqual(df.shape[0], 2 * len(self.sentences))
+        self.assertEqual(list(df.columns), list(asdict(self.sentences[0])))
+        self.assertEqual(df.sentence_id.iloc[0], self.sentences[0].sentence_id)
+
+    def test_next_part_path(self):
+        filepath = os.path.join(self.tmp_dir.name, "sentences.parquet")
+        for part in ("part1.parquet", "part3.parquet", "part10.csv"):
+            part_path = os.path.join(self.tmp_dir.name, "sentences." + part)
+            open(part_path, "w").close()
+        # a gap in the parts does not overwrite the last one
+        self.assertEqual(
+            sinks._next_part_path(filepath),
+            os.path.join(self.tmp_dir.name, "sentences.part4.parquet"),
+        )
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            sinks.open_sink("sentences.txt", classify.ClassifiedSentence)
+
+
+@unittest.skipIf(pyarrow is None, "requires pyarrow")
+class TestExtractBatchParquet(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.url_list = [
+            "https://www.foo.com/article_{}.html".format(i) for i in range(4)
+        ]
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_extract(self):
+        journal_path = os.path.join(self.tmp_dir.name, "journal.sqlite")
+        with journal.ExtractionJournal(journal_path) as url_journal:
+            with FakeArgumenTextServer(fake_server_config()) as server:
+                base_url = server.url
+                extract_batch(
+                    "climate change",
+                    self.url_list,
+                    os.path.join(self.tmp_dir.name, "docs.parquet"),
+                    os.path.join(self.tmp_dir.name, "sentences.parquet"),
+                    url_journal,
+                    base_url=base_url,
+                )
+            self.assertEqual(url_journal.counts(), {"classified": 4})
+
+        docs_df = loaders.concat_parquet("docs.parquet", self.tmp_dir.name)
+        sentences_df = loaders.concat_parquet(
+            "sentences.parquet",
+            self.tmp_dir.name,
+            usecols=["doc_id", "argument_confidence"],
+            filters=[("argument_label", "==", "argument")],
+        )
+        self.assertEqual(sorted(docs_df.url), sorted(self.url_list))
+        self.assertEqual(sentences_df.shape[0], docs_df.total_arguments.sum())
@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+from arg_mine.data import work_queue
+
+
+def _record_lease(out_dir, lease):
+    # fails if the lease rows were already processed
+    path = os.path.join(
+        out_dir, "{}_{}_{}".format(lease.year, lease.start_row, lease.end_row)
+    )
+    with open(path, "x"):
+        pass
+    time.sleep(0.01)
+
+
+def _run_test_worker(queue_path, out_dir, worker_id):
+    with work_queue.LeaseQueue(queue_path) as lease_queue:
+        work_queue.run_worker(
+            lease_queue,
+            lambda lease: _record_lease(out_dir, lease),
+            worker_id=worker_id,
+        )
+
+
+class TestLeaseQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.tmp_dir.name, "work_queue.sqlite")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_add_ranges(self):
+        with work_queue.LeaseQueue(self.queue_path) as lease_queue:
+            self.assertEqual(lease_queue.add_ranges(2020, 25, lease_rows=10), 3)
+            # existing ranges are kept
+            self.assertEqual(lease_queue.add_ranges(2020, 25, lease_rows=10), 0)
+            self.assertEqual(lease_queue.add_ranges(2019, 5, lease_rows=10), 1)
+            self.assertEqual(lease_queue.counts(), {"pending": 4})
+
+            lease = lease_queue.claim("a")
+            self.assertEqual((lease.year, lease.start_row, lease.end_row), (2019, 0, 5))
+            leases = [lease_queue.claim("a") for _ in range(3)]
+            self.assertEqual([lease.end_row for lease in leases], [10, 20, 25])
+            self.assertIsNone(lease_queue.claim("a"))
+
+    def test_expired_lease(self):
+        with work_queue.LeaseQueue(self.queue_path, lease_ttl=0.2) as lease_queue:
+            lease_queue.add_ranges(2020, 10, lease_rows=10)
+            lease = lease_queue.claim("a")
+            self.assertTrue(lease_queue.renew(lease))
+            self.assertIsNone(lease_queue.claim("b"))
+
+            time.sleep(0.3)
+            self.assertEqual(lease_queue.counts(), {"expired": 1})
+            reclaimed = lease_queue.claim("b")
+            self.assertEqual(reclaimed.lease_id, lease.lease_id)
+            self.assertEqual(reclaimed.attempts, 2)
+            # the first worker lost its lease
+            self.assertFalse(lease_queue.renew(lease))
+            self.assertFalse(lease_queue.complete(lease))
+            self.assertTrue(lease_queue.complete(reclaimed))
+            self.assertEqual(lease_queue.counts(), {"done": 1})
+
+    def test_expired_last_attempt(self):
+        with work_queue.LeaseQueue(
+            self.queue_path, lease_ttl=0.1, max_attempts=1
+        ) as lease_queue:
+            lease_queue.add_ranges(2020, 10, lease_rows=10)
+            lease = lease_queue.claim("a")
+            time.sleep(0.2)
+            self.assertIsNone(lease_queue.claim("b"))
+            self.assertEqual(lease_queue.counts(), {"failed": 1})
+            self.assertFalse(lease_queue.complete(lease))
+
+    def test_failed_lease(self):
+        with work_queue.LeaseQueue(self.queue_path, max_attempts=2) as lease_queue:
+            lease_queue.add_ranges(2020, 10, lease_rows=10)
+
+            def extract_fn(lease):
+                raise IOError("disk full")
+
+            self.assertEqual(work_queue.run_worker(lease_queue, extract_fn), 0)
+            self.assertEqual(lease_queue.counts(), {"failed": 1})
+
+    def test_lost_lease(self):
+        with work_queue.LeaseQueue(
+            self.queue_path, lease_ttl=0.1
+        ) as lease_queue, work_queue.LeaseQueue(self.queue_path) as other_queue:
+            lease_queue.add_ranges(2020, 10, lease_rows=10)
+            written_batches = []
+
+            def extract_fn(lease):
+                for batch_ix in range(3):
+                    if lease.lost:
+                        raise work_queue.LeaseLost()
+                    written_batches.append(batch_ix)
+                    if batch_ix == 0:
+                        # the lease expires and another worker claims it
+                        time.sleep(0.15)
+                        self.assertIsNotNone(other_queue.claim("b"))
+                        time.sleep(0.3)
+
+            n_completed = work_queue.run_worker(
+                lease_queue, extract_fn, worker_id="a", renew_interval=0.2
+            )
+            self.assertEqual(n_completed, 0)
+            self.assertEqual(written_batches, [0])
+            # still held by the other worker
+            self.assertEqual(lease_queue.counts(), {"leased": 1})
+
+    def test_worker_processes(self):
+        out_dir = os.path.join(self.tmp_dir.name, "out")
+        os.makedirs(out_dir)
+        with work_queue.LeaseQueue(self.queue_path) as lease_queue:
+            lease_queue.add_ranges(2019, 95, lease_rows=10)
+            lease_queue.add_ranges(2020, 50, lease_rows=10)
+
+        processes = [
+            multiprocessing.Process(
+                target=_run_test_worker,
+                args=(self.queue_path, out_dir, "worker-{}".format(i)),
+            )
+            for i in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            self.assertEqual(process.exitcode, 0)
+
+        with work_queue.LeaseQueue(self.queue_path) as lease_queue:
+            self.assertEqual(lease_queue.counts(), {"done": 15})
+        self.assertEqual(len(os.listdir(out_dir)), 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
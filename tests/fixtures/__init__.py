@@ -1,6 +1,8 @@
 import os
 import json
+
 from arg_mine import PROJECT_DIR
+from arg_mine.testing.fake_server import FakeServerConfig
 
 
 def load_json_fixture(fixture_filename):
@@ -57,3 +59,21 @@ def save_json_request_fixture(
     }
     with open(json_path, "w") as f:
         json.dump(test_data, f, indent=2)
+
+
+def fake_server_config(delay=0.0):
+    """
+    FakeServerConfig for deterministic tests: no random errors, refuses any
+    targetUrl containing "refused" and answers the first request for a
+    targetUrl containing "busy" with a 429
+    """
+    return FakeServerConfig(
+        latency_median=delay,
+        latency_sigma=0.0,
+        refused_rate=0.0,
+        internal_error_rate=0.0,
+        gateway_error_rate=0.0,
+        max_in_flight_per_key=100,
+        refused_url_pattern="refused",
+        busy_url_pattern="busy",
+    )
@@ -0,0 +1,134 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from arg_mine import metrics
+
+
+class TestThresholdSweep(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.y_label = rng.integers(0, 2, 200)
+        # rounded, so some scores are tied and equal to a threshold
+        self.y_score = np.round(rng.random(200) * 0.5 + self.y_label * 0.4, 1)
+
+    def test_matches_summary_stats(self):
+        thresholds = [0.1, 0.25, 0.5, 0.7]
+        sweep_df = metrics.threshold_sweep(self.y_label, self.y_score, thresholds)
+        self.assertEqual(sweep_df.index.tolist(), thresholds)
+        for thresh in thresholds:
+            y_pred = (self.y_score > thresh).astype(int)
+            stats_df = metrics.summary_stats(self.y_label, y_pred, self.y_score)
+            for col in stats_df.columns:
+                self.assertAlmostEqual(sweep_df.at[thresh, col], stats_df[col].iloc[0])
+            self.assertEqual(sweep_df.at[thresh, "tp"], np.sum(y_pred & self.y_label))
+
+    def test_all_negative_predictions(self):
+        sweep_df = metrics.threshold_sweep(self.y_label, self.y_score, [1.0])
+        self.assertEqual(sweep_df.at[1.0, "tp"] + sweep_df.at[1.0, "fp"], 0)
+        self.assertTrue(np.isnan(sweep_df.at[1.0, "precision"]))
+        self.assertEqual(sweep_df.at[1.0, "recall"], 0)
+
+    def test_nan_score(self):
+        with self.assertRaises(ValueError):
+            metrics.threshold_sweep([0, 1], [0.1, np.nan], [0.5])
+
+
+class TestBootstrap(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(1)
+        self.y_label = rng.integers(0, 2, 100)
+        self.y_score = np.round(rng.random(100) * 0.6 + self.y_label * 0.3, 2)
+        self.y_pred = (self.y_score > 0.5).astype(int)
+
+    def test_weighted_stats(self):
+        # each bootstrap resample has the stats of summary_stats on its samples
+        y_label, y_pred, y_score = metrics._sort_by_score(
+            self.y_label, self.y_pred, self.y_score
+        )
+        rng = np.random.default_rng(2)
+        for _ in range(5):
+            resample_ix = rng.integers(0, len(y_score), len(y_score))
+            weights = np.bincount(resample_ix, minlength=len(y_score))
+            stats = metrics._weighted_stats(weights[None, :], y_label, y_pred, y_score)
+            stats_df = metrics.summary_stats(
+                y_label[resample_ix], y_pred[resample_ix], y_score[resample_ix]
+            )
+            for col in stats_df.columns:
+                self.assertAlmostEqual(stats[col][0], stats_df[col].iloc[0])
+
+    def test_confidence_intervals(self):
+        ci_df = metrics.bootstrap_confidence_intervals(
+            self.y_label, self.y_pred, self.y_score, n_boot=500, seed=0
+        )
+        stats_df = metrics.summary_stats(self.y_label, self.y_pred, self.y_score)
+        for col in stats_df.columns:
+            self.assertAlmostEqual(ci_df.at[col, "estimate"], stats_df[col].iloc[0])
+            self.assertLess(ci_df.at[col, "ci_lower"], ci_df.at[col, "estimate"])
+            self.assertGreater(ci_df.at[col, "ci_upper"], ci_df.at[col, "estimate"])
+
+    def test_replicates_seed(self):
+        kwargs = dict(n_boot=1500, seed=3)
+        replicates_df = metrics.bootstrap_replicates(
+            self.y_label, self.y_pred, self.y_score, **kwargs
+        )
+        self.assertEqual(replicates_df.shape, (1500, 5))
+        # the same replicates with several processes
+        parallel_df = metrics.bootstrap_replicates(
+            self.y_label, self.y_pred, self.y_score, n_workers=2, **kwargs
+        )
+        pd.testing.assert_frame_equal(replicates_df, parallel_df)
+
+
+class TestStreamingSummaryStats(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(2)
+        n_samples = 3000
+        self.sentences_df = pd.DataFrame(
+            {
+                "has_context": rng.integers(0, 2, n_samples),
+                "year": rng.choice([2019, 2020], n_samples),
+                "domain": rng.choice(["a.com", "b.com"], n_samples),
+            }
+        )
+        self.sentences_df["argument_confidence"] = np.round(
+            rng.random(n_samples) * 0.6 + self.sentences_df.has_context * 0.3, 3
+        )
+        self.sentences_df.loc[7, "argument_confidence"] = np.nan
+        self.thresholds = [0.25, 0.5, 0.75]
+
+    def test_grouped_chunks(self):
+        stats = metrics.StreamingSummaryStats(
+            "has_context", thresholds=self.thresholds, group_cols=["year", "domain"]
+        )
+        for i in range(0, len(self.sentences_df), 400):
+            stats.update(self.sentences_df.iloc[i : i + 400])  # noqa: E203
+        stats_df = stats.finalize()
+        self.assertEqual(stats_df.index.names, ["year", "domain", "threshold"])
+        self.assertEqual(stats_df.shape[0], 12)
+
+        # the same stats as on all the samples at once
+        sentences_df = self.sentences_df.dropna()
+        for key, group_df in sentences_df.groupby(["year", "domain"]):
+            sweep_df = metrics.threshold_sweep(
+                group_df.has_context, group_df.argument_confidence, self.thresholds
+            )
+            pd.testing.assert_frame_equal(
+                stats_df.loc[key], sweep_df, check_dtype=False, atol=1e-3
+            )
+
+    def test_no_groups(self):
+        stats = metrics.StreamingSummaryStats("has_context", thresholds=[0.5])
+        self.assertEqual(stats.finalize().shape[0], 0)
+        stats.update(self.sentences_df)
+        stats_df = stats.finalize()
+        self.assertEqual(stats_df.index.tolist(), [0.5])
+        self.assertEqual(
+            stats_df.at[0.5, "tp"] + stats_df.at[0.5, "fn"],
+            np.sum(self.sentences_df.dropna().has_context),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
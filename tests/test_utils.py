@@ -1,5 +1,7 @@
 import unittest
 
+import pandas as pd
+
 from arg_mine import utils
 
 
@@ -19,5 +21,84 @@ class TestHash(unittest.TestCase):
         self.assertIsInstance(hash_str, str)
 
 
+class TestCanonicalizeUrl(unittest.TestCase):
+    def test_variants_share_key(self):
+        variants = [
+            "https://www.example.com/news/story",
+            "http://example.com/news/story/",
+            "https://m.example.com/news/story?utm_source=twitter&utm_medium=social",
+            "https://EXAMPLE.com:443/news/story#comments",
+            "https://amp.example.com/news/story/amp/",
+            "https://www.example.com/news/story?fbclid=abc123",
+        ]
+        keys = {utils.canonicalize_url(url) for url in variants}
+        self.assertEqual(keys, {"example.com/news/story"})
+
+    def test_distinct_articles(self):
+        self.assertEqual(
+            utils.canonicalize_url("https://example.com/story?b=2&a=1&utm_campaign=x"),
+            "example.com/story?a=1&b=2",
+        )
+        self.assertNotEqual(
+            utils.canonicalize_url("https://example.com/story?id=1"),
+            utils.canonicalize_url("https://example.com/story?id=2"),
+        )
+        self.assertNotEqual(
+            utils.canonicalize_url("https://example.com/Story"),
+            utils.canonicalize_url("https://example.com/story"),
+        )
+        # generic parameters can select the content
+        for param in ["ref", "src", "amp"]:
+            self.assertEqual(
+                utils.canonicalize_url("https://example.com/story?{}=2".format(param)),
+                "example.com/story?{}=2".format(param),
+            )
+
+    def test_missing_url(self):
+        self.assertIsNone(utils.canonicalize_url(None))
+        self.assertTrue(pd.isna(utils.canonicalize_url(float("nan"))))
+
+
+class TestCompactFrame(unittest.TestCase):
+    def setUp(self) -> None:
+        self.df = pd.DataFrame(
+            {
+                "doc_id": ["d0"] * 6 + ["d1"] * 6,
+                "sentence_id": ["s{}".format(i) for i in range(12)],
+                "argument_confidence": [0.9, 0.2, 0.7, 0.1, 0.6, 0.3] * 2,
+                "argument_label": ["argument", "no argument"] * 6,
+            }
+        ).astype({"doc_id": object, "sentence_id": object, "argument_label": object})
+
+    def test_compact_frame(self):
+        compact_df = utils.compact_frame(self.df)
+        self.assertIsInstance(compact_df.doc_id.dtype, pd.CategoricalDtype)
+        self.assertIsInstance(compact_df.argument_label.dtype, pd.CategoricalDtype)
+        self.assertEqual(compact_df.argument_confidence.dtype, "float32")
+        # unique per row, so not categorical
+        self.assertNotIsInstance(compact_df.sentence_id.dtype, pd.CategoricalDtype)
+        self.assertEqual(list(compact_df.sentence_id), list(self.df.sentence_id))
+        # the original is untouched
+        self.assertEqual(self.df.argument_confidence.dtype, "float64")
+
+        usage_df = utils.compare_memory_usage(self.df, compact_df)
+        self.assertGreater(usage_df.loc["total", "ratio"], 1.0)
+
+    def test_concat_frames_keeps_categoricals(self):
+        frames = [
+            utils.compact_frame(self.df.iloc[:6]),
+            utils.compact_frame(self.df.iloc[6:]),
+        ]
+        frame_dtypes = [frame.dtypes.copy() for frame in frames]
+        concat_df = utils.concat_frames(frames)
+        # the input frames are unchanged
+        for frame, dtypes in zip(frames, frame_dtypes):
+            pd.testing.assert_series_equal(frame.dtypes, dtypes)
+        self.assertIsInstance(concat_df.argument_label.dtype, pd.CategoricalDtype)
+        # different categories in each frame
+        self.assertIsInstance(concat_df.doc_id.dtype, pd.CategoricalDtype)
+        self.assertEqual(list(concat_df.doc_id), list(self.df.doc_id))
+
+
 if __name__ == "__main__":
     unittest.main()
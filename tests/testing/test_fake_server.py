@@ -0,0 +1,81 @@
+import asyncio
+import random
+import unittest
+
+import requests
+
+from arg_mine.api import classify, errors
+from arg_mine.testing.fake_server import (
+    FakeArgumenTextServer,
+    FakeServerConfig,
+    start_server_process,
+    synthesize_classify_response,
+)
+
+
+class TestSynthesizeClassifyResponse(unittest.TestCase):
+    def setUp(self) -> None:
+        self.url = "http://example.com/story"
+        self.payload = classify.bundle_payload(
+            "climate change", self.url, credentials=("user", "key")
+        )
+
+    def test_parses_like_the_api(self):
+        json_response = synthesize_classify_response(self.payload, random.Random(0))
+        doc, sentences = classify._parse_classify_json(json_response)
+        self.assertEqual(doc.url, self.url)
+        self.assertEqual(len(sentences), doc.total_classified_sentences)
+        self.assertEqual(
+            doc.total_arguments, sum(s.argument_label == "argument" for s in sentences)
+        )
+
+    def test_only_arguments(self):
+        self.payload["showOnlyArguments"] = True
+        json_response = synthesize_classify_response(self.payload, random.Random(0))
+        labels = {s["argumentLabel"] for s in json_response["sentences"]}
+        self.assertLessEqual(labels, {"argument"})
+
+
+class TestFakeArgumenTextServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.payload = classify.bundle_payload(
+            "climate change", "http://example.com/story", credentials=("user", "key")
+        )
+
+    def test_refused(self):
+        config = FakeServerConfig(latency_median=0.001, refused_rate=1.0)
+        with FakeArgumenTextServer(config) as server:
+            response = requests.post(server.url, json=self.payload)
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaises(errors.Refused):
+            classify._response_error_check(response)
+
+    def test_per_key_concurrency_cap(self):
+        config = FakeServerConfig(latency_median=0.001, max_in_flight_per_key=0)
+        with FakeArgumenTextServer(config) as server:
+            response = requests.post(server.url, json=self.payload)
+            stats = requests.get(server.url.replace("classify", "stats")).json()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(stats["status_counts"], {"429": 1})
+
+    def test_server_process_default_config(self):
+        process, url = start_server_process()
+        try:
+            response = requests.get(url.replace("classify", "stats"))
+        finally:
+            process.terminate()
+            process.join()
+        self.assertEqual(response.status_code, 200)
+
+    def test_fetch_concurrent_async(self):
+        urls = ["http://example.com/story/{}".format(i) for i in range(10)]
+        config = FakeServerConfig(latency_median=0.001, refused_rate=0.0)
+        with FakeArgumenTextServer(config) as server:
+            responses = asyncio.run(
+                classify.fetch_concurrent_async(
+                    "climate change", urls, concurrency=3, base_url=server.url
+                )
+            )
+        docs_df, sentences_df, missing_urls = classify.process_responses(responses)
+        self.assertEqual(set(docs_df.url), set(urls))
+        self.assertEqual(missing_urls, [])
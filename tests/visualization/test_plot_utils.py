@@ -0,0 +1,67 @@
+import unittest
+
+import matplotlib
+import numpy as np
+from sklearn.metrics import roc_curve
+
+from arg_mine.visualization import plot_utils
+
+matplotlib.use("Agg")
+
+
+class TestDecimateCurve(unittest.TestCase):
+    def test_decimate_curve(self):
+        x = np.linspace(0, 1, 10001)
+        y = x ** 2
+        plot_ix = plot_utils.decimate_curve(x, y, tolerance=1e-3, keep=[1234])
+        self.assertLess(len(plot_ix), 100)
+        self.assertEqual([plot_ix[0], plot_ix[-1]], [0, 10000])
+        self.assertIn(1234, plot_ix)
+        # within tolerance of the decimated curve; the slope is at most 2
+        y_plot = np.interp(x, x[plot_ix], y[plot_ix])
+        self.assertLess(np.max(np.abs(y - y_plot)), 1e-3 * np.sqrt(5))
+
+    def test_straight_line(self):
+        x = np.linspace(0, 1, 50)
+        plot_ix = plot_utils.decimate_curve(x, 2 * x)
+        self.assertEqual(plot_ix.tolist(), [0, 49])
+        self.assertEqual(len(plot_utils.decimate_curve([], [])), 0)
+
+
+class TestCurvePlots(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.y_label = rng.integers(0, 2, 20000)
+        self.y_score = np.clip(rng.normal(0.4 + 0.2 * self.y_label, 0.2), 0, 1)
+
+    def test_make_roc_curve(self):
+        curve = roc_curve(self.y_label, self.y_score)
+        ax = plot_utils.make_roc_curve(None, None, curve=curve)
+        self.assertLess(len(ax.lines[1].get_xdata()), len(curve[0]) / 10)
+
+    def test_binned_curves(self):
+        y_pred = self.y_score > 0.37
+        tp = np.sum(y_pred & (self.y_label == 1))
+        fpr, tpr, thresholds = plot_utils.binned_roc_curve(
+            self.y_label, self.y_score, n_bins=100, selected_thresh=0.37
+        )
+        thresh_ix = np.flatnonzero(thresholds == 0.37)[0]
+        self.assertEqual(tpr[thresh_ix], tp / np.sum(self.y_label))
+        self.assertEqual([fpr[0], fpr[-1]], [0, 1])
+
+        precision, recall, thresholds = plot_utils.binned_precision_recall_curve(
+            self.y_label, self.y_score, n_bins=100, selected_thresh=0.37
+        )
+        thresh_ix = np.flatnonzero(thresholds == 0.37)[0]
+        self.assertEqual(precision[thresh_ix], tp / np.sum(y_pred))
+        ax = plot_utils.make_precision_recall_curve(
+            self.y_label, self.y_score, selected_thresh=0.37, n_bins=100
+        )
+        self.assertIn(
+            "precision={:0.3f}".format(tp / np.sum(y_pred)),
+            ax.get_legend().get_texts()[1].get_text(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()